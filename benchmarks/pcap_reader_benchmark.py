@@ -0,0 +1,131 @@
+"""Сравнение скорости чтения PCAP: rdpcap, потоковый scapy и нативный парсер.
+
+    python benchmarks/pcap_reader_benchmark.py [--packets 200000] [--pcap FILE]
+
+Без --pcap генерируется синтетический Ethernet/IPv4 захват с небольшой долей
+ARP, IPv6 и VLAN-кадров.
+"""
+import os
+import sys
+import time
+import struct
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipeline_emulator'))
+
+import pandas as pd
+
+from pcap_parser import PCAP_BATCH_ROWS, read_capture_batches, read_scapy_batches
+from packet_format import render_frame
+
+
+def write_synthetic_pcap(path, packets, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        ts = 1700000000.0
+        for _ in range(packets):
+            ts += rng.random() * 0.001
+            kind = rng.random()
+            payload = bytes(rng.randrange(0, 1200))
+            if kind < 0.03:
+                frame = bytes(12) + b'\x08\x06' + bytes(28)
+            elif kind < 0.06:
+                frame = bytes(12) + b'\x86\xdd' + struct.pack('>IHBB', 0x60000000, len(payload), 17, 64) + bytes(32) + payload
+            else:
+                vlan = b'\x81\x00\x00\x05' if kind < 0.1 else b''
+                ip = struct.pack(
+                    '>BBHHHBBH4s4s', 0x45, 0, 20 + len(payload), 0, 0, 64, rng.choice((6, 17, 1)), 0,
+                    bytes((10, 0, rng.randrange(4), rng.randrange(256))), bytes((10, 1, 0, rng.randrange(64)))
+                )
+                frame = bytes(12) + vlan + b'\x08\x00' + ip + payload
+            sec = int(ts)
+            f.write(struct.pack('<IIII', sec, int((ts - sec) * 1e6), len(frame), len(frame)))
+            f.write(frame)
+
+
+def read_rdpcap(path):
+    # Прежняя реализация PCAPReaderNode
+    from scapy.all import rdpcap
+    rows = []
+    for pkt in rdpcap(path):
+        if 'IP' in pkt:
+            rows.append({
+                'timestamp': float(pkt.time),
+                'src_ip': pkt['IP'].src,
+                'dst_ip': pkt['IP'].dst,
+                'protocol': pkt['IP'].proto,
+                'length': len(pkt)
+            })
+    df = pd.DataFrame(rows)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s', errors='coerce')
+    return df
+
+
+def read_scapy_stream(path):
+    return pd.concat(read_scapy_batches(path, PCAP_BATCH_ROWS))
+
+
+def read_native(path):
+    return pd.concat(read_capture_batches(path, PCAP_BATCH_ROWS))
+
+
+def comparable(df):
+    # Формат rdpcap: адреса строками, числа int64
+    df = render_frame(df.reset_index(drop=True))
+    return df.astype({'protocol': 'int64', 'length': 'int64'})
+
+
+def count_records(path):
+    return sum(1 for _ in _records(path))
+
+
+def _records(path):
+    with open(path, 'rb') as f:
+        f.seek(24)
+        while True:
+            header = f.read(16)
+            if len(header) < 16:
+                return
+            incl_len = struct.unpack('<IIII', header)[2]
+            f.seek(incl_len, 1)
+            yield incl_len
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=200000)
+    parser.add_argument('--pcap', default=None, help='existing little-endian libpcap file')
+    parser.add_argument('--skip-rdpcap', action='store_true', help='rdpcap needs several GB on large captures')
+    args = parser.parse_args()
+
+    path = args.pcap
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), f"pcap_benchmark_{args.packets}.pcap")
+        if not os.path.exists(path):
+            write_synthetic_pcap(path, args.packets)
+    records = count_records(path)
+    print(f"{path}: {records} packets, {os.path.getsize(path) / 1024 ** 2:.1f} MB")
+
+    readers = [('native', read_native), ('scapy PcapReader', read_scapy_stream)]
+    if not args.skip_rdpcap:
+        readers.append(('rdpcap', read_rdpcap))
+
+    reference = None
+    for name, reader in readers:
+        start = time.perf_counter()
+        df = reader(path)
+        elapsed = time.perf_counter() - start
+        size = df.memory_usage(index=True, deep=True).sum() / 1024 ** 2
+        same = '' if reference is None else (
+            ' (same result)' if comparable(df).equals(reference) else ' (RESULT DIFFERS)'
+        )
+        reference = comparable(df) if reference is None else reference
+        print(f"{name:>18}: {elapsed:8.3f} s, {records / elapsed:12,.0f} packets/s, "
+              f"{len(df)} IPv4 rows, {size:.1f} MB{same}")
+
+
+if __name__ == '__main__':
+    main()
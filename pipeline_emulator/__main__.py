@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Модули приложения импортируются плоско, как при запуске main.py из этой папки
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+
+if __name__ == "__main__":
+    sys.exit(main())
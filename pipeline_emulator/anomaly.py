@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+
+# Поиск аномалий в ряду значений (обычно - окна Time Series или TimeWindow).
+# Каждый детектор хранит состояние между кусками: хвост ряда для скользящих
+# окон или экспоненциальные средние, поэтому в потоковом режиме он даёт те же
+# оценки, что и на всей таблице. Внутри куска всё считается векторно.
+
+DETECTOR_METHODS = ["Threshold", "EWMA", "Rolling Z-Score", "Rolling MAD", "Seasonal"]
+# MAD нормального распределения = 0.6745 сигмы
+MAD_SCALE = 0.6745
+# Строк в блоке скользящих медиан (блок - строки x ширина окна значений)
+MEDIAN_BLOCK_CELLS = 1 << 22
+
+
+def resolve_column(df, name):
+    """Колонка по имени; без точного совпадения - без учёта регистра"""
+    if name in df.columns:
+        return name
+    matches = [column for column in df.columns if isinstance(column, str) and column.lower() == str(name).lower()]
+    if not matches:
+        raise ValueError(f"Column '{name}' not found in data")
+    return matches[0]
+
+
+def _score(diff, spread):
+    # Нулевой разброс: любое отклонение - бесконечно большая оценка
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(spread > 0, diff / spread, np.where(diff == 0, 0.0, np.sign(diff) * np.inf))
+
+
+def _ewm(values, alpha, initial):
+    """Экспоненциальное среднее ряда, начатое со значения initial (его результат - первый)"""
+    series = pd.Series(np.r_[initial, values])
+    return series.ewm(alpha=alpha, adjust=False, ignore_na=True).mean().to_numpy()
+
+
+class ThresholdDetector:
+    """Значение выше порога - аномалия"""
+
+    def __init__(self, threshold, **_):
+        self.threshold = threshold
+
+    def score(self, x):
+        baseline = np.full(len(x), float(self.threshold))
+        return baseline, x - baseline
+
+    def is_anomaly(self, score):
+        return score > 0
+
+
+class _StatisticalDetector:
+    def __init__(self, window, score_threshold, **_):
+        if window < 2:
+            raise ValueError("Window must be at least 2")
+        self.window = window
+        self.score_threshold = score_threshold
+
+    def is_anomaly(self, score):
+        return np.abs(score) > self.score_threshold
+
+
+class EwmaDetector(_StatisticalDetector):
+    """Отклонение от экспоненциального среднего в единицах экспоненциального СКО.
+
+    Дисперсия обновляется по West: var = (1 - a) * (var + a * diff**2), это
+    тоже экспоненциальное среднее, поэтому оба ряда считаются без цикла.
+    """
+
+    def __init__(self, window, score_threshold, **_):
+        super().__init__(window, score_threshold)
+        self.alpha = 2 / (window + 1)
+        self.mean = None
+        self.var = 0.0
+        self.seen = 0
+
+    def score(self, x):
+        valid = ~np.isnan(x)
+        baseline, score = np.full(len(x), np.nan), np.full(len(x), np.nan)
+        values = x[valid]
+        if not len(values):
+            return baseline, score
+        mean = _ewm(values, self.alpha, values[0] if self.mean is None else self.mean)
+        diff = values - mean[:-1]
+        var = _ewm((1 - self.alpha) * diff ** 2, self.alpha, self.var)
+        result = _score(diff, np.sqrt(var[:-1]))
+        # Пока окно не набралось, среднее ещё не устоялось
+        result[self.seen + np.arange(len(values)) < self.window] = np.nan
+        baseline[valid], score[valid] = mean[:-1], result
+        self.mean, self.var = mean[-1], var[-1]
+        self.seen += len(values)
+        return baseline, score
+
+
+class _RollingDetector(_StatisticalDetector):
+    """Оценка по window предыдущим значениям; хвост ряда переходит в следующий кусок"""
+
+    def __init__(self, window, score_threshold, **_):
+        super().__init__(window, score_threshold)
+        self.tail = np.zeros(0)
+
+    def score(self, x):
+        valid = ~np.isnan(x)
+        baseline, score = np.full(len(x), np.nan), np.full(len(x), np.nan)
+        values = np.concatenate([self.tail, x[valid]])
+        if len(values) > len(self.tail):
+            center, spread = self._baseline(values)
+            new = slice(len(self.tail), None)
+            baseline[valid] = center[new]
+            score[valid] = _score(values[new] - center[new], spread[new])
+        self.tail = values[-self.window:]
+        return baseline, score
+
+
+class RollingZDetector(_RollingDetector):
+    """z-оценка по среднему и СКО предыдущих window значений"""
+
+    def _baseline(self, values):
+        rolling = pd.Series(values).rolling(self.window)
+        mean = rolling.mean().shift(1).to_numpy()
+        std = rolling.std(ddof=0).shift(1).to_numpy()
+        return mean, std
+
+
+class RollingMadDetector(_RollingDetector):
+    """Устойчивая оценка: медиана и MAD предыдущих window значений"""
+
+    def _baseline(self, values):
+        n, w = len(values), self.window
+        median, mad = np.full(n, np.nan), np.full(n, np.nan)
+        if n > w:
+            # windows[i] - значения перед позицией i + w. Сортировка коротких
+            # строк в несколько раз быстрее np.median (partition)
+            windows = np.lib.stride_tricks.sliding_window_view(values[:-1], w)
+            middle = [(w - 1) // 2, w // 2]
+            block = max(1, MEDIAN_BLOCK_CELLS // w)
+            for first in range(0, len(windows), block):
+                part = np.sort(windows[first:first + block], axis=1)
+                center = part[:, middle].mean(axis=1)
+                deviation = np.sort(np.abs(part - center[:, None]), axis=1)
+                median[first + w:first + w + len(part)] = center
+                mad[first + w:first + w + len(part)] = deviation[:, middle].mean(axis=1)
+        return median, mad / MAD_SCALE
+
+
+class SeasonalDetector(_StatisticalDetector):
+    """Сезонная база: для каждой фазы сезона (строка по модулю season) своё
+    экспоненциальное среднее и СКО по прошлым сезонам.
+
+    Куски раскладываются в таблицу сезоны x фазы, и экспоненциальные средние
+    считаются по столбцам сразу для всех фаз. Пропуски сдвигают фазу, но не
+    меняют базу.
+    """
+
+    def __init__(self, window, score_threshold, season, **_):
+        super().__init__(window, score_threshold)
+        if season < 1:
+            raise ValueError("Season length must be positive")
+        self.season = season
+        self.alpha = 2 / (window + 1)
+        self.mean = np.full(season, np.nan)
+        self.var = np.full(season, np.nan)
+        self.seen = np.zeros(season, dtype=np.int64)
+        self.position = 0
+
+    def _columns(self, grid, initial):
+        grid[0] = initial
+        return pd.DataFrame(grid).ewm(alpha=self.alpha, adjust=False, ignore_na=True).mean().to_numpy()
+
+    def score(self, x):
+        n, season = len(x), self.season
+        if not n:
+            return np.zeros(0), np.zeros(0)
+        offset = self.position % season
+        cycle, phase = np.divmod(offset + np.arange(n), season)
+        grid = np.full((cycle[-1] + 2, season), np.nan)
+        grid[cycle + 1, phase] = x
+        mean = self._columns(grid.copy(), self.mean)
+        # Среднее до строки - значение столбца строкой выше (пропуски его переносят)
+        before = mean[cycle, phase]
+        diff = x - before
+        spread = np.where(np.isnan(before), 0.0, (1 - self.alpha) * diff ** 2)
+        spread[np.isnan(x)] = np.nan
+        grid[cycle + 1, phase] = spread
+        var = self._columns(grid, self.var)
+        score = _score(diff, np.sqrt(var[cycle, phase]))
+        # Для оценки нужны хотя бы два прошлых сезона этой фазы
+        valid = ~np.isnan(x)
+        earlier = self.seen[phase] + pd.Series(valid).groupby(phase).cumsum().to_numpy() - valid
+        score[(earlier < 2) | ~valid] = np.nan
+        self.mean, self.var = mean[-1], var[-1]
+        self.seen += np.bincount(phase[valid], minlength=season)
+        self.position += n
+        return before, score
+
+
+DETECTORS = {
+    "Threshold": ThresholdDetector,
+    "EWMA": EwmaDetector,
+    "Rolling Z-Score": RollingZDetector,
+    "Rolling MAD": RollingMadDetector,
+    "Seasonal": SeasonalDetector,
+}
+
+
+def create_detector(method, threshold=1000, window=60, score_threshold=3, season=720):
+    if method not in DETECTORS:
+        raise ValueError(f"Unknown detection method: {method}")
+    return DETECTORS[method](threshold=threshold, window=window, score_threshold=score_threshold, season=season)
+
+
+def detect(df, column, detector):
+    """Строки-аномалии с колонками baseline и score; состояние детектора обновляется"""
+    column = resolve_column(df, column)
+    values = df[column]
+    if not pd.api.types.is_numeric_dtype(values):
+        raise ValueError(f"Column '{column}' is not numeric")
+    baseline, score = detector.score(values.to_numpy(dtype=np.float64, na_value=np.nan))
+    anomaly = detector.is_anomaly(np.nan_to_num(score, nan=0.0))
+    alerts = df[anomaly].copy()
+    alerts['baseline'] = baseline[anomaly]
+    alerts['score'] = score[anomaly]
+    return alerts
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+# Число различных значений колонки для каждого ключа в окне времени
+# ("сколько разных источников обращалось к адресу за минуту"). Пока у группы
+# немного значений, хранятся их 64-битные хеши и счёт точный; дальше группа
+# переходит на регистры HyperLogLog, из которых хранятся только ненулевые
+# (разреженная форма). Сводки кусков и процессов сливаются: хеши объединяются,
+# регистры берутся по максимуму.
+
+NS = 1_000_000_000
+PRECISIONS = range(4, 17)
+# Множитель для смешивания номера группы с хешем значения (золотое сечение)
+_GROUP_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _group_ids(windows, keys):
+    """Номера групп (окно, ключ) от 0 и их окна и ключи"""
+    window_code, window_values = pd.factorize(windows)
+    key_code, key_values = pd.factorize(keys)
+    ids, labels = pd.factorize(window_code.astype(np.int64) * max(len(key_values), 1) + key_code)
+    labels = np.asarray(labels)
+    return ids.astype(np.int64), np.asarray(window_values)[labels // max(len(key_values), 1)], \
+        np.asarray(key_values)[labels % max(len(key_values), 1)]
+
+
+def _bit_length(values):
+    # Длина в битах uint64 по половинам: float64 точен для 32-битных чисел
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, np.frexp(high)[1] + 32, np.frexp(low)[1])
+
+
+def _alpha(m):
+    if m <= 16:
+        return 0.673
+    if m <= 32:
+        return 0.697
+    if m <= 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class DistinctSketch:
+    """Сливаемые счётчики различных значений по группам (окно, ключ).
+
+    Группы пронумерованы (windows, keys). exact - уникальные пары (группа,
+    хеш) групп, у которых значений не больше limit; registers - ненулевые
+    регистры HyperLogLog остальных групп. Относительная ошибка оценки - около
+    1.04 / sqrt(2**precision).
+    """
+
+    def __init__(self, precision=12):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Precision must be between {PRECISIONS.start} and {PRECISIONS.stop - 1}")
+        self.precision = precision
+        # Четверть регистров: до неё хеши занимают не больше памяти, чем регистры
+        self.limit = (1 << precision) // 4
+        self.windows = np.zeros(0, dtype=np.int64)
+        self.keys = np.zeros(0)
+        self.exact_group = np.zeros(0, dtype=np.int64)
+        self.exact_hash = np.zeros(0, dtype=np.uint64)
+        self.register_group = np.zeros(0, dtype=np.int64)
+        self.register_index = np.zeros(0, dtype=np.int64)
+        self.register_rank = np.zeros(0, dtype=np.uint8)
+
+    @classmethod
+    def from_rows(cls, windows, keys, values, precision=12):
+        sketch = cls(precision)
+        sketch.exact_group, sketch.windows, sketch.keys = _group_ids(windows, keys)
+        sketch.exact_hash = pd.util.hash_array(np.asarray(values))
+        sketch._compact()
+        return sketch
+
+    @classmethod
+    def merge_all(cls, sketches):
+        """Слияние сразу многих сводок: одна склейка вместо цепочки попарных"""
+        sketches = [sketch for sketch in sketches if len(sketch.windows)] or list(sketches)[:1]
+        if len({sketch.precision for sketch in sketches}) > 1:
+            raise ValueError("Cannot merge sketches with different precision")
+        merged = cls(sketches[0].precision)
+        # Номера групп каждой сводки переводятся в номера общего списка групп
+        ids, merged.windows, merged.keys = _group_ids(
+            np.concatenate([sketch.windows for sketch in sketches]),
+            np.concatenate([sketch.keys for sketch in sketches])
+        )
+        offsets = np.cumsum([0] + [len(sketch.windows) for sketch in sketches])
+        merged.exact_group = np.concatenate([ids[offset:][sketch.exact_group] for offset, sketch in zip(offsets, sketches)])
+        merged.exact_hash = np.concatenate([sketch.exact_hash for sketch in sketches])
+        merged.register_group = np.concatenate([ids[offset:][sketch.register_group] for offset, sketch in zip(offsets, sketches)])
+        merged.register_index = np.concatenate([sketch.register_index for sketch in sketches])
+        merged.register_rank = np.concatenate([sketch.register_rank for sketch in sketches])
+        merged._compact()
+        return merged
+
+    def merge(self, other):
+        return DistinctSketch.merge_all([self, other])
+
+    def __len__(self):
+        return len(self.exact_hash) + len(self.register_rank)
+
+    def _to_registers(self, hashes):
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        # Ранг - позиция первой единицы в оставшихся битах; сторожевой бит ограничивает его 64 - p + 1
+        rest = (hashes << np.uint64(p)) | np.uint64(1 << (p - 1))
+        rank = (65 - _bit_length(rest)).astype(np.uint8)
+        return index, rank
+
+    def _compact(self):
+        groups = len(self.windows)
+        # Повторы пар (группа, хеш) ищутся по одному смешанному 64-битному числу:
+        # совпадение разных пар так же маловероятно, как коллизия самих хешей
+        unique = ~pd.Series(self.exact_hash ^ (self.exact_group.astype(np.uint64) * _GROUP_MIX)).duplicated().to_numpy()
+        group, hashes = self.exact_group[unique], self.exact_hash[unique]
+        convert = np.bincount(group, minlength=groups) > self.limit
+        # Группа, уже перешедшая на регистры в другой сводке, переходит целиком
+        convert[self.register_group] = True
+        moved = convert[group]
+        if moved.any():
+            index, rank = self._to_registers(hashes[moved])
+            self.register_group = np.concatenate([self.register_group, group[moved]])
+            self.register_index = np.concatenate([self.register_index, index])
+            self.register_rank = np.concatenate([self.register_rank, rank])
+        self.exact_group, self.exact_hash = group[~moved], hashes[~moved]
+        if len(self.register_rank):
+            cell = self.register_group * (1 << self.precision) + self.register_index
+            rank = pd.Series(self.register_rank).groupby(cell, sort=False).max()
+            cell = rank.index.to_numpy()
+            self.register_group, self.register_index = np.divmod(cell, 1 << self.precision)
+            self.register_rank = rank.to_numpy()
+
+    def estimate(self):
+        """Таблица window, key, distinct, exact, отсортированная по окну и ключу"""
+        groups, m = len(self.windows), 1 << self.precision
+        distinct = np.bincount(self.exact_group, minlength=groups).astype(np.float64)
+        filled = np.bincount(self.register_group, minlength=groups)
+        if len(self.register_rank):
+            total = np.bincount(self.register_group, weights=np.ldexp(1.0, -self.register_rank.astype(np.int64)),
+                                minlength=groups)
+            zeros = m - filled
+            raw = _alpha(m) * m * m / (total + zeros)
+            # Линейный счёт для малых оценок, пока есть пустые регистры
+            linear = m * np.log(m / np.maximum(zeros, 1))
+            estimate = np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+            distinct = np.where(filled > 0, estimate, distinct)
+        counts = pd.DataFrame({
+            'window': self.windows, 'key': self.keys,
+            'distinct': np.rint(distinct).astype(np.int64), 'exact': filled == 0
+        })
+        return counts.sort_values(['window', 'key'], kind='stable', ignore_index=True)
+
+
+def window_rows(df, key_column, value_column, window):
+    """Начала окон (нс), ключи и значения строк без пропусков"""
+    missing = [name for name in ('timestamp', key_column, value_column) if name and name not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found: {', '.join(missing)}")
+    timestamp = df['timestamp']
+    if not pd.api.types.is_datetime64_any_dtype(timestamp):
+        timestamp = pd.to_datetime(timestamp, errors='coerce')
+    valid = timestamp.notna().to_numpy() & df[value_column].notna().to_numpy()
+    if key_column:
+        valid &= df[key_column].notna().to_numpy()
+    ns = timestamp.to_numpy(dtype='datetime64[ns]')[valid].view('int64')
+    width = int(window * NS)
+    keys = df[key_column].to_numpy()[valid] if key_column else np.zeros(len(ns), dtype=np.uint8)
+    return ns // width * width, keys, df[value_column].to_numpy()[valid]
+
+
+def distinct_table(sketch, key_column, value_column):
+    """Результат ноды: окно, ключ, число различных значений и точно ли оно"""
+    counts = sketch.estimate()
+    result = {'window_start': counts['window'].to_numpy(dtype=np.int64).view('datetime64[ns]')}
+    if key_column:
+        result[key_column] = counts['key'].to_numpy()
+    result[f"distinct_{value_column}"] = counts['distinct'].to_numpy()
+    result['exact'] = counts['exact'].to_numpy(dtype=bool)
+    return pd.DataFrame(result)
+
+
+def count_distinct(df, key_column, value_column, window, precision=12):
+    sketch = DistinctSketch.from_rows(*window_rows(df, key_column, value_column, window), precision)
+    return distinct_table(sketch, key_column, value_column)
@@ -0,0 +1,244 @@
+import os
+import re
+import sys
+import argparse
+
+import matplotlib
+matplotlib.use('Agg')  # Без GUI-бэкенда: графики только сохраняются в файлы
+
+import pandas as pd
+from matplotlib.figure import Figure
+
+from scheme import load_scheme
+from pipeline_runner import HeadlessRunner
+from sidecar import SIDECARS
+from packet_format import render_frame
+from sweep import Sweep, SweepAxis, parse_values, expand_files
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def parse_override(text):
+    """'Node name.property=value' -> ('Node name', 'property', 'value')"""
+    target, sep, value = text.partition('=')
+    node_ref, dot, name = target.rpartition('.')
+    if not sep or not dot or not node_ref or not name:
+        raise argparse.ArgumentTypeError(f"Expected NODE.PROPERTY=VALUE, got '{text}'")
+    return node_ref, name, value
+
+
+def parse_axis(text):
+    """'Node name.property=v1,v2' -> SweepAxis"""
+    node_ref, name, values = parse_override(text)
+    return SweepAxis(node_ref, name, parse_values(values))
+
+
+def parse_files_axis(text):
+    node_ref, name, pattern = parse_override(text)
+    try:
+        return SweepAxis(node_ref, name, expand_files(pattern))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _safe_filename(name, fallback):
+    return re.sub(r'[^\w\-. ]+', '_', name).strip() or fallback
+
+
+def _sink_filename(node, used):
+    base = _safe_filename(node.name, node.id)
+    if base in used:
+        base = f"{base}_{node.id[:8]}"
+    used.add(base)
+    return base
+
+
+def write_packet(packet, base):
+    data = packet.data
+    if isinstance(data, pd.DataFrame):
+        path = f"{base}.csv"
+        render_frame(data).to_csv(path, index=False)
+    elif isinstance(data, Figure):
+        path = f"{base}.png"
+        data.savefig(path, format='png', bbox_inches='tight', dpi=150)
+    else:
+        path = f"{base}.txt"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(str(data))
+    return path
+
+
+def write_outputs(nodes, output_dir):
+    written = []
+    used = set()
+    for node in nodes:
+        if node.output_data is None:
+            continue
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, _sink_filename(node, used))
+        ports = node.output_data.metadata.get('ports')
+        if ports is None:
+            written.append(write_packet(node.output_data, base))
+            continue
+        # Нода с несколькими выходами: файл на каждый заполненный порт
+        for name, packet in zip(node.ports['out'], ports):
+            if packet is not None:
+                written.append(write_packet(packet, f"{base}_{name}"))
+    return written
+
+
+def configure_runner(runner, args):
+    if args.no_cache:
+        runner.cache_enabled = False
+    if args.cache_dir:
+        runner.cache.disk_dir = args.cache_dir
+    if args.chunk_size:
+        runner.chunk_size = args.chunk_size
+    if args.keep_intermediates:
+        runner.release_intermediates = False
+    # Sidecar-файлы общие для всех нод процесса, а не для отдельного запуска
+    if args.no_sidecars:
+        SIDECARS.enabled = False
+    if args.sidecar_dir:
+        SIDECARS.directory = args.sidecar_dir
+    if args.sidecar_max_mb is not None:
+        SIDECARS.max_bytes = args.sidecar_max_mb * 1024 ** 2
+
+
+def command_run(args):
+    try:
+        scheme = load_scheme(args.scheme)
+        for node_ref, name, value in args.overrides:
+            scheme.set_property(node_ref, name, value)
+    except (OSError, ValueError, KeyError) as e:
+        log(f"Error: {e}")
+        return 2
+
+    runner = HeadlessRunner(scheme, max_workers=args.workers, log=log)
+    configure_runner(runner, args)
+    try:
+        ok = runner.run()
+    finally:
+        runner.shutdown()
+
+    for path in write_outputs(scheme.sinks(), args.output_dir):
+        log(f"Wrote {path}")
+    if args.profile:
+        runner.profiler.export_json(args.profile)
+        log(f"Wrote {args.profile}")
+    if args.trace:
+        runner.profiler.export_chrome_trace(args.trace)
+        log(f"Wrote {args.trace}")
+    return 0 if ok else 1
+
+
+def command_sweep(args):
+    axes = args.grid + args.files
+    if not axes:
+        log("Error: nothing to sweep, use --grid or --files")
+        return 2
+    try:
+        sweep = Sweep(args.scheme, axes, args.overrides, max_parallel=args.parallel,
+                      instance_workers=args.workers or 1,
+                      configure=lambda runner: configure_runner(runner, args))
+    except (OSError, ValueError, KeyError) as e:
+        log(f"Error: {e}")
+        return 2
+
+    total = len(sweep.grid())
+    done = []
+
+    def on_instance(instance):
+        done.append(instance)
+        params = ', '.join(f"{label}={value}" for label, value in instance.params.items())
+        status = 'ok' if instance.ok else f"failed: {instance.error}"
+        log(f"[{len(done)}/{total}] #{instance.index} {params}: {status} ({instance.wall * 1000:.0f} ms)")
+        # Графики и прочие нетабличные результаты пишутся по экземплярам
+        for name, packet in instance.outputs.items():
+            if not isinstance(packet.data, pd.DataFrame):
+                instance_dir = os.path.join(args.output_dir, f"instance_{instance.index:04d}")
+                os.makedirs(instance_dir, exist_ok=True)
+                write_packet(packet, os.path.join(instance_dir, _safe_filename(name, 'output')))
+
+    result = sweep.run(on_instance)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary_path = os.path.join(args.output_dir, 'sweep.csv')
+    result.summary().to_csv(summary_path)
+    log(f"Wrote {summary_path}")
+    for name in result.sink_names():
+        table = result.table(name)
+        if table is None:
+            continue
+        path = os.path.join(args.output_dir, f"{_safe_filename(name, 'output')}.csv")
+        render_frame(table).to_csv(path)
+        log(f"Wrote {path}")
+    log(f"Cache: {sweep.cache.hits} hits, {sweep.cache.misses} misses")
+    return 0 if all(instance.ok for instance in result.instances) else 1
+
+
+def add_runner_arguments(parser):
+    parser.add_argument('--workers', type=int, default=None,
+                        help='maximum number of nodes executed in parallel')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='do not reuse cached node outputs')
+    parser.add_argument('--cache-dir', default=None,
+                        help='directory for the on-disk node output cache')
+    parser.add_argument('--chunk-size', type=int, default=None, metavar='ROWS',
+                        help='stream sources in chunks of ROWS rows through row-wise nodes')
+    parser.add_argument('--keep-intermediates', action='store_true',
+                        help='keep every node output in memory until the run ends')
+    parser.add_argument('--no-sidecars', action='store_true',
+                        help='always re-parse source files instead of reading Arrow sidecars')
+    parser.add_argument('--sidecar-dir', default=None,
+                        help='directory for parsed source sidecars (default: ~/.cache/pipeline_emulator/sidecars)')
+    parser.add_argument('--sidecar-max-mb', type=int, default=None, metavar='MB',
+                        help='evict least recently used sidecars above this total size')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m pipeline_emulator',
+        description='Run Pipeline Pilot Emulator schemes without the GUI.'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='execute a scheme saved from the editor')
+    run.add_argument('scheme', help='scheme JSON file')
+    run.add_argument('-o', '--output-dir', default='output',
+                     help='directory for sink node outputs (default: ./output)')
+    run.add_argument('--set', dest='overrides', action='append', default=[],
+                     type=parse_override, metavar='NODE.PROPERTY=VALUE',
+                     help='override a node property; NODE is a node name or id')
+    run.add_argument('--profile', default=None, metavar='PATH',
+                     help='write per-node timings and memory as JSON')
+    run.add_argument('--trace', default=None, metavar='PATH',
+                     help='write a Chrome trace-event file (chrome://tracing, Perfetto)')
+    add_runner_arguments(run)
+    run.set_defaults(func=command_run)
+
+    sweep = commands.add_parser('sweep', help='run a scheme over a grid of property values or input files')
+    sweep.add_argument('scheme', help='scheme JSON file')
+    sweep.add_argument('-o', '--output-dir', default='sweep_output',
+                       help='directory for combined sink tables (default: ./sweep_output)')
+    sweep.add_argument('--grid', action='append', default=[], type=parse_axis,
+                       metavar='NODE.PROPERTY=V1,V2,...',
+                       help='sweep a property over values; use a JSON list for values with commas')
+    sweep.add_argument('--files', action='append', default=[], type=parse_files_axis,
+                       metavar='NODE.PROPERTY=GLOB',
+                       help='sweep a file property over the files matching GLOB')
+    sweep.add_argument('--set', dest='overrides', action='append', default=[],
+                       type=parse_override, metavar='NODE.PROPERTY=VALUE',
+                       help='override a node property in every instance')
+    sweep.add_argument('--parallel', type=int, default=None,
+                       help='number of scheme instances executed concurrently')
+    add_runner_arguments(sweep)
+    sweep.set_defaults(func=command_sweep)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -1,4 +1,14 @@
 ﻿class DataPacket:
     def __init__(self, data=None):
         self.data = data
-        self.metadata = {}
\ No newline at end of file
+        self.metadata = {}
+
+    def port(self, index):
+        """Данные выходного порта index. У нод с несколькими выходами пакет несёт
+        результаты всех портов в metadata['ports'], а data - первый из них"""
+        ports = self.metadata.get('ports')
+        if ports is None:
+            return self
+        if index >= len(ports) or ports[index] is None:
+            raise ValueError(f"Output port {index + 1} has no data: enable it in the node properties")
+        return ports[index]
\ No newline at end of file
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from data_packet import DataPacket
+
+# Буферы колонок пишутся в файл, который обе стороны отображают в память.
+# На Linux /dev/shm - это разделяемая память; в отличие от SharedMemory файл
+# живёт, пока его явно не удалят, поэтому работает одинаково и на Windows.
+SPILL_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+ALIGNMENT = 64
+
+_SHARED_KINDS = 'biufcmM'
+
+
+def _is_shareable(values):
+    return isinstance(values, np.ndarray) and values.dtype.kind in _SHARED_KINDS
+
+
+class _SpillWriter:
+    def __init__(self):
+        self.path = None
+        self.file = None
+        self.offset = 0
+
+    def add(self, values):
+        values = np.ascontiguousarray(values)
+        if self.file is None:
+            self.path = os.path.join(SPILL_DIR, f"pipeline_{uuid.uuid4().hex}.bin")
+            self.file = open(self.path, 'wb')
+        padding = -self.offset % ALIGNMENT
+        self.file.write(b'\0' * padding)
+        self.offset += padding
+        spec = ('spill', self.offset, values.dtype.str, values.shape)
+        self.file.write(values.reshape(-1).view(np.uint8).data)
+        self.offset += values.nbytes
+        return spec
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def _dump_values(values, writer):
+    if _is_shareable(values):
+        return writer.add(values)
+    if isinstance(values, pd.Categorical):
+        return ('categorical', _dump_values(values.codes, writer),
+                values.categories, values.ordered)
+    return ('inline', values)
+
+
+def _dump_index(index, writer):
+    if isinstance(index, pd.RangeIndex):
+        return ('range', index.start, index.stop, index.step, index.name)
+    if isinstance(index, pd.MultiIndex) or not isinstance(index.dtype, np.dtype):
+        return ('inline', index)
+    return ('values', _dump_values(index.to_numpy(), writer), index.name)
+
+
+def _dump_frame(df, writer):
+    columns = []
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        values = series.to_numpy() if isinstance(series.dtype, np.dtype) else series.array
+        columns.append(_dump_values(values, writer))
+    return ('frame', list(df.columns), columns, _dump_index(df.index, writer), df.attrs)
+
+
+def _dump(obj, writer):
+    if isinstance(obj, DataPacket):
+        data = obj.data
+        data_spec = _dump_frame(data, writer) if isinstance(data, pd.DataFrame) else ('inline', data)
+        metadata = {key: _dump(value, writer) for key, value in obj.metadata.items()}
+        return ('packet', data_spec, metadata)
+    if isinstance(obj, list):
+        return ('list', [_dump(item, writer) for item in obj])
+    return ('inline', obj)
+
+
+def dump_packet(obj):
+    """Выгружает DataPacket (или список пакетов) в спецификацию для другого процесса"""
+    writer = _SpillWriter()
+    try:
+        spec = _dump(obj, writer)
+    except Exception:
+        writer.close()
+        if writer.path:
+            os.remove(writer.path)
+        raise
+    writer.close()
+    return {'path': writer.path, 'spec': spec}
+
+
+def _load_values(spec, buffer):
+    kind = spec[0]
+    if kind == 'spill':
+        _, offset, dtype, shape = spec
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape)) if shape else 1
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(shape).copy()
+    if kind == 'categorical':
+        _, codes, categories, ordered = spec
+        return pd.Categorical.from_codes(_load_values(codes, buffer), categories, ordered=ordered)
+    return spec[1]
+
+
+def _load_index(spec, buffer):
+    kind = spec[0]
+    if kind == 'range':
+        _, start, stop, step, name = spec
+        return pd.RangeIndex(start, stop, step, name=name)
+    if kind == 'inline':
+        return spec[1]
+    return pd.Index(_load_values(spec[1], buffer), name=spec[2])
+
+
+def _load(spec, buffer):
+    kind = spec[0]
+    if kind == 'packet':
+        _, data_spec, metadata = spec
+        if data_spec[0] == 'frame':
+            _, names, columns, index, attrs = data_spec
+            index = _load_index(index, buffer)
+            data = pd.DataFrame(
+                {i: _load_values(column, buffer) for i, column in enumerate(columns)},
+                index=index
+            )
+            data.columns = pd.Index(names)
+            data.attrs.update(attrs)
+        else:
+            data = data_spec[1]
+        packet = DataPacket(data)
+        packet.metadata = {key: _load(value, buffer) for key, value in metadata.items()}
+        return packet
+    if kind == 'list':
+        return [_load(item, buffer) for item in spec[1]]
+    return spec[1]
+
+
+def load_packet(dump):
+    """Восстанавливает объект из спецификации dump_packet; буферы копируются"""
+    if dump['path'] is None:
+        return _load(dump['spec'], None)
+    if os.path.getsize(dump['path']) == 0:
+        return _load(dump['spec'], b'')
+    mapped = np.memmap(dump['path'], dtype=np.uint8, mode='r')
+    try:
+        return _load(dump['spec'], mapped)
+    finally:
+        del mapped
+
+
+def discard(dump):
+    if dump and dump['path'] and os.path.exists(dump['path']):
+        os.remove(dump['path'])
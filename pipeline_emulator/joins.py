@@ -0,0 +1,281 @@
+import numpy as np
+import pandas as pd
+
+# Соединение и склейка таблиц для Merge. Пары строк ищутся по номерам:
+# для каждой строки слева - отрезок совпадающих строк справа, а колонки
+# результата собираются одной выборкой по номерам строк. Правая сторона
+# hash join (JoinIndex) не зависит от левой, поэтому её можно хранить между
+# запусками, пока вход не изменился. Уже отсортированные по ключу входы
+# соединяются слиянием, без хеш-таблицы.
+
+JOIN_TYPES = ["Inner", "Left", "Right", "Outer", "Cross", "Semi", "Anti"]
+JOIN_ALGORITHMS = ["Auto", "Hash", "Sort-Merge"]
+# Как у pandas.merge: совпадающие имена колонок левой и правой таблиц
+SUFFIXES = ('_x', '_y')
+
+
+def stable_order(values):
+    """Устойчивый порядок строк по значениям (argsort kind='stable').
+
+    Целые значения и номер строки упаковываются в одно int64: обычная
+    сортировка чисел в разы быстрее устойчивого argsort, а номер строки -
+    остаток от деления.
+    """
+    n = len(values)
+    if n and values.dtype.kind in 'iu':
+        low, high = int(values.min()), int(values.max())
+        if high < 2 ** 63 and (high - low + 1) * n < 2 ** 63:
+            return np.sort((values.astype(np.int64) - low) * n + np.arange(n)) % n
+    return np.argsort(values, kind='stable')
+
+
+def _groups(codes, count):
+    """Строки каждой группы подряд: начала групп и rows"""
+    starts = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=count), out=starts[1:])
+    return starts, stable_order(codes)
+
+
+def _matches(position, starts):
+    """Начало и число совпадений в rows для номеров групп (-1 - группы нет)"""
+    # Номер -1 попадает на добавленную в конец пустую группу
+    first = np.append(starts[:-1], starts[-1])[position]
+    return first, np.append(starts[1:], starts[-1])[position] - first
+
+
+class JoinIndex:
+    """Построенная сторона hash join: строки таблицы, сгруппированные по ключу.
+
+    Строки с ключом uniques[i] - rows[starts[i]:starts[i + 1]] в исходном
+    порядке. Пропуски ключа совпадают друг с другом, как в pandas.merge.
+    """
+
+    def __init__(self, keys):
+        codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+        self.size = len(keys)
+        self.uniques = pd.Index(uniques)
+        self.starts, self.rows = _groups(codes, len(uniques))
+        # Хеш-таблица Index строится при первом поиске - строим её сразу, чтобы хранить вместе с индексом
+        self.uniques.get_indexer(uniques[:1])
+
+    def match(self, keys):
+        """Начало и число совпадений в rows для каждого ключа и сами rows"""
+        return _matches(self.uniques.get_indexer(keys), self.starts) + (self.rows,)
+
+
+def join_keys(df, key):
+    if key not in df.columns:
+        raise ValueError(f"Invalid join key: {key}")
+    return df[key].to_numpy()
+
+
+def is_sorted(keys):
+    # Пропуски и несравнимые значения делают Index немонотонным
+    return pd.Index(keys).is_monotonic_increasing
+
+
+def join_algorithm(left, right, key, algorithm='Auto'):
+    """Hash или Sort-Merge для пары таблиц; Auto сливает уже отсортированные входы"""
+    if algorithm == 'Auto':
+        return 'Sort-Merge' if is_sorted(join_keys(left, key)) and is_sorted(join_keys(right, key)) else 'Hash'
+    if algorithm not in JOIN_ALGORITHMS:
+        raise ValueError(f"Unknown join algorithm: {algorithm}")
+    return algorithm
+
+
+def _hash_match(left_keys, right_keys):
+    """Hash join без сохранения индекса: одна хеш-таблица на ключи обеих сторон"""
+    codes = pd.factorize(np.concatenate([right_keys, left_keys]), use_na_sentinel=False)[0]
+    right_codes, left_codes = codes[:len(right_keys)], codes[len(right_keys):]
+    # Ключи справа нумеруются первыми: номер ключа, которого справа нет, не меньше их числа
+    count = int(right_codes.max()) + 1 if len(right_codes) else 0
+    starts, rows = _groups(right_codes, count)
+    return _matches(np.where(left_codes < count, left_codes, -1), starts) + (rows,)
+
+
+def _same(a, b):
+    return (a == b) | (pd.isna(a) & pd.isna(b))
+
+
+def _sorted_match(left_keys, right_keys):
+    """Совпадения с отсортированными ключами справа: границы их отрезков и двоичный поиск"""
+    if not len(right_keys):
+        return _matches(np.full(len(left_keys), -1), np.zeros(1, dtype=np.int64))
+    starts = np.concatenate([[0], np.flatnonzero(~_same(right_keys[1:], right_keys[:-1])) + 1, [len(right_keys)]])
+    uniques = right_keys[starts[:-1]]
+    position = np.searchsorted(uniques, left_keys)
+    found = position < len(uniques)
+    found[found] = _same(uniques[position[found]], left_keys[found])
+    return _matches(np.where(found, position, -1), starts)
+
+
+def _sort_merge(left_keys, right_keys):
+    """Слияние по отсортированной правой стороне; неотсортированная сортируется.
+
+    Левая сторона не сортируется: для отсортированной двоичный поиск идёт
+    подряд по памяти, как слияние, а иначе порядок строк слева не важен.
+    """
+    try:
+        order = np.arange(len(right_keys)) if is_sorted(right_keys) else stable_order(right_keys)
+        return _sorted_match(left_keys, right_keys[order]) + (order,)
+    except TypeError:
+        # Несравнимые ключи (строки вперемешку с пропусками) сливать нельзя - остаётся hash join
+        return None
+
+
+def _expand(first, counts, rows, keep_unmatched):
+    """Пары (строка слева, строка справа) в порядке строк слева; -1 - строки без пары"""
+    if not len(counts) or counts.max() <= 1:
+        # Ключи справа уникальны (частый случай - справа справочник): пар не больше одной
+        left_rows = np.arange(len(counts)) if keep_unmatched else np.flatnonzero(counts)
+        right_rows = np.full(len(left_rows), -1, dtype=np.int64)
+        matched = counts[left_rows] > 0
+        right_rows[matched] = rows[first[left_rows[matched]]]
+        return left_rows, right_rows
+    emitted = np.maximum(counts, 1) if keep_unmatched else counts
+    left_rows = np.repeat(np.arange(len(counts)), emitted)
+    offset = np.arange(len(left_rows)) - np.repeat(np.cumsum(emitted) - emitted, emitted)
+    right_rows = np.full(len(left_rows), -1, dtype=np.int64)
+    matched = np.repeat(counts > 0, emitted)
+    right_rows[matched] = rows[np.repeat(first, emitted)[matched] + offset[matched]]
+    return left_rows, right_rows
+
+
+def _take(series, rows):
+    # -1 - пропуск: целые становятся float, как в pandas.merge
+    fill = bool((rows < 0).any())
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+        return series.array.take(rows, allow_fill=fill)
+    return pd.api.extensions.take(series.to_numpy(), rows, allow_fill=fill)
+
+
+def _key_values(left, right, left_rows, right_rows, key):
+    # Колонка ключа одна: значение слева, у строк только правой таблицы - справа
+    missing = left_rows < 0
+    if not missing.any():
+        return _take(left[key], left_rows)
+    # Общий тип ключей обеих сторон определяет pandas
+    both = pd.concat([left[key], right[key]], ignore_index=True)
+    return _take(both, np.where(missing, len(left) + right_rows, left_rows))
+
+
+def _key_order(values):
+    """Устойчивый порядок по ключу, пропуски в конце"""
+    if not isinstance(values, np.ndarray):
+        return values.argsort(kind='stable')
+    try:
+        return stable_order(values)
+    except TypeError:
+        return np.argsort(pd.factorize(values, sort=True, use_na_sentinel=False)[0], kind='stable')
+
+
+def _assemble(left, right, left_rows, right_rows, key, key_values):
+    columns = {}
+    right_names = [name for name in right.columns if name != key]
+    for name in left.columns:
+        if name == key:
+            columns[name] = key_values
+        else:
+            columns[f"{name}{SUFFIXES[0]}" if name in right_names else name] = _take(left[name], left_rows)
+    for name in right_names:
+        columns[f"{name}{SUFFIXES[1]}" if name in left.columns else name] = _take(right[name], right_rows)
+    return pd.DataFrame(columns, copy=False)
+
+
+def cross_join(left, right):
+    left_rows = np.repeat(np.arange(len(left)), len(right))
+    right_rows = np.tile(np.arange(len(right)), len(left))
+    columns = {}
+    for name in left.columns:
+        columns[f"{name}{SUFFIXES[0]}" if name in right.columns else name] = _take(left[name], left_rows)
+    for name in right.columns:
+        columns[f"{name}{SUFFIXES[1]}" if name in left.columns else name] = _take(right[name], right_rows)
+    return pd.DataFrame(columns, copy=False)
+
+
+def join_frames(left, right, key, how='Outer', algorithm='Auto', index=None):
+    """Соединение двух таблиц по колонке key.
+
+    Inner и Left сохраняют порядок строк слева, Right - справа, Outer
+    сортирует по ключу, как pandas.merge. Semi и Anti оставляют строки слева
+    с парой и без пары. index - готовый JoinIndex правой таблицы.
+    """
+    if how not in JOIN_TYPES:
+        raise ValueError(f"Unknown join type: {how}")
+    if how == 'Cross':
+        return cross_join(left, right)
+    left_keys, right_keys = join_keys(left, key), join_keys(right, key)
+    matches = None
+    if index is not None:
+        if index.size != len(right):
+            raise ValueError("Join index does not match the input")
+        matches = index.match(left_keys)
+    elif join_algorithm(left, right, key, algorithm) == 'Sort-Merge':
+        matches = _sort_merge(left_keys, right_keys)
+    first, counts, rows = matches or _hash_match(left_keys, right_keys)
+    if how in ('Semi', 'Anti'):
+        return left[(counts > 0) == (how == 'Semi')].reset_index(drop=True)
+
+    left_rows, right_rows = _expand(first, counts, rows, how in ('Left', 'Outer'))
+    if how in ('Right', 'Outer'):
+        # Строки справа без пары дописываются в конец
+        matched = np.zeros(len(right), dtype=bool)
+        matched[right_rows[right_rows >= 0]] = True
+        unmatched = np.flatnonzero(~matched)
+        left_rows = np.concatenate([left_rows, np.full(len(unmatched), -1, dtype=np.int64)])
+        right_rows = np.concatenate([right_rows, unmatched])
+    if how == 'Right':
+        # Пары уже идут по строкам слева, устойчивая сортировка по строкам справа сохраняет этот порядок
+        order = stable_order(right_rows)
+        left_rows, right_rows = left_rows[order], right_rows[order]
+    key_values = _key_values(left, right, left_rows, right_rows, key)
+    if how == 'Outer':
+        order = _key_order(key_values)
+        left_rows, right_rows, key_values = left_rows[order], right_rows[order], key_values[order]
+    return _assemble(left, right, left_rows, right_rows, key, key_values)
+
+
+def _column_dtype(dtypes, complete):
+    """Общий numpy-тип колонки склейки или None, если его определяет pandas"""
+    if not all(isinstance(dtype, np.dtype) for dtype in dtypes):
+        return None
+    kinds = {dtype.kind for dtype in dtypes}
+    if kinds <= set('iuf'):
+        dtype = np.result_type(*dtypes)
+        # Пропуски у таблиц без колонки: целые становятся float
+        return dtype if complete or dtype.kind == 'f' else np.dtype(np.float64)
+    if kinds <= {'M'} or kinds <= {'m'} or (kinds == {'b'} and complete):
+        return np.result_type(*dtypes)
+    return None
+
+
+def concat_frames(frames):
+    """Склейка таблиц строками: каждая колонка результата выделяется один раз.
+
+    Типы и порядок колонок - как у pandas.concat; колонки, общий тип которых
+    не сводится к numpy (строки, категории, смешанные типы), склеивает pandas.
+    """
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    if any(not frame.columns.is_unique for frame in frames):
+        return pd.concat(frames, ignore_index=True)
+    names = list(dict.fromkeys(name for frame in frames for name in frame.columns))
+    sizes = [len(frame) for frame in frames]
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    columns = {}
+    for name in names:
+        present = [frame for frame in frames if name in frame.columns]
+        complete = len(present) == len(frames)
+        dtype = _column_dtype([frame[name].dtype for frame in present], complete)
+        if dtype is None:
+            parts = [frame[[name]] if name in frame.columns else pd.DataFrame(index=pd.RangeIndex(len(frame)))
+                     for frame in frames]
+            columns[name] = pd.concat(parts, ignore_index=True)[name]
+            continue
+        values = np.empty(offsets[-1], dtype=dtype)
+        # NaN в типе колонки: NaN для float, NaT для времени
+        gap = None if complete else np.array(np.nan).astype(dtype)
+        for frame, start, stop in zip(frames, offsets[:-1], offsets[1:]):
+            values[start:stop] = frame[name].to_numpy() if name in frame.columns else gap
+        columns[name] = values
+    return pd.DataFrame(columns, copy=False)
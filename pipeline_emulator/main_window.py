@@ -4,8 +4,12 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 import json
 from tkinter import colorchooser
-from node import Node, snap, NODE_LIBRARY
+from node import Node, snap, NODE_LIBRARY, upgrade_properties
 from pipeline_runner import PipelineRunner
+from process_pool import shutdown_pool
+from pipeline_graph import PipelineGraph
+from sidecar import SIDECARS
+from packet_format import render_frame
 import pandas as pd
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
@@ -68,8 +72,9 @@ class PipelinePilotEmulator(tk.Tk):
         self.new_node_type = None
         self.connect_mode = False
         self.edge_start = None
+        self.edge_start_port = 0
         self.nodes = {}
-        self.edges = []
+        self.graph = PipelineGraph()
         self.selected_node = None
         self.selected_edge = None
         self.snap_to_grid = False
@@ -83,11 +88,21 @@ class PipelinePilotEmulator(tk.Tk):
         self.base_grid_size = 20
         self.visible_grid_size = self.base_grid_size
         self.current_data = None
+        self.runner = PipelineRunner(self)
+        self.workers_var = tk.IntVar(value=self.runner.max_workers)
+        self.cache_var = tk.BooleanVar(value=self.runner.cache_enabled)
+        self.chunk_var = tk.StringVar(value="")
+        self.sidecar_var = tk.BooleanVar(value=SIDECARS.enabled)
         
         self._create_widgets()
         self.canvas.bind("<Configure>", self._handle_canvas_resize)
         self.canvas.bind("<B2-Motion>", lambda e: self._update_grid())
-        self.runner = PipelineRunner(self)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        self.runner.shutdown()
+        shutdown_pool()
+        self.destroy()
 
     def _create_widgets(self):
         toolbar = tk.Frame(self, bg=self.MAIN_BG)
@@ -102,6 +117,7 @@ class PipelinePilotEmulator(tk.Tk):
             ("Delete", "Delete item", self.delete_selected),
             ("Save", "Save pipeline in folder", self.save_scheme),
             ("Load", "Load pipeline", self.load_scheme),
+            ("Profile", "Export last run profile and Chrome trace", self.export_profile),
             ("Cancel", "Cancel action", self.disable_modes)
         ]:
             btn = ttk.Button(left_toolbar, text=txt, command=cmd, style='Main.TButton')
@@ -234,6 +250,45 @@ class PipelinePilotEmulator(tk.Tk):
         )
         grid_check.pack(side=tk.LEFT, padx=5, pady=2)
 
+        ttk.Label(status, text="Workers:").pack(side=tk.LEFT, padx=(15, 2), pady=2)
+        workers_spin = ttk.Spinbox(
+            status,
+            from_=1,
+            to=64,
+            width=4,
+            textvariable=self.workers_var,
+            command=self.set_max_workers
+        )
+        workers_spin.pack(side=tk.LEFT, pady=2)
+        workers_spin.bind("<Return>", lambda e: self.set_max_workers())
+        workers_spin.bind("<FocusOut>", lambda e: self.set_max_workers())
+
+        cache_check = ttk.Checkbutton(
+            status,
+            text="Cache",
+            variable=self.cache_var,
+            command=self.toggle_cache
+        )
+        cache_check.pack(side=tk.LEFT, padx=(15, 5), pady=2)
+
+        sidecar_check = ttk.Checkbutton(
+            status,
+            text="Sidecars",
+            variable=self.sidecar_var,
+            command=self.toggle_sidecars
+        )
+        sidecar_check.pack(side=tk.LEFT, padx=(5, 0), pady=2)
+        sidecar_dir_button = ttk.Button(status, text="...", width=3, command=self.choose_sidecar_dir)
+        sidecar_dir_button.pack(side=tk.LEFT, pady=2)
+        self._create_tooltip(sidecar_dir_button, "Sidecar folder")
+
+        # Пустое поле - потоковый режим выключен
+        ttk.Label(status, text="Chunk rows:").pack(side=tk.LEFT, padx=(15, 2), pady=2)
+        chunk_entry = ttk.Entry(status, width=9, textvariable=self.chunk_var)
+        chunk_entry.pack(side=tk.LEFT, pady=2)
+        chunk_entry.bind("<Return>", lambda e: self.set_chunk_size())
+        chunk_entry.bind("<FocusOut>", lambda e: self.set_chunk_size())
+
         self.canvas.bind("<Button-1>", self.on_canvas_click)
         self.canvas.bind("<ButtonPress-3>", self.start_pan)
         self.canvas.bind("<B3-Motion>", self.do_pan)
@@ -293,6 +348,42 @@ class PipelinePilotEmulator(tk.Tk):
         self._update_grid()
         self.log.insert(tk.END, f"Grid {'on' if self.grid_visible else 'off'}\n")
 
+    def set_max_workers(self):
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except (tk.TclError, ValueError):
+            workers = self.runner.max_workers
+        self.workers_var.set(workers)
+        self.runner.max_workers = workers
+
+    def set_chunk_size(self):
+        try:
+            chunk_size = int(self.chunk_var.get())
+        except ValueError:
+            chunk_size = None
+        if chunk_size is not None and chunk_size <= 0:
+            chunk_size = None
+        self.chunk_var.set("" if chunk_size is None else str(chunk_size))
+        if chunk_size != self.runner.chunk_size:
+            self.runner.chunk_size = chunk_size
+            self.log.insert(tk.END, f"Streaming {'off' if chunk_size is None else f'on, {chunk_size} rows per chunk'}\n")
+
+    def toggle_cache(self):
+        self.runner.cache_enabled = self.cache_var.get()
+        if not self.runner.cache_enabled:
+            self.runner.cache.clear()
+        self.log.insert(tk.END, f"Node cache {'on' if self.runner.cache_enabled else 'off'}\n")
+
+    def toggle_sidecars(self):
+        SIDECARS.enabled = self.sidecar_var.get()
+        self.log.insert(tk.END, f"Sidecars {'on' if SIDECARS.enabled else 'off'}\n")
+
+    def choose_sidecar_dir(self):
+        directory = filedialog.askdirectory(initialdir=SIDECARS.directory, title="Sidecar folder")
+        if directory:
+            SIDECARS.directory = directory
+            self.log.insert(tk.END, f"Sidecar folder: {directory}\n")
+
     def _create_tooltip(self, widget, text):
         from tkinter import Toplevel, Label
         widget.bind("<Enter>", lambda e: self._show_tooltip(widget, text))
@@ -342,9 +433,9 @@ class PipelinePilotEmulator(tk.Tk):
         for n in self.nodes.values():
             x0,y0,x1,y1 = self.canvas.coords(n.rect)
             cx,cy = (x0+x1)/2,(y0+y1)/2
-            data['nodes'].append({'id':n.id,'type':n.type,'name':n.name,'properties':n.properties,'x':cx,'y':cy})
-        for src,dst,_ in self.edges:
-            data['edges'].append({'src':src,'dst':dst})
+            data['nodes'].append({'id':n.id,'type':n.type,'name':n.name,'properties':n.properties,'x':cx,'y':cy,'pinned':n.pinned})
+        for e in self.graph:
+            data['edges'].append({'src':e.src,'dst':e.dst,'src_port':e.src_port,'dst_port':e.dst_port})
         try:
             with open(path,'w') as f: json.dump(data,f,indent=2)
         except Exception as e:
@@ -358,18 +449,23 @@ class PipelinePilotEmulator(tk.Tk):
         except Exception as e:
             messagebox.showerror("Error",f"Could not load file: {e}"); return
         for n in list(self.nodes.values()): self.delete_node(n)
-        for _,_,line in list(self.edges): self.canvas.delete(line)
-        self.edges.clear(); self.nodes.clear(); self._clear_props(); self.selected_node=None; self.selected_edge=None
+        for e in self.graph: self.canvas.delete(e.line)
+        self.graph.clear(); self.nodes.clear(); self._clear_props(); self.selected_node=None; self.selected_edge=None
+        port_maps = {}
         for nd in data.get('nodes',[]):
             n = Node(self.canvas, nd['x'], nd['y'], self, node_id=nd['id'], node_type=nd['type'])
             n.update_font_scale(self.scale_factor)
             n.name=nd.get('name',n.type)
             self.canvas.itemconfig(n.text,text=n.name)
             n.properties=nd.get('properties',{})
+            port_maps[n.id]=upgrade_properties(n)
+            n.update_ports()
+            n.set_pinned(nd.get('pinned',False))
             self.nodes[n.id]=n
         for ed in data.get('edges',[]):
             n1=self.nodes.get(ed['src']); n2=self.nodes.get(ed['dst'])
-            if n1 and n2: self.create_edge(n1,n2)
+            src_port=ed.get('src_port',0)
+            if n1 and n2: self.create_edge(n1,n2,port_maps[n1.id].get(src_port,src_port),ed.get('dst_port'),restore=True)
 
     def open_type_selector(self):
         self.disable_modes()
@@ -406,47 +502,69 @@ class PipelinePilotEmulator(tk.Tk):
             self.edge_start.highlight(False)
             self.edge_start = None
 
-    def handle_connection(self, node):
+    def handle_connection(self, node, out_port=0):
         if not self.connect_mode:
             return
         
         if not self.edge_start:
             self.edge_start = node
+            self.edge_start_port = out_port
             node.highlight(True)
         else:
             # Проверка на существующее соединение
-            existing = any(
-                e for e in self.edges 
-                if (e[0] == self.edge_start.id and e[1] == node.id) or 
-                   (e[0] == node.id and e[1] == self.edge_start.id)
-            )
-            if existing:
+            if self.graph.connected(self.edge_start.id, node.id):
                 messagebox.showerror("Error", "Connection already exists")
                 self.edge_start.highlight(False)
                 self.edge_start = None
                 return
             
-            self.create_edge(self.edge_start, node)
+            self.create_edge(self.edge_start, node, self.edge_start_port)
             self.connect_mode = False
             self.edge_start.highlight(False)
             self.edge_start = None
 
-    def create_edge(self, n1, n2):
+    def create_edge(self, n1, n2, src_port=0, dst_port=None, restore=False):
+        # Входы привязаны к портам явно: первый свободный порт, если не задан.
+        # При загрузке (restore) ребро к входу сверх текущего числа входов
+        # сохраняется недействительным, как после уменьшения числа входов
+        in_count = len(n2.ports['in'])
+        if dst_port is None or any(e.dst_port == dst_port for e in self.graph.predecessors(n2.id)):
+            dst_port = self.graph.free_port(n2.id, in_count)
+        if dst_port is None or (dst_port >= in_count and not (restore and 'in_count' in n2.ports)):
+            if in_count == 0:
+                messagebox.showerror("Error", f"{n2.type} node has no inputs")
+            else:
+                messagebox.showerror("Error", f"{n2.type} node can only have {in_count} input(s)")
+            return
+
+        if src_port >= len(n1.ports['out']):
+            src_port = 0
+        line = self.canvas.create_line(
+            *self._edge_coords(n1, n2, dst_port, src_port),
+            arrow=tk.LAST,
+            width=2,
+            smooth=True,
+            splinesteps=5,
+            tags=("connection",)
+        )
+    
+        self.canvas.tag_bind(line, "<Button-1>", self.on_edge_click)
+        self._style_line(self.graph.add_edge(n1.id, n2.id, line, src_port, dst_port))
+        self.runner.mark_dirty(n2)
+
+    def _edge_coords(self, n1, n2, dst_port, src_port=0):
         x1a, y1a, x1b, y1b = self.canvas.coords(n1.rect)
         x2a, y2a, x2b, y2b = self.canvas.coords(n2.rect)
     
         center_x1 = (x1a + x1b) / 2
         center_y1 = (y1a + y1b) / 2
+        center_x2 = (x2a + x2b) / 2
+        center_y2 = (y2a + y2b) / 2
+        multi_input = len(n2.ports['in']) > 1
 
-        # Определяем конечную точку для Merge-ноды
-        if n2.type == "Merge":
-            existing_inputs = len([e for e in self.edges if e[1] == n2.id])
-            if existing_inputs >= 2:
-                messagebox.showerror("Error", "Merge node can only have two inputs")
-                return
-            port_number = existing_inputs + 1
-            port_tag = f"{n2.id}&&in_port_{port_number}"  # Тег включает ID ноды
-            port_id = self.canvas.find_withtag(port_tag)  # Теперь находит порт
+        # Определяем конечную точку: для нод с несколькими входами - центр порта
+        if multi_input:
+            port_id = self.canvas.find_withtag(f"{n2.id}&&in_port_{dst_port + 1}")
             if port_id:
                 port_coords = self.canvas.coords(port_id)
                 end_x = (port_coords[0] + port_coords[2]) / 2
@@ -454,45 +572,31 @@ class PipelinePilotEmulator(tk.Tk):
             else:
                 # Резервный вариант (если порт не найден)
                 end_x = x2a
-                end_y = (y2a + y2b) / 2
-            line_tags = ("connection", f"merge_port_{port_number}")
+                end_y = center_y2
         else:
-            # Логика для других нод
-            center_x2 = (x2a + x2b) / 2
-            center_y2 = (y2a + y2b) / 2
-            if center_x2 > center_x1:
-                end_x = x2a
-            else:
-                end_x = x2b
+            end_x = x2a if center_x2 > center_x1 else x2b
             end_y = center_y2
-            line_tags = ("connection",)
 
-        # Определяем начальную точку
-        if n2.type == "Merge" or (n2.type != "Merge" and center_x2 > center_x1):
+        # Определяем начальную точку: для нод с несколькими выходами - центр порта
+        start_y = center_y1
+        multi_output = len(n1.ports['out']) > 1
+        port_id = self.canvas.find_withtag(f"{n1.id}&&out_port_{src_port + 1}") if multi_output else None
+        if port_id:
+            port_coords = self.canvas.coords(port_id)
+            start_x = (port_coords[0] + port_coords[2]) / 2
+            start_y = (port_coords[1] + port_coords[3]) / 2
+        elif multi_input or center_x2 > center_x1:
             start_x = x1b
         else:
             start_x = x1a
 
-        # Создаём линию
-        line_coords = [
-            start_x, center_y1,
-            (start_x + end_x)/2, center_y1,
+        return [
+            start_x, start_y,
+            (start_x + end_x)/2, start_y,
             (start_x + end_x)/2, end_y,
             end_x, end_y
         ]
 
-        line = self.canvas.create_line(
-            *line_coords,
-            arrow=tk.LAST,
-            width=2,
-            smooth=True,
-            splinesteps=5,
-            tags=line_tags
-        )
-    
-        self.canvas.tag_bind(line, "<Button-1>", self.on_edge_click)
-        self.edges.append((n1.id, n2.id, line))
-
     def on_edge_click(self,event):
         lid=self.canvas.find_withtag('current')[0]
         self._deselect_all(); self.selected_edge=lid
@@ -502,13 +606,15 @@ class PipelinePilotEmulator(tk.Tk):
         if self.selected_node: self.delete_node(self.selected_node)
         elif self.selected_edge:
             lid=self.selected_edge; self.canvas.delete(lid)
-            self.edges=[e for e in self.edges if e[2]!=lid]
+            e=self.graph.remove_edge(lid)
+            if e: self.runner.mark_dirty(e.dst)
 
     def delete_node(self, node):
-        for src, dst, line in self.edges[:]:
-            if node.id in (src, dst):
-                self.canvas.delete(line)
-                self.edges.remove((src, dst, line))
+        for edge in self.graph.remove_node(node.id):
+            self.canvas.delete(edge.line)
+            if edge.src == node.id:
+                self.runner.mark_dirty(edge.dst)
+        self.runner.forget_node(node)
         self.canvas.delete(node.id)
         del self.nodes[node.id]
         self._clear_props()
@@ -535,6 +641,9 @@ class PipelinePilotEmulator(tk.Tk):
             self.selected_node = None
         if self.selected_edge:
             self.canvas.itemconfig(self.selected_edge, fill="black", width=2)
+            edge = self.graph.edge(self.selected_edge)
+            if edge:
+                self._style_line(edge)
             self.selected_edge = None
         self._clear_props()
 
@@ -599,9 +708,9 @@ class PipelinePilotEmulator(tk.Tk):
                     width=25
                 )
                 cb.pack(side=tk.LEFT, fill=tk.X, expand=True)
-                var.trace_add('write', lambda *a: node.properties.update({
-                    prop_def['name']: var.get()
-                }))
+                var.trace_add('write', lambda *a: node.set_property(
+                    prop_def['name'], var.get()
+                ))
 
             elif prop_type == 'int':
                 var = tk.StringVar(value=str(current_value))
@@ -614,9 +723,15 @@ class PipelinePilotEmulator(tk.Tk):
                     width=28
                 )
                 entry.pack(side=tk.LEFT)
-                var.trace_add('write', lambda *a: node.properties.update({
-                    prop_def['name']: int(var.get()) if var.get().isdigit() else prop_def.get('default', 0)
-                }))
+
+                def apply_int(event=None):
+                    # Число применяется по Enter или уходу фокуса, а не на каждое нажатие:
+                    # пустое поле посреди набора сбросило бы, например, число входов Merge
+                    if var.get().isdigit():
+                        node.set_property(prop_def['name'], int(var.get()))
+                    var.set(str(node.properties.get(prop_def['name'], prop_def.get('default', 0))))
+                entry.bind("<Return>", apply_int)
+                entry.bind("<FocusOut>", apply_int)
 
             elif prop_type == 'color':
                 default_color = prop_def.get('default', '#FFFFFF')
@@ -646,7 +761,7 @@ class PipelinePilotEmulator(tk.Tk):
                 def update_color(*args):
                     color = var.get() or default_color
                     preview.config(bg=color)
-                    node.properties.update({prop_def['name']: color})
+                    node.set_property(prop_def['name'], color)
     
                 var.trace_add('write', update_color)
 
@@ -665,9 +780,9 @@ class PipelinePilotEmulator(tk.Tk):
                     width=3,
                     command=lambda: self._choose_file(var, prop_def)
                 ).pack(side=tk.LEFT, padx=5)
-                var.trace_add('write', lambda *a: node.properties.update({
-                    prop_def['name']: var.get()
-                }))
+                var.trace_add('write', lambda *a: node.set_property(
+                    prop_def['name'], var.get()
+                ))
 
             elif prop_type == 'text':
                 var = tk.StringVar(value=current_value)
@@ -677,17 +792,40 @@ class PipelinePilotEmulator(tk.Tk):
                     width=28
                 )
                 entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
-                var.trace_add('write', lambda *a: node.properties.update({
-                    prop_def['name']: var.get()
-                }))
+                var.trace_add('write', lambda *a: node.set_property(
+                    prop_def['name'], var.get()
+                ))
+
+            elif prop_type == 'multiselect':
+                # Отмеченные варианты хранятся списком в порядке options
+                selected = current_value if isinstance(current_value, list) else [current_value]
+                checks = []
+                for option in prop_def['options']:
+                    option_var = tk.BooleanVar(value=option in selected)
+                    ttk.Checkbutton(control_frame, text=option, variable=option_var).pack(anchor='w')
+                    checks.append((option, option_var))
+                for _, option_var in checks:
+                    option_var.trace_add('write', lambda *a: node.set_property(
+                        prop_def['name'], [option for option, checked in checks if checked.get()]
+                    ))
+
+            elif prop_type == 'bool':
+                var = tk.BooleanVar(value=bool(current_value))
+                ttk.Checkbutton(
+                    control_frame,
+                    variable=var
+                ).pack(side=tk.LEFT)
+                var.trace_add('write', lambda *a: node.set_property(
+                    prop_def['name'], var.get()
+                ))
 
             elif prop_type == 'script':
                 txt = tk.Text(control_frame, height=6, width=40)
                 txt.insert('1.0', current_value)
                 txt.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-                txt.bind('<KeyRelease>', lambda e: node.properties.update({
-                    prop_def['name']: txt.get('1.0','end-1c')
-                }))
+                txt.bind('<KeyRelease>', lambda e: node.set_property(
+                    prop_def['name'], txt.get('1.0','end-1c')
+                ))
 
             return frame
 
@@ -772,60 +910,19 @@ class PipelinePilotEmulator(tk.Tk):
             messagebox.showerror("Preview Error", str(e))
 
     def update_edges(self, moved_node):
-        for edge in self.edges:
-            src_id, dst_id, line = edge
-            if src_id == moved_node.id or dst_id == moved_node.id:
-                self._update_line(src_id, dst_id, line)
+        for edge in self.graph.edges_of(moved_node.id):
+            self._update_line(edge)
 
-    def _update_line(self, id1, id2, line):
-        n1, n2 = self.nodes[id1], self.nodes[id2]
-        x1a, y1a, x1b, y1b = self.canvas.coords(n1.rect)
-        x2a, y2a, x2b, y2b = self.canvas.coords(n2.rect)
-    
-        center_x1 = (x1a + x1b) / 2
-        center_y1 = (y1a + y1b) / 2
+    def _update_line(self, edge):
+        n1, n2 = self.nodes[edge.src], self.nodes[edge.dst]
+        self.canvas.coords(edge.line, *self._edge_coords(n1, n2, edge.dst_port, edge.src_port))
+        self._style_line(edge)
 
-        if n2.type == "Merge":
-            # Получаем номер порта из тегов линии
-            tags = self.canvas.gettags(line)
-            port_tag = next((t for t in tags if t.startswith("merge_port_")), None)
-            if port_tag:
-                port_number = port_tag.split("_")[-1]
-                port_id = self.canvas.find_withtag(f"{n2.id}&&in_port_{port_number}")
-                if port_id:
-                    port_coords = self.canvas.coords(port_id)
-                    end_x = (port_coords[0] + port_coords[2]) / 2
-                    end_y = (port_coords[1] + port_coords[3]) / 2
-                else:
-                    # Резервный вариант
-                    end_x = x2a
-                    end_y = (y2a + y2b) / 2
-            else:
-                end_x = x2a
-                end_y = (y2a + y2b) / 2
-        else:
-            center_x2 = (x2a + x2b) / 2
-            center_y2 = (y2a + y2b) / 2
-            if center_x2 > center_x1:
-                end_x = x2a
-            else:
-                end_x = x2b
-            end_y = center_y2
-
-        # Определяем начальную точку
-        if n2.type == "Merge" or (n2.type != "Merge" and ( (x2a + x2b)/2 > center_x1 )):
-            start_x = x1b
-        else:
-            start_x = x1a
-
-        new_coords = [
-            start_x, center_y1,
-            (start_x + end_x)/2, center_y1,
-            (start_x + end_x)/2, end_y,
-            end_x, end_y
-        ]
-    
-        self.canvas.coords(line, *new_coords)
+    def _style_line(self, edge):
+        # Ребро к входу, которого больше нет, - красный пунктир; запуск ноды с ним
+        # сообщит об ошибке, пока входы не вернут или ребро не удалят
+        missing = edge.dst_port >= len(self.nodes[edge.dst].ports['in'])
+        self.canvas.itemconfig(edge.line, fill="red" if missing else "black", dash=(4, 2) if missing else "")
 
     def run_pipeline(self):
         self.log.delete(1.0, tk.END)
@@ -837,6 +934,20 @@ class PipelinePilotEmulator(tk.Tk):
             self.log.insert(tk.END, f"Error: {str(e)}\n")
             messagebox.showerror("Execution Error", str(e))
 
+    def export_profile(self):
+        if not self.runner.profiler.records:
+            messagebox.showinfo("Info", "Run pipeline to collect a profile")
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[('JSON files','*.json')])
+        if not path: return
+        trace_path = os.path.splitext(path)[0] + '.trace.json'
+        try:
+            self.runner.profiler.export_json(path)
+            self.runner.profiler.export_chrome_trace(trace_path)
+            self.log.insert(tk.END, f"Profile saved to {path}\nChrome trace saved to {trace_path}\n")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not save profile: {e}")
+
     def pause_pipeline(self): self.log.insert(tk.END,"Paused\n")
 
     def stop_pipeline(self):
@@ -872,7 +983,7 @@ class PipelinePilotEmulator(tk.Tk):
             self.preview_tree.column(col, anchor=tk.W, width=100, minwidth=50)
             self.preview_tree.heading(col, text=col, anchor=tk.W)
     
-        for _, row in df.head(50).iterrows():
+        for _, row in render_frame(df.head(50)).iterrows():
             self.preview_tree.insert("", "end", values=list(row))
     
         self.preview_frame.grid_columnconfigure(0, weight=1)
@@ -947,7 +1058,7 @@ class PipelinePilotEmulator(tk.Tk):
         if not filepath:
             return
         try:
-            self.current_data.to_csv(filepath, index=False)
+            render_frame(self.current_data).to_csv(filepath, index=False)
             if app == 'notepad':
                 if os.name == 'nt':
                     subprocess.run(['notepad.exe', filepath], check=True)
@@ -978,7 +1089,7 @@ class PipelinePilotEmulator(tk.Tk):
             tree.column(col, width=100, anchor=tk.W, stretch=True)
     
         # Заполнение данными
-        for _, row in df.head(50).iterrows():
+        for _, row in render_frame(df.head(50)).iterrows():
             tree.insert("", "end", values=tuple(row))
     
         # Размещение элементов
@@ -1,20 +1,40 @@
 ﻿import os
 import subprocess
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, simpledialog
+try:
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox, simpledialog
+except ImportError:
+    # Безголовый запуск (python -m pipeline_emulator run) не требует Tk
+    tk = ttk = filedialog = messagebox = simpledialog = None
 import uuid
 import json
 from collections import deque
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import numpy as np
 from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
+from matplotlib import cm
 import pandas as pd 
-from scapy.all import rdpcap
-import pandas as pd
-from protocols import PROTOCOL_MAP
+from protocols import PROTOCOL_MAP, protocol_names
+from pcap_parser import EXTENDED_FIELDS, capture_files, read_captures, iter_captures, normalize_fields
+from sidecar import SIDECARS
+from flows import aggregate_flows, FlowTracker
+from windows import WINDOW_TYPES, AGGREGATIONS, WindowSpec, aggregate_windows, WindowTracker
+from anomaly import DETECTOR_METHODS, create_detector, detect
+from sketches import HeavyHitters
+from cardinality import DistinctSketch, window_rows as distinct_rows, distinct_table
+from temporal_join import ASOF_DIRECTIONS, asof_join, interval_join, parse_match_columns
+from joins import JOIN_TYPES, JOIN_ALGORITHMS, JoinIndex, join_algorithm, join_frames, concat_frames
+from packet_format import render_frame, query_packets, pushdown_rows, is_ipv4_column, format_ipv4
 
 from data_packet import DataPacket
 
+# Метрики TrafficAnalyzer в порядке его выходных портов
+TRAFFIC_METRICS = ["Protocol Distribution", "Top Talkers", "Time Series"]
+# Допустимая ошибка счёта приближённых Top Talkers, доля всех пакетов
+TALKERS_ERRORS = ["0.01", "0.001", "0.0001"]
+
+# Меняется вместе с _convert_csv_columns, чтобы не читать устаревшие sidecar-файлы
+CSV_READER_VERSION = 3
+
 NODE_LIBRARY = {
     "CSVReader": {
         "properties": [
@@ -34,6 +54,20 @@ NODE_LIBRARY = {
                 "type": "script", 
                 "label": "Script",
                 "default": "output = input"
+            },
+            {
+                "name": "run_in_process",
+                "type": "bool",
+                "label": "Run in Process",
+                "default": False
+            },
+            {
+                # Только построчный скрипт можно вызывать по кускам: groupby,
+                # drop_duplicates, head и т.п. по кускам дали бы другой результат
+                "name": "row_wise",
+                "type": "bool",
+                "label": "Row-wise (Stream by Chunks)",
+                "default": False
             }
         ],
         "ports": {"in": ["data"], "out": ["result"]}
@@ -76,6 +110,12 @@ NODE_LIBRARY = {
                 "type": "text", 
                 "label": "Title",
                 "default": "Histogram"
+            },
+            {
+                "name": "run_in_process",
+                "type": "bool",
+                "label": "Run in Process",
+                "default": False
             }
         ],
         "ports": {"in": ["data"], "out": ["figure"]}
@@ -85,8 +125,14 @@ NODE_LIBRARY = {
             {
                 "name": "filepath",
                 "type": "file",
-                "label": "PCAP File Path",
-                "filetypes": [("PCAP files", "*.pcap")]
+                "label": "PCAP File, Folder or Glob",
+                "filetypes": [("Capture files", "*.pcap *.pcapng *.cap")]
+            },
+            {
+                "name": "fields",
+                "type": "text",
+                "label": "Extra Fields",
+                "default": ""
             }
         ],
         "ports": {"in": [], "out": ["network_data"]}
@@ -95,13 +141,169 @@ NODE_LIBRARY = {
         "properties": [
             {
                 "name": "metrics",
-                "type": "dropdown",
+                "type": "multiselect",
                 "label": "Metrics to Show",
-                "options": ["Protocol Distribution", "Top Talkers", "Time Series"],
-                "default": "Protocol Distribution"  # Значение по умолчанию
+                "options": TRAFFIC_METRICS,
+                "default": ["Protocol Distribution"]  # Значение по умолчанию
+            },
+            {
+                "name": "top_n",
+                "type": "int",
+                "label": "Top Talkers N",
+                "default": 5,
+                "min": 1
+            },
+            {
+                "name": "talkers_mode",
+                "type": "dropdown",
+                "label": "Top Talkers Mode",
+                "options": ["Exact", "Approximate"],
+                "default": "Exact"
+            },
+            {
+                "name": "talkers_error",
+                "type": "dropdown",
+                "label": "Approximate Error (share of packets)",
+                "options": TALKERS_ERRORS,
+                "default": "0.001"
+            },
+            {
+                "name": "run_in_process",
+                "type": "bool",
+                "label": "Run in Process",
+                "default": False
+            }
+        ],
+        # Каждая метрика - на своём выходе, в порядке TRAFFIC_METRICS
+        "ports": {"in": ["network_data"], "out": ["protocols", "top_talkers", "time_series"]}
+    },
+    "FlowAggregator": {
+        "properties": [
+            {
+                "name": "idle_timeout",
+                "type": "int",
+                "label": "Idle Timeout (s)",
+                "default": 15,
+                "min": 1
+            },
+            {
+                "name": "active_timeout",
+                "type": "int",
+                "label": "Active Timeout (s, 0 - off)",
+                "default": 1800,
+                "min": 0
+            },
+            {
+                "name": "bidirectional",
+                "type": "bool",
+                "label": "Bidirectional Flows",
+                "default": False
+            },
+            {
+                "name": "run_in_process",
+                "type": "bool",
+                "label": "Run in Process",
+                "default": False
             }
         ],
-        "ports": {"in": ["network_data"], "out": ["analysis_result"]}
+        # Колонки, которые нода читает помимо указанных в свойствах (см. optimizer.py)
+        "reads": ["src_port", "dst_port"],
+        "ports": {"in": ["network_data"], "out": ["flows"]}
+    },
+    "TimeWindow": {
+        "properties": [
+            {
+                "name": "window_type",
+                "type": "dropdown",
+                "label": "Window Type",
+                "options": WINDOW_TYPES,
+                "default": "Sliding"
+            },
+            {
+                "name": "width",
+                "type": "int",
+                "label": "Width (s)",
+                "default": 60,
+                "min": 1
+            },
+            {
+                "name": "step",
+                "type": "int",
+                "label": "Step (s, Sliding)",
+                "default": 1,
+                "min": 1
+            },
+            {
+                "name": "gap",
+                "type": "int",
+                "label": "Session Gap (s)",
+                "default": 30,
+                "min": 1
+            },
+            {
+                "name": "column",
+                "type": "dropdown",
+                "label": "Value Column",
+                "source": "input_columns",
+                "default": "length"
+            },
+            {
+                "name": "aggregations",
+                "type": "multiselect",
+                "label": "Aggregations",
+                "options": AGGREGATIONS,
+                "default": ["count", "sum"]
+            },
+            {
+                "name": "run_in_process",
+                "type": "bool",
+                "label": "Run in Process",
+                "default": False
+            }
+        ],
+        "reads": ["timestamp"],
+        "ports": {"in": ["data"], "out": ["windows"]}
+    },
+    "DistinctCounter": {
+        "properties": [
+            {
+                "name": "key_column",
+                "type": "dropdown",
+                "label": "Key Column (empty - whole window)",
+                "source": "input_columns",
+                "default": "dst_ip"
+            },
+            {
+                "name": "value_column",
+                "type": "dropdown",
+                "label": "Count Distinct Of",
+                "source": "input_columns",
+                "default": "src_ip"
+            },
+            {
+                "name": "window",
+                "type": "int",
+                "label": "Window (s)",
+                "default": 60,
+                "min": 1
+            },
+            {
+                "name": "precision",
+                "type": "int",
+                "label": "HyperLogLog Precision (4-16)",
+                "default": 12,
+                "min": 4,
+                "max": 16
+            },
+            {
+                "name": "run_in_process",
+                "type": "bool",
+                "label": "Run in Process",
+                "default": False
+            }
+        ],
+        "reads": ["timestamp"],
+        "ports": {"in": ["network_data"], "out": ["distinct"]}
     },
     "NetworkVisualizer": {
         "properties": [
@@ -117,28 +319,83 @@ NODE_LIBRARY = {
                 "type": "dropdown",
                 "label": "Data Column",
                 "source": "input_columns"
+            },
+            {
+                "name": "run_in_process",
+                "type": "bool",
+                "label": "Run in Process",
+                "default": False
             }
         ],
         "ports": {"in": ["analysis_result"], "out": ["figure"]}
     },
     "AnomalyDetector": {
         "properties": [
+            {
+                "name": "column",
+                "type": "dropdown",
+                "label": "Value Column",
+                "source": "input_columns",
+                "default": "TotalLength"
+            },
+            {
+                "name": "method",
+                "type": "dropdown",
+                "label": "Method",
+                "options": DETECTOR_METHODS,
+                "default": "Threshold"
+            },
             {
                 "name": "threshold",
                 "type": "int",
                 "label": "Anomaly Threshold",
                 "default": 1000
+            },
+            {
+                "name": "window",
+                "type": "int",
+                "label": "Window (rows)",
+                "default": 60,
+                "min": 2
+            },
+            {
+                "name": "score_threshold",
+                "type": "int",
+                "label": "Score Threshold (sigma)",
+                "default": 3,
+                "min": 1
+            },
+            {
+                "name": "season",
+                "type": "int",
+                "label": "Season Length (rows)",
+                "default": 720,
+                "min": 1
+            },
+            {
+                "name": "run_in_process",
+                "type": "bool",
+                "label": "Run in Process",
+                "default": False
             }
         ],
         "ports": {"in": ["network_data"], "out": ["alerts"]}
     },
     "Merge": {
         "properties": [
+            {
+                "name": "inputs",
+                "type": "int",
+                "label": "Number of Inputs",
+                "default": 2,
+                "min": 2,
+                "max": 8
+            },
             {
                 "name": "merge_type",
                 "type": "dropdown",
                 "label": "Merge Type",
-                "options": ["Concatenate", "Join"],
+                "options": ["Concatenate", "Join", "As-of Join", "Interval Join"],
                 "default": "Concatenate"
             },
             {
@@ -147,9 +404,51 @@ NODE_LIBRARY = {
                 "label": "Join Key",
                 "source": "input_columns",
                 "default": ""
+            },
+            {
+                "name": "join_type",
+                "type": "dropdown",
+                "label": "Join Type",
+                "options": JOIN_TYPES,
+                "default": "Outer"
+            },
+            {
+                "name": "join_algorithm",
+                "type": "dropdown",
+                "label": "Join Algorithm",
+                "options": JOIN_ALGORITHMS,
+                "default": "Auto"
+            },
+            {
+                "name": "time_column",
+                "type": "dropdown",
+                "label": "Time Column (As-of/Interval)",
+                "source": "input_columns",
+                "default": "timestamp"
+            },
+            {
+                "name": "tolerance",
+                "type": "int",
+                "label": "Time Tolerance (s, 0 - unlimited)",
+                "default": 60,
+                "min": 0
+            },
+            {
+                "name": "direction",
+                "type": "dropdown",
+                "label": "As-of Direction",
+                "options": ASOF_DIRECTIONS,
+                "default": "backward"
+            },
+            {
+                "name": "match_columns",
+                "type": "text",
+                "label": "Also Match (left=right, ...)",
+                "default": ""
             }
         ],
-        "ports": {"in": ["input1", "input2"], "out": ["merged_data"]}
+        # Число входов задаёт свойство inputs
+        "ports": {"in": ["input1", "input2"], "out": ["merged_data"], "in_count": "inputs"}
     },
     "XYPlot": {
     "properties": [
@@ -183,6 +482,12 @@ NODE_LIBRARY = {
             "type": "color",
             "label": "Line/Marker Color",
             "default": "#1f77b4"
+        },
+        {
+            "name": "run_in_process",
+            "type": "bool",
+            "label": "Run in Process",
+            "default": False
         }
     ],
     "ports": {"in": ["data"], "out": ["figure"]}
@@ -192,6 +497,25 @@ NODE_LIBRARY = {
 def snap(val, grid):
     return round(val / grid) * grid
 
+# Расстояние между портами: высокая нода для большого числа входов
+PORT_SPACING = 14
+
+def node_ports(node_type, properties):
+    """Порты ноды; число входов может задавать свойство (ports['in_count'])"""
+    ports = NODE_LIBRARY[node_type]["ports"]
+    count_property = ports.get("in_count")
+    if not count_property:
+        return ports
+    prefix = ports["in"][0].rstrip("0123456789")
+    limit = next(prop for prop in NODE_LIBRARY[node_type]["properties"] if prop["name"] == count_property).get("max")
+    try:
+        count = max(len(ports["in"]), int(properties.get(count_property) or 0))
+    except (TypeError, ValueError):
+        count = len(ports["in"])
+    if limit:
+        count = min(count, limit)
+    return {**ports, "in": [f"{prefix}{i + 1}" for i in range(count)]}
+
 class Node:
     def __init__(self, canvas, x, y, app, node_type="Default", node_id=None):
         self.canvas = canvas
@@ -202,6 +526,12 @@ class Node:
         self.name = node_type
         self.input_data = None
         self.output_data = None
+        self.output_released = False
+        self.pinned = False
+        # Поля источника, выбранные планировщиком под потребителей (None - без проекции)
+        self.projection = None
+        # Условие Filter, которое планировщик перенёс в источник (None - без переноса)
+        self.pushdown = None
         self.base_font_size = 10
         self._is_dragging = False
         self.properties = {}
@@ -211,8 +541,8 @@ class Node:
             # Используем значение по умолчанию из NODE_LIBRARY
             default_value = prop.get('default', '')
             self.properties[prop['name']] = default_value
-        self.ports = NODE_LIBRARY[self.type]["ports"]
-        w, h = 120, 60
+        self.ports = node_ports(self.type, self.properties)
+        w, h = 120, max(60, PORT_SPACING * (max(len(self.ports['in']), len(self.ports['out'])) + 1))
         x0, y0 = x - w/2, y - h/2
         if self.app.snap_to_grid:
             x0 = snap(x0, self.app.grid_size)
@@ -230,29 +560,7 @@ class Node:
             handler = ev.strip('<>').lower().replace('-', '_')
             canvas.tag_bind(self.id, ev, getattr(self, handler))
 
-        if node_type == "Filter":
-            self.__class__ = FilterNode
-
-        if node_type == "Histogram":
-            self.__class__ = HistogramNode
-            self.ports = NODE_LIBRARY["Histogram"]["ports"]
-
-        if node_type == "Merge":
-            self.__class__ = MergeNode
-            self.ports = NODE_LIBRARY["Merge"]["ports"]
-
-        if node_type == "XYPlot":
-            self.__class__ = XYPlotNode
-            self.ports = NODE_LIBRARY["XYPlot"]["ports"]
-
-        if node_type == "PCAPReader":
-            self.__class__ = PCAPReaderNode
-        elif node_type == "TrafficAnalyzer":
-            self.__class__ = TrafficAnalyzerNode
-        elif node_type == "NetworkVisualizer":
-            self.__class__ = NetworkVisualizerNode
-        elif node_type == "AnomalyDetector":
-            self.__class__ = AnomalyDetectorNode
+        self.__class__ = NODE_CLASSES.get(node_type, Node)
 
     def _draw_ports(self, x0, y0, x1, y1):
         # Для входных портов
@@ -265,7 +573,7 @@ class Node:
             self.canvas.create_rectangle(
                 x0-6, y-5, x0, y+5, 
                 fill="#888", 
-                tags=(self.id, f"{self.id}&&in_port_{i+1}")  # Уникальный тег
+                tags=(self.id, port_tag)  # Ищется выражением f"{id}&&in_port_N"
             )
         
         # Для выходных портов
@@ -280,6 +588,51 @@ class Node:
                 tags=(self.id, f"out_port_{i+1}")
             )
 
+    def update_ports(self):
+        """Перестраивает входы ноды после изменения их числа"""
+        ports = node_ports(self.type, self.properties)
+        if ports == self.ports:
+            return
+        self.ports = ports
+        if self.canvas is None:
+            return
+        # Рёбра к исчезнувшим входам не удаляются: update_edges помечает их
+        # недействительными, и они снова подключатся, если число входов вернуть
+        for item in self.canvas.find_withtag(self.id):
+            if any(tag.startswith(("in_port_", "out_port_")) for tag in self.canvas.gettags(item)):
+                self.canvas.delete(item)
+        x0, y0, x1, y1 = self.canvas.coords(self.rect)
+        # Высота растёт с числом портов в масштабе холста (ширина ноды - 120)
+        scale = (x1 - x0) / 120
+        y1 = y0 + max(60, PORT_SPACING * (max(len(ports['in']), len(ports['out'])) + 1)) * scale
+        self.canvas.coords(self.rect, x0, y0, x1, y1)
+        self.canvas.coords(self.text, (x0 + x1) / 2, (y0 + y1) / 2)
+        self._draw_ports(x0, y0, x1, y1)
+        self.app.update_edges(self)
+
+    def _out_port_at(self, event):
+        """Номер выходного порта под курсором; 0, если щёлкнули не по порту"""
+        x = self.canvas.canvasx(event.x)
+        y = self.canvas.canvasy(event.y)
+        for item in self.canvas.find_overlapping(x - 2, y - 2, x + 2, y + 2):
+            tags = self.canvas.gettags(item)
+            if self.id not in tags:
+                continue
+            for tag in tags:
+                if tag.startswith("out_port_"):
+                    return int(tag[len("out_port_"):]) - 1
+        return 0
+
+    def set_property(self, name, value):
+        if self.properties.get(name) == value:
+            return
+        self.properties[name] = value
+        if name == self.ports.get("in_count"):
+            self.update_ports()
+        # Нода и все её потомки будут пересчитаны при следующем запуске
+        if self.app is not None:
+            self.app.runner.mark_dirty(self)
+
     def highlight(self, active: bool):
         outline = "#000000" if active else "#000000"
         width = 2 if active else 1
@@ -287,7 +640,7 @@ class Node:
 
     def buttonpress_1(self, event):
         if self.app.connect_mode:
-            self.app.handle_connection(self)
+            self.app.handle_connection(self, self._out_port_at(event))
             return "break"
             
         self._is_dragging = True  # Устанавливаем флаг сразу
@@ -336,6 +689,10 @@ class Node:
     def button_3(self, event):
         menu = tk.Menu(self.canvas, tearoff=0)
         menu.add_command(label="Show Data", command=lambda: self.show_node_data())
+        menu.add_command(
+            label="Unpin Output" if self.pinned else "Pin Output",
+            command=lambda: self.set_pinned(not self.pinned)
+        )
         menu.add_command(label="Delete", command=lambda: self.app.delete_node(self))
         menu.add_command(label="Rename", command=lambda: self.app.rename_node(self))
         menu.add_separator()
@@ -343,12 +700,26 @@ class Node:
         menu.add_command(label="Export to Excel", command=lambda: self.export_to_excel())
         menu.post(event.x_root, event.y_root)
 
+    def set_pinned(self, pinned):
+        # Закреплённая нода хранит результат после запуска, даже если она не лист
+        self.pinned = pinned
+        self.canvas.itemconfig(self.rect, width=3 if pinned else 1)
+
+    def _restore_output(self):
+        # Источник с условием Filter, перенесённым при чтении, хранит только отфильтрованные строки
+        if (self.output_data is None and self.output_released) or self.pushdown is not None:
+            try:
+                self.app.runner.unfiltered_output(self)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not restore data: {e}")
+        return self.output_data
+
     def update_font_scale(self, scale_factor):
         scaled_size = max(6, int(self.base_font_size * scale_factor))
         self.canvas.itemconfig(self.text, font=("Arial", scaled_size))
 
     def export_to_csv(self, app='notepad'):
-        if not hasattr(self, 'output_data') or not isinstance(self.output_data.data, pd.DataFrame):
+        if not self._restore_output() or not isinstance(self.output_data.data, pd.DataFrame):
             messagebox.showerror("Error", "No CSV data available in this node")
             return
         filepath = filedialog.asksaveasfilename(
@@ -358,7 +729,7 @@ class Node:
         if not filepath:
             return
         try:
-            self.output_data.data.to_csv(filepath, index=False)
+            render_frame(self.output_data.data).to_csv(filepath, index=False)
             if app == 'notepad':
                 if os.name == 'nt':
                     subprocess.run(['notepad.exe', filepath], check=True)
@@ -381,48 +752,71 @@ class Node:
         self.export_to_csv(app='excel')
 
     def execute(self):
-        try:
-            if self.type == "CSVReader":
-                self.output_data = self._execute_csv_reader()
-            elif self.type == "PythonScript":
-                self.output_data = self._execute_python_script()
-            else:
-                self.output_data = self.input_data
-                
-            self.canvas.itemconfig(self.rect, fill="#00FA9A")
-            return self.output_data
-            
-        except Exception as e:
-            self.canvas.itemconfig(self.rect, fill="#FF0000")
-            raise
+        # Цвет ноды выставляет PipelineRunner из UI-потока: execute может
+        # вызываться из рабочих потоков, где обращаться к Tk нельзя
+        if self.type == "CSVReader":
+            self.output_data = self._execute_csv_reader()
+        elif self.type == "PythonScript":
+            self.output_data = self._execute_python_script()
+        else:
+            self.output_data = self.input_data
+        return self.output_data
 
     def _execute_csv_reader(self):
         filepath = self.properties.get('filepath', '')
         if not filepath:
             raise ValueError("File path not specified")
         try:
-            df = pd.read_csv(filepath)
-        
-            # Преобразуем timestamp
-            if 'timestamp' in df.columns:
-                df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-        
-            # Преобразуем числовые столбцы
-            numeric_cols = ['frequency', 'signal_strength', 'noise_level', 'bit_error_rate']
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-            return DataPacket(df)
+            key = SIDECARS.key('csv', filepath, CSV_READER_VERSION)
+            df = SIDECARS.cached(key, lambda: self._convert_csv_columns(pd.read_csv(filepath)))
+            return DataPacket(pushdown_rows(df, self.pushdown))
         except Exception as e:
             raise ValueError(f"CSV reading error: {str(e)}")
+
+    def _convert_csv_columns(self, df, time_format=None):
+        # Преобразуем timestamp: ISO 8601 с поясом и без приводится к UTC без
+        # пояса, как время пакетов; иначе - общий разбор pandas. В потоке
+        # способ выбирается по первому куску со временем и хранится в
+        # time_format (dict), чтобы все куски файла разбирались одинаково
+        if 'timestamp' in df.columns:
+            values = df['timestamp']
+            parsers = {
+                'iso': lambda: pd.to_datetime(values, errors='coerce', utc=True, format='ISO8601').dt.tz_localize(None),
+                'fallback': lambda: pd.to_datetime(values, errors='coerce'),
+            }
+            method = time_format.get('timestamp') if time_format is not None else None
+            if method is None:
+                method, parsed = 'iso', parsers['iso']()
+                if parsed.isna().sum() > values.isna().sum():
+                    fallback = parsers['fallback']()
+                    if fallback.notna().sum() > parsed.notna().sum():
+                        method, parsed = 'fallback', fallback
+                if time_format is not None and values.notna().any():
+                    time_format['timestamp'] = method
+            else:
+                parsed = parsers[method]()
+            df['timestamp'] = parsed
+    
+        # Преобразуем числовые столбцы
+        numeric_cols = ['frequency', 'signal_strength', 'noise_level', 'bit_error_rate']
+        for col in numeric_cols:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        return df
         
-    def _execute_python_script(self):
+    def _execute_python_script(self, input_data=None):
         script = self.properties.get('script', '')
+        input_data = self.input_data if input_data is None else input_data
         if not script:
-            return self.input_data
+            return input_data
             
-        locals_dict = {'input': self.input_data, 'output': None}
+        if isinstance(getattr(input_data, 'data', None), pd.DataFrame):
+            # Скрипт может менять input.data на месте, а кадр на входе общий с кэшем
+            # и другими потребителями: отдаём ему копию
+            packet = DataPacket(input_data.data.copy())
+            packet.metadata = dict(input_data.metadata)
+            input_data = packet
+        locals_dict = {'input': input_data, 'output': None}
         try:
             exec(script, {}, locals_dict)
         except Exception as e:
@@ -430,9 +824,54 @@ class Node:
             
         return DataPacket(locals_dict.get('output'))
 
+    # Потоковый режим (PipelineRunner.chunk_size, см. streaming.py).
+    # "source" отдаёт DataFrame кусками через iter_chunks, "transform"
+    # обрабатывает кусок за куском (open_stream/process_chunk/close_stream),
+    # "aggregate" собирает частичные результаты (start/update/finish_partial).
+    # Ноды без роли получают вход целиком.
+    def stream_role(self):
+        if self.type == "CSVReader":
+            return "source"
+        if self.type == "PythonScript" and self.properties.get('row_wise'):
+            return "transform"
+        return None
+
+    def iter_chunks(self, chunk_size):
+        filepath = self.properties.get('filepath', '')
+        if not filepath:
+            raise ValueError("File path not specified")
+        def parse():
+            time_format = {}
+            for chunk in pd.read_csv(filepath, chunksize=chunk_size):
+                yield self._convert_csv_columns(chunk, time_format)
+
+        try:
+            key = SIDECARS.key('csv', filepath, CSV_READER_VERSION)
+            for chunk in SIDECARS.cached_batches(key, parse, chunk_size):
+                yield pushdown_rows(chunk, self.pushdown)
+        except Exception as e:
+            raise ValueError(f"CSV reading error: {str(e)}")
+
+    def open_stream(self):
+        pass
+
+    def process_chunk(self, chunk):
+        if self.type != "PythonScript":
+            return chunk
+        # Скрипт помечен построчным (row_wise): вызывается для каждого куска
+        result = self._execute_python_script(DataPacket(chunk)).data
+        if isinstance(result, DataPacket):
+            result = result.data
+        if not isinstance(result, pd.DataFrame):
+            raise RuntimeError("Script error: in streaming mode output must be a DataFrame")
+        return result
+
+    def close_stream(self):
+        return None
+
         
     def show_node_data(self):
-        if not self.output_data:
+        if not self._restore_output():
             messagebox.showinfo("Info", "No data available")
             return
     
@@ -446,7 +885,7 @@ class Node:
             for col in self.output_data.data.columns:
                 tree.heading(col, text=col)
                 tree.column(col, width=100)
-            for _, row in self.output_data.data.head(50).iterrows():
+            for _, row in render_frame(self.output_data.data.head(50)).iterrows():
                 tree.insert("", "end", values=list(row))
         
             vsb = ttk.Scrollbar(top, orient="vertical", command=tree.yview)
@@ -460,6 +899,7 @@ class Node:
     
         elif isinstance(self.output_data.data, Figure):
             # Отображение matplotlib Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
             canvas = FigureCanvasTkAgg(self.output_data.data, master=top)
             canvas.draw()
             canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
@@ -481,50 +921,88 @@ class FilterNode(Node):
             if not condition:
                 return self.input_data
                 
-            filtered_df = df.query(condition)
+            # Адреса в таблицах пакетов - uint32, литерал 'a.b.c.d' переводим в число.
+            # Если условие уже применил источник, повторный запрос ничего не отбросит
+            filtered_df = query_packets(df, condition)
             
             return DataPacket(filtered_df)
             
         except Exception as e:
             raise ValueError(f"Filter error: {str(e)}")
 
+    def stream_role(self):
+        return "transform"
+
+    def process_chunk(self, chunk):
+        condition = self.properties.get('condition', '')
+        if not condition:
+            return chunk
+        try:
+            return query_packets(chunk, condition)
+        except Exception as e:
+            raise ValueError(f"Filter error: {str(e)}")
+
 class HistogramNode(Node):
     def execute(self):
         try:
             df = self.input_data.data
             if not isinstance(df, pd.DataFrame):
                 raise ValueError("Input data must be a DataFrame")
-                
-            column = self.properties.get('column', '')
-            bins = int(self.properties.get('bins', 10))
-            color = self.properties.get('color', '#4C72B0')
-            title = self.properties.get('title', 'Histogram')
+            return DataPacket(self._build_figure(self._column_values(df)))
             
-            if not column:
-                raise ValueError("Column not selected")
-            if column not in df.columns:
-                raise ValueError(f"Column '{column}' not found")
-            if not pd.api.types.is_numeric_dtype(df[column]):
-                raise ValueError(f"Column '{column}' must be numeric")
+        except Exception as e:
+            raise ValueError(f"Histogram error: {str(e)}")
 
-            fig = Figure(figsize=(6, 4))
-            ax = fig.add_subplot(111)
-            
-            ax.hist(
-                df[column].dropna(),
-                bins=bins,
-                edgecolor='white',
-                color=color,
-                alpha=0.7
-            )
-            
-            ax.set_title(title)
-            ax.set_xlabel(column)
-            ax.set_ylabel("Frequency")
-            ax.grid(linestyle='--', alpha=0.5)
-            
-            return DataPacket(fig)
-            
+    def _column_values(self, df):
+        column = self.properties.get('column', '')
+        if not column:
+            raise ValueError("Column not selected")
+        if column not in df.columns:
+            raise ValueError(f"Column '{column}' not found")
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            raise ValueError(f"Column '{column}' must be numeric")
+        return df[column].dropna()
+
+    def _build_figure(self, values):
+        column = self.properties.get('column', '')
+        bins = int(self.properties.get('bins', 10))
+        color = self.properties.get('color', '#4C72B0')
+        title = self.properties.get('title', 'Histogram')
+
+        fig = Figure(figsize=(6, 4))
+        ax = fig.add_subplot(111)
+        
+        ax.hist(
+            values,
+            bins=bins,
+            edgecolor='white',
+            color=color,
+            alpha=0.7
+        )
+        
+        ax.set_title(title)
+        ax.set_xlabel(column)
+        ax.set_ylabel("Frequency")
+        ax.grid(linestyle='--', alpha=0.5)
+        return fig
+
+    def stream_role(self):
+        return "aggregate"
+
+    def start_partial(self):
+        return []
+
+    def update_partial(self, state, chunk, port):
+        # Границы корзин зависят от min/max всей колонки, поэтому копим только её
+        try:
+            state.append(self._column_values(chunk))
+        except Exception as e:
+            raise ValueError(f"Histogram error: {str(e)}")
+
+    def finish_partial(self, state):
+        try:
+            values = pd.concat(state, ignore_index=True) if state else pd.Series(dtype=float)
+            return DataPacket(self._build_figure(values))
         except Exception as e:
             raise ValueError(f"Histogram error: {str(e)}")
 
@@ -537,88 +1015,318 @@ class HistogramNode(Node):
 class PCAPReaderNode(Node):
     def execute(self):
         try:
-            filepath = self.properties.get('filepath', '')
-            if not filepath:
-                raise ValueError("PCAP file path not specified")
-            packets = rdpcap(filepath)
-            packet_data = []
-            for pkt in packets:
-                if 'IP' in pkt:
-                    # Преобразуем timestamp в числовой формат
-                    try:
-                        ts = float(pkt.time)
-                    except ValueError:
-                        ts = 0.0  # Значение по умолчанию для некорректных данных
-                    packet_data.append({
-                        'timestamp': ts,
-                        'src_ip': pkt['IP'].src,
-                        'dst_ip': pkt['IP'].dst,
-                        'protocol': pkt['IP'].proto,
-                        'length': len(pkt)
-                    })
-            df = pd.DataFrame(packet_data)
-            # Преобразуем в datetime с обработкой ошибок
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s', errors='coerce')
-            return DataPacket(df)
+            # Несколько файлов разбираются параллельно и сливаются по времени
+            return DataPacket(read_captures(
+                self._capture_files(), sidecars=SIDECARS, fields=self._fields(), condition=self.pushdown
+            ))
+        except Exception as e:
+            raise ValueError(f"PCAP reading error: {str(e)}")
+
+    def selected_fields(self):
+        """Поля из свойства 'fields': имена через запятую или 'all'"""
+        text = self.properties.get('fields', '') or ''
+        names = [name.strip() for name in text.split(',') if name.strip()]
+        if names == ['all']:
+            return EXTENDED_FIELDS
+        return tuple(names)
+
+    def project(self, columns):
+        # Выбранные поля плюс те дополнительные, на которые ссылаются ноды ниже
+        return normalize_fields(set(self.selected_fields()) | set(columns))
+
+    def _fields(self):
+        unknown = [name for name in self.selected_fields() if name not in EXTENDED_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}; available: {', '.join(EXTENDED_FIELDS)}")
+        if self.projection is not None:
+            return self.projection
+        return normalize_fields(self.selected_fields())
+
+    def _capture_files(self):
+        filepath = self.properties.get('filepath', '')
+        if not filepath:
+            raise ValueError("PCAP file path not specified")
+        return capture_files(filepath)
+
+    def stream_role(self):
+        return "source"
+
+    def iter_chunks(self, chunk_size):
+        try:
+            yield from iter_captures(self._capture_files(), chunk_size, SIDECARS, self._fields(), self.pushdown)
         except Exception as e:
             raise ValueError(f"PCAP reading error: {str(e)}")
 
 class TrafficAnalyzerNode(Node):
     def get_protocol_name(self, proto_num):
         return PROTOCOL_MAP.get(proto_num, f"Unknown ({proto_num})")
+
+    def selected_metrics(self):
+        """Выбранные метрики в порядке выходных портов"""
+        metrics = self.properties.get('metrics') or []
+        if isinstance(metrics, str):
+            metrics = [metrics]
+        unknown = [metric for metric in metrics if metric not in TRAFFIC_METRICS]
+        if unknown:
+            raise ValueError(f"Unknown metric: {unknown[0]}")
+        if not metrics:
+            raise ValueError("no metrics selected")
+        return [metric for metric in TRAFFIC_METRICS if metric in metrics]
+
     def execute(self):
+        # Полный вход - частный случай потока из одного куска
+        state = self.start_partial()
+        self.update_partial(state, self.input_data.data, 0)
+        return self.finish_partial(state)
+
+    def stream_role(self):
+        return "aggregate"
+
+    def start_partial(self):
         try:
-            df = self.input_data.data
-            metric = self.properties.get('metrics', 'Protocol Distribution')
-            
-            if metric == "Protocol Distribution":
-                df['protocol_name'] = df['protocol'].apply(self.get_protocol_name)
-                result = df['protocol_name'].value_counts().reset_index()
-                result.columns = ['Protocol', 'Count']
-            
-            elif metric == "Top Talkers":
-                if 'src_ip' not in df.columns or 'dst_ip' not in df.columns:
-                    raise ValueError("IP addresses not found in data")
-                
-                top_sources = df['src_ip'].value_counts().head(5).reset_index()
-                top_sources.columns = ['IP', 'Count (Source)']
-                top_dests = df['dst_ip'].value_counts().head(5).reset_index()
-                top_dests.columns = ['IP', 'Count (Destination)']
-                
-                result = pd.merge(
-                    top_sources, 
-                    top_dests, 
-                    on='IP', 
-                    how='outer'
-                ).fillna(0)
-                result['Total'] = result['Count (Source)'] + result['Count (Destination)']
-                result = result[['IP', 'Count (Source)', 'Count (Destination)']]
-            
-            elif metric == "Time Series":
-                if 'timestamp' not in df.columns:
-                    raise ValueError("Timestamp column not found")
-                
-                if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
-                    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-                
-                df = df.dropna(subset=['timestamp']).set_index('timestamp')
-                
-                # Агрегация данных
-                result = df.resample('5S').agg(
-                    Total_Packets=('length', 'count'),
-                    Total_Length=('length', 'sum')
-                ).reset_index()
-                
-                # Переименовываем колонки
-                result.columns = ['timestamp', 'PacketCount', 'TotalLength']  # Используем строчные буквы
-            
-            else:
-                raise ValueError(f"Unknown metric: {metric}")
-            
-            return DataPacket(result)
+            return {metric: None for metric in self.selected_metrics()}
+        except Exception as e:
+            raise ValueError(f"Analysis error: {str(e)}")
+
+    def update_partial(self, state, df, port):
+        # Все выбранные метрики считаются за один проход по куску
+        try:
+            for metric in state:
+                part = self._metric_part(metric, df)
+                state[metric] = part if state[metric] is None else self._combine(metric, state[metric], part)
+        except Exception as e:
+            raise ValueError(f"Analysis error: {str(e)}")
+
+    def _metric_part(self, metric, df):
+        if metric == "Protocol Distribution":
+            # Считаем номера протоколов, имена подставляем один раз в конце
+            return df['protocol'].value_counts(dropna=False)
+
+        if metric == "Top Talkers":
+            if 'src_ip' not in df.columns or 'dst_ip' not in df.columns:
+                raise ValueError("IP addresses not found in data")
+            if self.properties.get('talkers_mode', "Exact") == "Approximate":
+                # Сводки ограниченного размера складываются по кускам, как и счётчики
+                error = float(self.properties.get('talkers_error', "0.001"))
+                return (HeavyHitters.from_values(df['src_ip'].to_numpy(), error),
+                        HeavyHitters.from_values(df['dst_ip'].to_numpy(), error))
+            # Топ нельзя складывать по кускам: копим полные счётчики адресов
+            return (df['src_ip'].value_counts(), df['dst_ip'].value_counts())
+
+        if 'timestamp' not in df.columns:
+            raise ValueError("Timestamp column not found")
+        # Копируем только две нужные колонки, а не весь кусок
+        df = df[['timestamp', 'length']]
+        if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+            df = df.assign(timestamp=pd.to_datetime(df['timestamp'], errors='coerce'))
+
+        # length в таблицах пакетов - uint32: сумма за окно в нём переполнилась бы
+        df = df.dropna(subset=['timestamp']).astype({'length': 'int64'}).set_index('timestamp')
+
+        # Агрегация данных; окна по 5 секунд совпадают между кусками
+        return df.resample('5s').agg(
+            Total_Packets=('length', 'count'),
+            Total_Length=('length', 'sum')
+        )
+
+    def _combine(self, metric, total, part):
+        if metric == "Protocol Distribution":
+            return total.add(part, fill_value=0).astype('int64')
+        if metric == "Top Talkers":
+            if isinstance(total[0], HeavyHitters):
+                return tuple(t.merge(p) for t, p in zip(total, part))
+            return tuple(t.add(p, fill_value=0).astype('int64') for t, p in zip(total, part))
+        # Окно на стыке кусков встречается в обоих - складываем
+        return pd.concat([total, part]).groupby(level=0).sum()
+
+    def finish_partial(self, state):
+        try:
+            ports = [None] * len(TRAFFIC_METRICS)
+            for metric, parts in state.items():
+                ports[TRAFFIC_METRICS.index(metric)] = DataPacket(self._metric_result(metric, parts))
+            selected = [port for port in ports if port is not None]
+            if isinstance(self.properties.get('metrics'), str):
+                # Одна метрика строкой, как в старых схемах - единственный выход
+                return selected[0]
+            # data - первая выбранная метрика: её показывают превью и экспорт
+            packet = DataPacket(selected[0].data)
+            packet.metadata['ports'] = ports
+            return packet
         except Exception as e:
             raise ValueError(f"Analysis error: {str(e)}")
 
+    def _metric_result(self, metric, parts):
+        if metric == "Protocol Distribution":
+            if parts is None:
+                parts = pd.Series(dtype='int64')
+            # Имена по таблице на 256 номеров; входной DataFrame не трогаем - он может лежать в кэше
+            counts = parts.groupby(protocol_names(parts.index.to_numpy()), dropna=False).sum()
+            result = counts.sort_values(ascending=False, kind='stable').reset_index()
+            result.columns = ['Protocol', 'Count']
+            result['Protocol'] = result['Protocol'].astype('category')
+            return result
+
+        if metric == "Top Talkers":
+            if parts is None:
+                raise ValueError("IP addresses not found in data")
+            src_counts, dst_counts = parts
+            top_n = int(self.properties.get('top_n', 5))
+            if isinstance(src_counts, HeavyHitters):
+                return self._approximate_talkers(src_counts, dst_counts, top_n)
+            top_sources = src_counts.sort_values(ascending=False, kind='stable').head(top_n).reset_index()
+            top_sources.columns = ['IP', 'Count (Source)']
+            top_dests = dst_counts.sort_values(ascending=False, kind='stable').head(top_n).reset_index()
+            top_dests.columns = ['IP', 'Count (Destination)']
+
+            result = pd.merge(
+                top_sources,
+                top_dests,
+                on='IP',
+                how='outer'
+            ).fillna(0)
+            return result[['IP', 'Count (Source)', 'Count (Destination)']]
+
+        if parts is None:
+            raise ValueError("Timestamp column not found")
+        if len(parts):
+            # Пустые окна между кусками тоже должны попасть в ряд
+            full_range = pd.date_range(parts.index.min(), parts.index.max(), freq='5s')
+            parts = parts.reindex(full_range, fill_value=0)
+        result = parts.reset_index()
+
+        # Переименовываем колонки
+        result.columns = ['timestamp', 'PacketCount', 'TotalLength']  # Используем строчные буквы
+        return result
+
+    def _approximate_talkers(self, sources, destinations, top_n):
+        # Адреса - объединение двух топов; счёт, которого нет в сводке, берётся из Count-Min
+        top_sources, _ = sources.top(top_n)
+        top_dests, _ = destinations.top(top_n)
+        ips = pd.unique(np.concatenate([top_sources, top_dests]))
+        return pd.DataFrame({
+            'IP': ips,
+            'Count (Source)': sources.estimate(ips),
+            'Count (Destination)': destinations.estimate(ips)
+        })
+
+class FlowAggregatorNode(Node):
+    def _timeouts(self):
+        idle = int(self.properties.get('idle_timeout', 15) or 0)
+        active = int(self.properties.get('active_timeout', 1800) or 0)
+        if idle < 1 or active < 0:
+            raise ValueError("Flow error: timeouts must be positive")
+        return idle, active, bool(self.properties.get('bidirectional', False))
+
+    def execute(self):
+        idle, active, bidirectional = self._timeouts()
+        try:
+            return DataPacket(aggregate_flows(self.input_data.data, idle, active, bidirectional))
+        except Exception as e:
+            raise ValueError(f"Flow error: {str(e)}")
+
+    # В потоке наружу уходят только истёкшие потоки, незакрытые ждут следующего куска
+    def stream_role(self):
+        return "transform"
+
+    def open_stream(self):
+        self._tracker = FlowTracker(*self._timeouts())
+
+    def process_chunk(self, chunk):
+        try:
+            return self._tracker.update(chunk)
+        except Exception as e:
+            raise ValueError(f"Flow error: {str(e)}")
+
+    def close_stream(self):
+        tracker, self._tracker = self._tracker, None
+        return tracker.flush()
+
+class TimeWindowNode(Node):
+    def _spec(self):
+        aggregations = self.properties.get('aggregations', ["count", "sum"])
+        if isinstance(aggregations, str):
+            aggregations = [name.strip() for name in aggregations.split(',') if name.strip()]
+        try:
+            return WindowSpec(
+                self.properties.get('window_type', "Sliding"),
+                int(self.properties.get('width', 60) or 0),
+                int(self.properties.get('step', 1) or 0),
+                int(self.properties.get('gap', 30) or 0),
+                self.properties.get('column', 'length'),
+                aggregations
+            )
+        except ValueError as e:
+            raise ValueError(f"Window error: {str(e)}")
+
+    def execute(self):
+        spec = self._spec()
+        try:
+            return DataPacket(aggregate_windows(self.input_data.data, spec))
+        except Exception as e:
+            raise ValueError(f"Window error: {str(e)}")
+
+    # В потоке окна уходят наружу, как только закрываются
+    def stream_role(self):
+        return "transform"
+
+    def open_stream(self):
+        self._tracker = WindowTracker(self._spec())
+
+    def process_chunk(self, chunk):
+        try:
+            return self._tracker.update(chunk)
+        except Exception as e:
+            raise ValueError(f"Window error: {str(e)}")
+
+    def close_stream(self):
+        tracker, self._tracker = self._tracker, None
+        return tracker.flush()
+
+class DistinctCounterNode(Node):
+    def _columns(self):
+        key = self.properties.get('key_column', 'dst_ip') or ''
+        value = self.properties.get('value_column', 'src_ip')
+        if not value:
+            raise ValueError("Distinct count error: value column not selected")
+        return key, value
+
+    def execute(self):
+        state = self.start_partial()
+        self.update_partial(state, self.input_data.data, 0)
+        return self.finish_partial(state)
+
+    # Сводки кусков сливаются; память ограничена числом групп, а не строк
+    def stream_role(self):
+        return "aggregate"
+
+    def start_partial(self):
+        return {'sketch': None, 'pending': []}
+
+    def update_partial(self, state, df, port):
+        key, value = self._columns()
+        window = int(self.properties.get('window', 60) or 0)
+        if window < 1:
+            raise ValueError("Distinct count error: window must be positive")
+        try:
+            part = DistinctSketch.from_rows(*distinct_rows(df, key, value, window),
+                                            int(self.properties.get('precision', 12)))
+        except ValueError as e:
+            raise ValueError(f"Distinct count error: {str(e)}")
+        # Слияние с накопленной сводкой - когда новые куски сравнялись с ней
+        # по размеру: так каждая пара переписывается O(log n) раз, а не на каждом куске
+        state['pending'].append(part)
+        total = state['sketch']
+        if total is None or sum(len(sketch) for sketch in state['pending']) >= len(total):
+            state['sketch'] = DistinctSketch.merge_all(([total] if total is not None else []) + state['pending'])
+            state['pending'] = []
+
+    def finish_partial(self, state):
+        key, value = self._columns()
+        parts = ([state['sketch']] if state['sketch'] is not None else []) + state['pending']
+        if not parts:
+            raise ValueError("Distinct count error: no input data")
+        return DataPacket(distinct_table(DistinctSketch.merge_all(parts), key, value))
+
 class NetworkVisualizerNode(Node):
     def execute(self):
         try:
@@ -627,7 +1335,10 @@ class NetworkVisualizerNode(Node):
             column = self.properties.get('column', '')  # Выбранный столбец
 
             # Приводим имена колонок к нижнему регистру для единообразия
-            data.columns = data.columns.str.lower()
+            data = data.rename(columns=str.lower)
+            # Адреса на графике подписываем строками; переводится только выбранная колонка
+            if column in data.columns and is_ipv4_column(column, data[column]):
+                data = data.assign(**{column: format_ipv4(data[column].to_numpy())})
 
             if chart_type == "Pie" and not column:
                 raise ValueError("Select column for Pie chart")
@@ -661,7 +1372,7 @@ class NetworkVisualizerNode(Node):
                     raise ValueError("Select column for Pie chart")
                 if column not in data.columns:
                     raise ValueError(f"Column '{column}' not found in data")
-                data[column].value_counts().plot.pie(ax=ax, autopct='%1.1f%%', colors=plt.cm.Paired.colors)
+                data[column].value_counts().plot.pie(ax=ax, autopct='%1.1f%%', colors=cm.Paired.colors)
                 ax.set_title(f"Pie Chart: {column}")
                 ax.set_ylabel("")  # Убираем подпись оси Y
             
@@ -675,54 +1386,131 @@ class NetworkVisualizerNode(Node):
             raise ValueError(f"Visualization error: {str(e)}")
 
 class AnomalyDetectorNode(Node):
-    def execute(self):
+    def _detector(self):
         try:
-            df = self.input_data.data
-            threshold = int(self.properties.get('threshold', 1000))
-            
-            alerts = []
-            # Простая логика обнаружения аномалий
-            for idx, row in df.iterrows():
-                if row['totallength'] > threshold:
-                    alerts.append({
-                        'timestamp': row['timestamp'],
-                        'packetcount': row['packetcount'],
-                        'totallength': row['totallength']
-                    })
-                    
-            return DataPacket(pd.DataFrame(alerts))
-            
+            return create_detector(
+                self.properties.get('method', "Threshold"),
+                threshold=int(self.properties.get('threshold', 1000)),
+                window=int(self.properties.get('window', 60)),
+                score_threshold=int(self.properties.get('score_threshold', 3)),
+                season=int(self.properties.get('season', 720))
+            )
+        except ValueError as e:
+            raise ValueError(f"Anomaly detection error: {str(e)}")
+
+    def _detect(self, df, detector):
+        try:
+            return detect(df, self.properties.get('column', 'TotalLength'), detector)
         except Exception as e:
             raise ValueError(f"Anomaly detection error: {str(e)}")
 
+    def execute(self):
+        return DataPacket(self._detect(self.input_data.data, self._detector()))
+
+    # Детектор хранит базу между кусками, поэтому аномалии отдаются по мере чтения
+    def stream_role(self):
+        return "transform"
+
+    def open_stream(self):
+        self._detector_state = self._detector()
+
+    def process_chunk(self, chunk):
+        return self._detect(chunk, self._detector_state)
+
+    def close_stream(self):
+        self._detector_state = None
+        return None
+
 class MergeNode(Node):
     def execute(self):
         try:
-            # Получаем список входных DataPacket'ов
-            inputs = self.input_data  # Теперь это список
-            
+            # Входы идут по номерам портов; один подключённый вход приходит без списка
+            inputs = self.input_data if isinstance(self.input_data, list) else [self.input_data]
+            input_keys = getattr(self, 'input_keys', None) or {}
+            keys = [input_keys[port] for port in sorted(input_keys)]
+            if len(keys) != len(inputs):
+                keys = [None] * len(inputs)
+
             # Извлекаем DataFrame из каждого DataPacket
-            dataframes = []
-            for dp in inputs:
+            dataframes, frame_keys = [], []
+            for dp, key in zip(inputs, keys):
                 if isinstance(dp, DataPacket) and isinstance(dp.data, pd.DataFrame):
                     dataframes.append(dp.data)
-            
-            if not dataframes:
-                raise ValueError("No valid input data")
-            
-            merge_type = self.properties.get('merge_type', 'Concatenate')
-            
-            if merge_type == 'Concatenate':
-                combined = pd.concat(dataframes, ignore_index=True)
-            elif merge_type == 'Join':
-                key = self.properties.get('join_key', '')
-                if not key or key not in dataframes[0].columns:
-                    raise ValueError(f"Invalid join key: {key}")
-                combined = dataframes[0]
-                for df in dataframes[1:]:
-                    combined = combined.merge(df, on=key, how='outer')
-            
-            return DataPacket(combined)
+                    frame_keys.append(key)
+
+            return DataPacket(self._merge(dataframes, frame_keys))
+        except Exception as e:
+            raise ValueError(f"Merge error: {str(e)}")
+
+    def _merge(self, dataframes, keys=None):
+        if not dataframes:
+            raise ValueError("No valid input data")
+        keys = keys or [None] * len(dataframes)
+
+        merge_type = self.properties.get('merge_type', 'Concatenate')
+
+        if merge_type == 'Concatenate':
+            combined = concat_frames(dataframes)
+        elif merge_type == 'Join':
+            key = self.properties.get('join_key', '')
+            how = self.properties.get('join_type', 'Outer') or 'Outer'
+            algorithm = self.properties.get('join_algorithm', 'Auto') or 'Auto'
+            if how != 'Cross' and (not key or key not in dataframes[0].columns):
+                raise ValueError(f"Invalid join key: {key}")
+            # Каждый следующий вход соединяется с результатом предыдущих
+            indexes = {}
+            combined = dataframes[0]
+            for df, input_key in zip(dataframes[1:], keys[1:]):
+                method = join_algorithm(combined, df, key, algorithm) if how != 'Cross' else None
+                index = self._join_index(df, key, input_key, indexes) if method == 'Hash' else None
+                combined = join_frames(combined, df, key, how, method or algorithm, index)
+            # Хранятся индексы только тех входов, что были в этом запуске
+            self._join_indexes = indexes
+        elif merge_type in ('As-of Join', 'Interval Join'):
+            # Первый вход - события (пакеты, окна), следующие - записи, которые к ним подбираются
+            time_column = self.properties.get('time_column', 'timestamp') or 'timestamp'
+            tolerance = int(self.properties.get('tolerance', 60) or 0)
+            pairs = parse_match_columns(self.properties.get('match_columns', ''))
+            combined = dataframes[0]
+            for df in dataframes[1:]:
+                if merge_type == 'As-of Join':
+                    combined = asof_join(combined, df, time_column, tolerance,
+                                         self.properties.get('direction', 'backward'), pairs)
+                else:
+                    combined = interval_join(combined, df, time_column, tolerance, pairs)
+        else:
+            raise ValueError(f"Unknown merge type: {merge_type}")
+
+        return combined
+
+    def _join_index(self, df, key, input_key, indexes):
+        """Построенная сторона hash join; для неизменившегося входа - с прошлого запуска.
+
+        Вход узнаётся по ключу кэша его результата. Без ключа (кэш выключен,
+        отдельный процесс) join_frames строит хеш-таблицу сам, на один раз.
+        """
+        if input_key is None:
+            return None
+        index = getattr(self, '_join_indexes', {}).get((input_key, key))
+        if index is None or index.size != len(df):
+            index = JoinIndex(df[key].to_numpy())
+        indexes[(input_key, key)] = index
+        return index
+
+    def stream_role(self):
+        return "aggregate"
+
+    def start_partial(self):
+        return {}
+
+    def update_partial(self, state, chunk, port):
+        state.setdefault(port, []).append(chunk)
+
+    def finish_partial(self, state):
+        try:
+            dataframes = [concat_frames(state[port]) for port in sorted(state)]
+            input_keys = getattr(self, 'input_keys', None) or {}
+            return DataPacket(self._merge(dataframes, [input_keys.get(port) for port in sorted(state)]))
         except Exception as e:
             raise ValueError(f"Merge error: {str(e)}")
 
@@ -746,8 +1534,7 @@ class XYPlotNode(Node):
 
             # Преобразуем X-колонку, если это временная метка
             if pd.api.types.is_datetime64_any_dtype(df[x_col]):
-                df[x_col] = pd.to_datetime(df[x_col])  # Убедимся, что это datetime
-                x_values = df[x_col]
+                x_values = pd.to_datetime(df[x_col])  # Убедимся, что это datetime
             elif pd.api.types.is_numeric_dtype(df[x_col]):
                 x_values = df[x_col]
             else:
@@ -774,4 +1561,53 @@ class XYPlotNode(Node):
             return DataPacket(fig)
 
         except Exception as e:
-            raise ValueError(f"Plotting error: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Plotting error: {str(e)}")
+
+NODE_CLASSES = {
+    "Filter": FilterNode,
+    "Histogram": HistogramNode,
+    "Merge": MergeNode,
+    "XYPlot": XYPlotNode,
+    "PCAPReader": PCAPReaderNode,
+    "TrafficAnalyzer": TrafficAnalyzerNode,
+    "FlowAggregator": FlowAggregatorNode,
+    "TimeWindow": TimeWindowNode,
+    "DistinctCounter": DistinctCounterNode,
+    "NetworkVisualizer": NetworkVisualizerNode,
+    "AnomalyDetector": AnomalyDetectorNode
+}
+
+def upgrade_properties(node):
+    """Приводит свойства ноды из старой схемы к текущим.
+
+    Возвращает перенумерацию выходных портов для рёбер этой схемы.
+    """
+    metrics = node.properties.get('metrics') if node.type == "TrafficAnalyzer" else None
+    if isinstance(metrics, str):
+        # Раньше нода считала одну метрику и отдавала её на единственный выход
+        node.properties['metrics'] = [metrics]
+        if metrics in TRAFFIC_METRICS:
+            return {0: TRAFFIC_METRICS.index(metrics)}
+    return {}
+
+def create_detached_node(node_type, properties=None, node_id=None, name=None):
+    """Создаёт ноду без холста и приложения - для выполнения в другом процессе"""
+    node = Node.__new__(NODE_CLASSES.get(node_type, Node))
+    node.canvas = None
+    node.app = None
+    node.id = node_id or str(uuid.uuid4())
+    node.type = node_type
+    node.name = name or node_type
+    node.input_data = None
+    node.output_data = None
+    node.output_released = False
+    node.pinned = False
+    node.projection = None
+    node.pushdown = None
+    node.properties = {
+        prop['name']: prop.get('default', '')
+        for prop in NODE_LIBRARY[node_type]['properties']
+    }
+    node.properties.update(properties or {})
+    node.ports = node_ports(node_type, node.properties)
+    return node
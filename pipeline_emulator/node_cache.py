@@ -0,0 +1,235 @@
+import os
+import glob
+import json
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from matplotlib.figure import Figure
+
+from data_packet import DataPacket
+
+# Свойства, которые влияют только на способ выполнения, но не на результат
+EXECUTION_PROPERTIES = {'run_in_process'}
+
+FIGURE_SIZE_ESTIMATE = 1024 * 1024
+
+
+def file_signature(path):
+    # Папка или glob: состав и состояние каждого файла
+    if os.path.isdir(path) or glob.has_magic(path):
+        names = glob.glob(os.path.join(path, '*')) if os.path.isdir(path) else glob.glob(path)
+        return [os.path.abspath(path), [file_signature(name) for name in sorted(names) if os.path.isfile(name)]]
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+def node_fingerprint(node, input_keys, file_properties=()):
+    """Ключ результата ноды: тип, свойства, ключи входов и состояние исходных файлов"""
+    properties = {
+        name: value for name, value in node.properties.items()
+        if name not in EXECUTION_PROPERTIES
+    }
+    payload = {
+        'type': node.type,
+        'properties': properties,
+        'inputs': list(input_keys),
+        'files': [file_signature(node.properties.get(name, '')) for name in file_properties]
+    }
+    if node.projection is not None:
+        payload['projection'] = list(node.projection)
+    if node.pushdown is not None:
+        payload['pushdown'] = node.pushdown
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+# Строк, по которым оценивается размер object- и строковых колонок
+SIZE_SAMPLE_ROWS = 1000
+
+
+def frame_size(df):
+    """Размер таблицы в байтах.
+
+    deep=False считает object-колонку по 8 байт на строку, без самих строк;
+    deep=True по всей колонке обходит каждую строку. Строковые колонки
+    оцениваются по первым SIZE_SAMPLE_ROWS строкам.
+    """
+    size = int(df.memory_usage(index=True, deep=False).sum())
+    rows = len(df)
+    if not rows:
+        return size
+    sample = min(rows, SIZE_SAMPLE_ROWS)
+    for _, series in df.items():
+        if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            shallow = series.memory_usage(index=False, deep=False)
+            deep = series.iloc[:sample].memory_usage(index=False, deep=True) * rows / sample
+            size += max(0, int(deep) - int(shallow))
+    return size
+
+
+def packet_size(packet, seen=None):
+    # У ноды с несколькими выходами data - та же таблица, что и у первого порта
+    # в metadata['ports']: каждый объект считается один раз
+    seen = set() if seen is None else seen
+    if isinstance(packet, list):
+        return sum(packet_size(item, seen) for item in packet)
+    if not isinstance(packet, DataPacket):
+        return 0
+    data = packet.data
+    size = 0
+    if id(data) not in seen:
+        seen.add(id(data))
+        if isinstance(data, pd.DataFrame):
+            size = frame_size(data)
+        elif isinstance(data, Figure):
+            size = FIGURE_SIZE_ESTIMATE
+    return size + sum(packet_size(value, seen) for value in packet.metadata.values())
+
+
+class NodeCache:
+    def __init__(self, max_bytes=2 * 1024 ** 3, disk_dir=None, disk_max_bytes=10 * 1024 ** 3):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        packet = self._read_disk(key)
+        with self._lock:
+            if packet is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._put_memory(key, packet)
+        return packet
+
+    def get_or_compute(self, key, compute):
+        """Результат по ключу или compute(); одинаковый ключ считается один раз.
+
+        Несколько запусков с общим кэшем (например, sweep) часто одновременно
+        доходят до одной и той же ноды: второй ждёт первого, а не считает заново.
+        Возвращает (packet, cached).
+        """
+        while True:
+            packet = self.get(key)
+            if packet is not None:
+                return packet, True
+            with self._lock:
+                event = self._inflight.get(key)
+                owner = event is None
+                if owner:
+                    event = self._inflight[key] = threading.Event()
+            if not owner:
+                # Если владелец упал или результат не влез в память, считаем сами
+                event.wait()
+                continue
+            try:
+                packet = compute()
+                self.put(key, packet)
+                return packet, False
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def holds(self, key):
+        """Лежит ли результат в памяти кэша (дисковый уровень не считается)"""
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, packet):
+        if packet is None:
+            return
+        self._put_memory(key, packet)
+        self._write_disk(key, packet)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _put_memory(self, key, packet):
+        size = packet_size(packet)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (packet, size)
+            self.current_bytes += size
+            # LRU: вытесняем самые давние записи, пока не уложимся в лимит
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def _disk_path(self, key):
+        if not self.disk_dir:
+            return None
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                packet = pickle.load(f)
+            os.utime(path)
+            return packet
+        except Exception:
+            return None
+
+    def _write_disk(self, key, packet):
+        path = self._disk_path(key)
+        if not path or os.path.exists(path):
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(packet, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.disk_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
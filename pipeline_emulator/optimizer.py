@@ -0,0 +1,88 @@
+import re
+import ast
+
+from node import NODE_LIBRARY
+
+_WORD = re.compile(r'[A-Za-z_]\w*')
+
+# Узлы условия query, которые проверяют каждую строку по отдельности: сравнения,
+# логика, колонки и константы. Вызовы, атрибуты и арифметика не переносятся.
+_ROW_LOCAL = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.Invert, ast.USub, ast.UAdd,
+    ast.BinOp, ast.BitAnd, ast.BitOr, ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.In, ast.NotIn, ast.Name, ast.Load, ast.Constant, ast.List, ast.Tuple,
+)
+
+
+def referenced_columns(node):
+    """Имена колонок, к которым может обратиться нода.
+
+    Значения свойств-колонок берутся целиком, из выражений и скриптов - все
+    слова. Лишнее имя стоит только разбора ненужной колонки, поэтому оценка
+    намеренно с запасом.
+    """
+    names = set(NODE_LIBRARY[node.type].get('reads', ()))
+    for prop in NODE_LIBRARY[node.type]['properties']:
+        value = node.properties.get(prop['name'])
+        if not isinstance(value, str) or not value:
+            continue
+        if prop['type'] in ('text', 'script'):
+            names.update(_WORD.findall(value))
+        else:
+            names.add(value)
+    return names
+
+
+def downstream_columns(graph, nodes, node_id):
+    """Колонки, на которые ссылается любой потомок ноды"""
+    names = set()
+    seen = {node_id}
+    stack = [node_id]
+    while stack:
+        for edge in graph.successors(stack.pop()):
+            if edge.dst not in seen:
+                seen.add(edge.dst)
+                stack.append(edge.dst)
+                names |= referenced_columns(nodes[edge.dst])
+    return names
+
+
+def plan_projections(runner):
+    """Источники с выбором полей разбирают только поля, нужные им или потомкам"""
+    graph = runner.app.graph
+    nodes = runner.app.nodes
+    for node in runner.node_execution_order:
+        if hasattr(node, 'project'):
+            node.projection = node.project(downstream_columns(graph, nodes, node.id))
+
+
+def is_row_condition(condition):
+    """Условие Filter, которое можно проверить на любой части таблицы"""
+    try:
+        tree = ast.parse(condition.strip(), mode='eval')
+    except SyntaxError:
+        return False
+    return all(isinstance(node, _ROW_LOCAL) for node in ast.walk(tree))
+
+
+def plan_pushdown(runner):
+    """Источник, чей единственный потребитель - Filter, отбрасывает строки ещё при чтении.
+
+    Filter остаётся в графе и применяет условие повторно, поэтому результат
+    совпадает с запуском без переноса. Условие входит в ключ кэша источника
+    (node_fingerprint), а показ и выгрузка данных самого источника
+    перечитывают его без условия (PipelineRunner.unfiltered_output).
+    """
+    graph = runner.app.graph
+    nodes = runner.app.nodes
+    for node in runner.node_execution_order:
+        if node.stream_role() != "source":
+            continue
+        condition = None
+        edges = graph.successors(node.id)
+        consumer = nodes[edges[0].dst] if len(edges) == 1 else None
+        if not node.pinned and consumer is not None and consumer.type == "Filter":
+            text = consumer.properties.get('condition', '')
+            if text and is_row_condition(text):
+                condition = text
+        node.pushdown = condition
@@ -0,0 +1,128 @@
+import re
+import ast
+import socket
+import struct
+
+import numpy as np
+
+# IPv4-адреса в таблицах пакетов хранятся как uint32: это в разы меньше строк
+# и быстрее группируется. В 'a.b.c.d' они превращаются только при показе и
+# экспорте. Колонкой адресов считается uint32-колонка с именем 'ip' или '..._ip'.
+
+_IPV4_TEXT = re.compile(r'(?:\d{1,3}\.){3}\d{1,3}')
+# Имена в обратных кавычках и ссылки @var есть в query, но не в Python
+_QUERY_ONLY = re.compile(rb'`[^`]*`|@')
+
+
+def format_ipv4(values):
+    """uint32 -> строки 'a.b.c.d'; форматируются только уникальные адреса"""
+    unique, inverse = np.unique(np.asarray(values), return_inverse=True)
+    names = np.array([socket.inet_ntoa(struct.pack('>I', int(v))) for v in unique], dtype=object)
+    return names[inverse]
+
+
+def parse_ipv4(text):
+    return struct.unpack('>I', socket.inet_aton(text))[0]
+
+
+def parse_ipv4_values(values):
+    """Строки 'a.b.c.d' -> uint32 и маска разобранных; разбираются только уникальные"""
+    unique, inverse = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    parsed = np.zeros(len(unique), dtype=np.uint32)
+    valid = np.zeros(len(unique), dtype=bool)
+    for i, text in enumerate(unique):
+        try:
+            parsed[i] = parse_ipv4(text)
+            valid[i] = True
+        except OSError:
+            pass
+    return parsed[inverse], valid[inverse]
+
+
+def is_ipv4_column(name, values):
+    if not isinstance(name, str):
+        return False
+    name = name.lower()
+    return (name == 'ip' or name.endswith('_ip')) and values.dtype == np.uint32
+
+
+def _ipv4_positions(df):
+    return [i for i, name in enumerate(df.columns) if is_ipv4_column(name, df.iloc[:, i])]
+
+
+def render_frame(df):
+    """Копия таблицы с адресами в виде строк - для показа и экспорта"""
+    positions = _ipv4_positions(df)
+    if not positions:
+        return df
+    df = df.copy(deep=False)
+    for i in positions:
+        df.isetitem(i, format_ipv4(df.iloc[:, i].to_numpy()))
+    return df
+
+
+def _address_literals(node):
+    """Литералы 'a.b.c.d' операнда сравнения: сама строка или элементы списка (для in)"""
+    items = node.elts if isinstance(node, (ast.List, ast.Tuple, ast.Set)) else [node]
+    return [
+        item for item in items
+        if isinstance(item, ast.Constant) and isinstance(item.value, str) and _IPV4_TEXT.fullmatch(item.value)
+    ]
+
+
+def ipv4_literals(condition, df):
+    """Заменяет в условии query числами литералы 'a.b.c.d', которые сравниваются
+    с uint32-колонками адресов; литералы при строковых колонках не трогаются"""
+    columns = {df.columns[i] for i in _ipv4_positions(df)}
+    if not columns:
+        return condition
+    # Разбираем в байтах: смещения ast - в байтах UTF-8. Скобки допускают
+    # отступ и перенос строк, замаскированные части сохраняют длину
+    source = b'(' + condition.encode('utf-8') + b')'
+    masked = _QUERY_ONLY.sub(lambda match: b'_' * len(match.group(0)), source)
+    try:
+        tree = ast.parse(masked, mode='eval')
+    except SyntaxError:
+        return condition
+    literals = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Compare):
+            continue
+        operands = [node.left] + node.comparators
+        for a, b in zip(operands, operands[1:]):
+            for column, other in ((a, b), (b, a)):
+                if isinstance(column, ast.Name) and column.id in columns:
+                    literals.extend(_address_literals(other))
+    lines = source.split(b'\n')
+    seen = set()
+    for literal in sorted(literals, key=lambda item: (item.lineno, item.col_offset), reverse=True):
+        if (literal.lineno, literal.col_offset) in seen:
+            continue
+        seen.add((literal.lineno, literal.col_offset))
+        try:
+            number = str(parse_ipv4(literal.value)).encode()
+        except OSError:
+            continue
+        line = lines[literal.lineno - 1]
+        lines[literal.lineno - 1] = line[:literal.col_offset] + number + line[literal.end_col_offset:]
+    return b'\n'.join(lines)[1:-1].decode('utf-8')
+
+
+def query_packets(df, condition):
+    """df.query, в котором литералы адресов сравниваются с uint32-колонками"""
+    return df.query(ipv4_literals(condition, df))
+
+
+def pushdown_rows(df, condition):
+    """Условие Filter, перенесённое планировщиком в источник.
+
+    Условие построчное, поэтому его можно применять к любой части таблицы.
+    При ошибке строки не отбрасываются: Filter ниже применит условие сам и
+    покажет ошибку.
+    """
+    if not condition:
+        return df
+    try:
+        return query_packets(df, condition)
+    except Exception:
+        return df
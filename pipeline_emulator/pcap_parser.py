@@ -0,0 +1,752 @@
+import os
+import re
+import glob
+import struct
+import multiprocessing
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from data_packet import DataPacket
+from frame_transfer import dump_packet, load_packet, discard
+from packet_format import parse_ipv4, pushdown_rows
+from process_pool import shared_pool
+
+# Разбор libpcap/pcapng без scapy: файл отображается в память, заголовки записей
+# проходятся один раз, а поля Ethernet/IPv4 достаются векторно по смещениям.
+# Пакеты, которые быстрый путь не может однозначно разобрать, отдаются scapy
+# поштучно, поэтому результат совпадает с PcapReader.
+
+# Сколько пакетов разбирается за раз, прежде чем стать DataFrame
+PCAP_BATCH_ROWS = 65536
+# Меняется вместе с колонками или их типами: старые sidecar-файлы перестают совпадать
+PARSER_VERSION = 3
+
+BASE_FIELDS = ('timestamp', 'src_ip', 'dst_ip', 'protocol', 'length')
+# Дополнительные поля разбираются, только если их выбрали или на них ссылаются ноды ниже.
+# Порты и флаги - только у TCP/UDP в первом фрагменте, у остальных пакетов 0
+EXTENDED_FIELDS = ('src_port', 'dst_port', 'tcp_flags', 'ttl', 'ip_id', 'payload_len')
+
+# Самые узкие типы, вмещающие поле; адреса IPv4 - uint32 (см. packet_format)
+FIELD_DTYPES = {
+    'src_ip': np.uint32,
+    'dst_ip': np.uint32,
+    'protocol': np.uint8,
+    'length': np.uint32,
+    'src_port': np.uint16,
+    'dst_port': np.uint16,
+    'tcp_flags': np.uint8,
+    'ttl': np.uint8,
+    'ip_id': np.uint16,
+    'payload_len': np.uint16
+}
+
+CAPTURE_EXTENSIONS = ('.pcap', '.pcapng', '.cap')
+_GLOB_CHARS = re.compile(r'[*?[]')
+
+MAGIC_MICRO = 0xa1b2c3d4
+MAGIC_NANO = 0xa1b23c4d
+
+PCAPNG_SHB = 0x0a0d0d0a
+PCAPNG_IDB = 1
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+PCAPNG_BYTE_ORDER = 0x1a2b3c4d
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (12, 14, 101, 228)
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+ETHERTYPE_VLAN = (0x8100, 0x88a8)
+# Ethertype, внутри которых scapy заведомо не найдёт IPv4
+ETHERTYPE_NON_IP = (0x0806, 0x8035, 0x88cc, 0x888e, 0x8808, 0x88f7, 0x8809)
+# Следующий заголовок IPv6, за которым может оказаться IPv4 (туннель, расширения)
+IPV6_MAY_CARRY_IPV4 = (0, 4, 43, 44, 51, 60)
+
+AF_INET = 2
+
+# Классы пакетов после разбора канального уровня
+KIND_IPV4 = 0
+KIND_SKIP = 1
+KIND_FALLBACK = 2
+
+
+class UnsupportedCapture(Exception):
+    """Формат файла не поддерживается быстрым путём"""
+
+
+def capture_files(path):
+    """Файл, папка с захватами или glob -> отсортированный список файлов"""
+    if os.path.isdir(path):
+        files = [
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(CAPTURE_EXTENSIONS)
+        ]
+    elif _GLOB_CHARS.search(path):
+        files = [name for name in glob.glob(path) if os.path.isfile(name)]
+    else:
+        return [path]
+    if not files:
+        raise ValueError(f"No capture files match '{path}'")
+    return sorted(files)
+
+
+def _u8(data, offsets):
+    return data[np.minimum(offsets, len(data) - 1)].astype(np.uint32)
+
+
+def _be16(data, offsets):
+    return (_u8(data, offsets) << 8) | _u8(data, offsets + 1)
+
+
+def _be32(data, offsets):
+    return (_be16(data, offsets) << 16) | _be16(data, offsets + 2)
+
+
+def normalize_fields(names):
+    """Дополнительные поля в каноническом порядке; неизвестные имена отбрасываются"""
+    return tuple(name for name in EXTENDED_FIELDS if name in names)
+
+
+def _ip_fields(data, l3, end, fields):
+    """Поля заголовков IPv4 и L4 по смещениям l3; end - конец захваченных байт пакета"""
+    values = {
+        'src': _be32(data, l3 + 12),
+        'dst': _be32(data, l3 + 16),
+        'proto': _u8(data, l3 + 9)
+    }
+    if not fields:
+        return values
+    ihl = (_u8(data, l3) & 0x0f).astype(np.int64) * 4
+    l4 = l3 + ihl
+    # Непервый фрагмент не содержит заголовка L4 - scapy тоже видит там Raw
+    first_fragment = (_be16(data, l3 + 6) & 0x1fff) == 0
+    tcp = (values['proto'] == 6) & first_fragment
+    udp = (values['proto'] == 17) & first_fragment
+    has_ports = (tcp | udp) & (l4 + 4 <= end)
+    has_tcp_header = tcp & (l4 + 14 <= end)
+    if 'src_port' in fields:
+        values['src_port'] = np.where(has_ports, _be16(data, l4), 0)
+    if 'dst_port' in fields:
+        values['dst_port'] = np.where(has_ports, _be16(data, l4 + 2), 0)
+    if 'tcp_flags' in fields:
+        values['tcp_flags'] = np.where(has_tcp_header, _u8(data, l4 + 13), 0)
+    if 'ttl' in fields:
+        values['ttl'] = _u8(data, l3 + 8)
+    if 'ip_id' in fields:
+        values['ip_id'] = _be16(data, l3 + 4)
+    if 'payload_len' in fields:
+        # По длинам из заголовков, а не по захваченным байтам: snaplen не искажает значение
+        l4_header = np.where(has_tcp_header, (_u8(data, l4 + 12) >> 4).astype(np.int64) * 4,
+                             np.where(udp, 8, 0))
+        total = _be16(data, l3 + 2).astype(np.int64)
+        values['payload_len'] = np.maximum(total - ihl - l4_header, 0)
+    return values
+
+
+def _headers_fields(headers, fields):
+    """_ip_fields для списка IP-заголовков (bytes), разобранных scapy"""
+    lengths = np.fromiter(map(len, headers), dtype=np.int64, count=len(headers))
+    offsets = np.cumsum(lengths) - lengths
+    # Хвост из нулей: обрезанный заголовок читается как нули, а не за границей буфера
+    data = np.frombuffer(b''.join(headers) + bytes(64), dtype=np.uint8)
+    return _ip_fields(data, offsets, offsets + lengths, fields)
+
+
+def _classify_ethertype(ethertype, kind):
+    kind[ethertype == ETHERTYPE_IPV4] = KIND_IPV4
+    kind[np.isin(ethertype, ETHERTYPE_NON_IP)] = KIND_SKIP
+    return kind
+
+
+def _link_layer(data, start, caplen, linktype):
+    """Смещение L3 и класс каждого пакета для заданного типа канала"""
+    n = len(start)
+    kind = np.full(n, KIND_FALLBACK, dtype=np.uint8)
+    ipv6 = np.zeros(n, dtype=bool)
+
+    if linktype == LINKTYPE_ETHERNET:
+        l3 = start + 14
+        ethertype = _be16(data, start + 12)
+        # До двух тегов 802.1Q/802.1ad; третий уровень вложенности - через scapy
+        for _ in range(2):
+            tagged = np.isin(ethertype, ETHERTYPE_VLAN)
+            ethertype = np.where(tagged, _be16(data, l3 + 2), ethertype)
+            l3 = np.where(tagged, l3 + 4, l3)
+        header_len = l3 - start
+        _classify_ethertype(ethertype, kind)
+        ipv6 = ethertype == ETHERTYPE_IPV6
+    elif linktype == LINKTYPE_LINUX_SLL:
+        l3 = start + 16
+        header_len = np.full(n, 16)
+        ethertype = _be16(data, start + 14)
+        _classify_ethertype(ethertype, kind)
+        ipv6 = ethertype == ETHERTYPE_IPV6
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        l3 = start + 20
+        header_len = np.full(n, 20)
+        ethertype = _be16(data, start)
+        _classify_ethertype(ethertype, kind)
+        ipv6 = ethertype == ETHERTYPE_IPV6
+    elif linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        l3 = start + 4
+        header_len = np.full(n, 4)
+        # DLT_NULL пишет семейство в порядке байт машины захвата, DLT_LOOP - в сетевом
+        family = _be32(data, start)
+        if linktype == LINKTYPE_NULL:
+            family = np.where(family > 0xffff, family.byteswap(), family)
+        kind[family == AF_INET] = KIND_IPV4
+        ipv6 = np.isin(family, (24, 28, 30))
+    elif linktype in LINKTYPE_RAW:
+        l3 = start
+        header_len = np.zeros(n, dtype=np.int64)
+        version = _u8(data, start) >> 4
+        kind[version == 4] = KIND_IPV4
+        ipv6 = version == 6
+    else:
+        # Неизвестный канальный уровень целиком разбирает scapy
+        return start, kind
+
+    kind[caplen < header_len] = KIND_FALLBACK
+    if ipv6.any():
+        next_header = _u8(data, l3 + 6)
+        kind[ipv6 & (caplen >= header_len + 40)] = KIND_SKIP
+        kind[ipv6 & ((caplen < header_len + 40) | np.isin(next_header, IPV6_MAY_CARRY_IPV4))] = KIND_FALLBACK
+    return l3, kind
+
+
+class _ScapyFallback:
+    """Поштучный разбор scapy для пакетов, которые не распознал быстрый путь"""
+
+    def __init__(self, linktype):
+        from scapy.config import conf
+        from scapy.layers.inet import IP
+        import scapy.layers.all  # noqa: F401 - регистрирует классы канального уровня
+        self.cls = conf.l2types.num2layer.get(linktype, conf.raw_layer)
+        self.ip_cls = IP
+
+    def parse(self, raw):
+        try:
+            pkt = self.cls(raw)
+        except Exception:
+            return None  # scapy в этом случае тоже отдаёт Raw без IP
+        ip = pkt.getlayer(self.ip_cls)
+        if ip is None:
+            return None
+        # Исходные байты слоя IP: поля из них достаёт тот же код, что и на быстром пути
+        return bytes(ip)
+
+
+def _field32(data, offsets, order):
+    values = _be32(data, offsets)
+    return (values.byteswap() if order == '<' else values).astype(np.int64)
+
+
+def _parse_packets(data, start, caplen, linktype, fallbacks, fields):
+    """Маска IPv4-пакетов и их поля для пачки кадров одного типа канала"""
+    l3, kind = _link_layer(data, start, caplen, linktype)
+
+    ipv4 = kind == KIND_IPV4
+    version_ihl = _u8(data, l3)
+    well_formed = ((version_ihl >> 4) == 4) & ((version_ihl & 0x0f) >= 5) & (caplen >= (l3 - start) + 20)
+    kind[ipv4 & ~well_formed] = KIND_FALLBACK
+    ipv4 &= well_formed
+
+    values = {
+        name: np.where(ipv4, column, 0).astype(np.int64)
+        for name, column in _ip_fields(data, l3, start + caplen, fields).items()
+    }
+
+    fallback_rows = np.flatnonzero(kind == KIND_FALLBACK)
+    if len(fallback_rows):
+        if linktype not in fallbacks:
+            fallbacks[linktype] = _ScapyFallback(linktype)
+        parser = fallbacks[linktype]
+        rows = []
+        headers = []
+        for row in fallback_rows:
+            begin = int(start[row])
+            header = parser.parse(bytes(data[begin:begin + int(caplen[row])]))
+            if header is not None:
+                rows.append(row)
+                headers.append(header)
+        if rows:
+            for name, column in _headers_fields(headers, fields).items():
+                values[name][rows] = column
+            ipv4[rows] = True
+    return ipv4, values
+
+
+def _columns(timestamp, length, values, fields):
+    columns = {
+        'timestamp': pd.to_datetime(timestamp, unit='s', errors='coerce'),
+        'src_ip': values['src'].astype(FIELD_DTYPES['src_ip']),
+        'dst_ip': values['dst'].astype(FIELD_DTYPES['dst_ip']),
+        'protocol': values['proto'].astype(FIELD_DTYPES['protocol']),
+        'length': length.astype(FIELD_DTYPES['length'])
+    }
+    for name in fields:
+        columns[name] = values[name].astype(FIELD_DTYPES[name])
+    return columns
+
+
+def empty_frame(fields=()):
+    empty = np.zeros(0, dtype=np.int64)
+    values = {name: empty for name in ('src', 'dst', 'proto') + tuple(fields)}
+    return pd.DataFrame(_columns(np.zeros(0), empty, values, fields))
+
+
+def _open(path):
+    if os.path.getsize(path) < 24:
+        raise UnsupportedCapture("file is too short for a capture header")
+    # np.memmap сам закрывает отображение, когда на него не остаётся ссылок
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+
+def read_capture_batches(path, batch_rows, fields=()):
+    """DataFrame-пачки по batch_rows записей из libpcap- или pcapng-файла.
+
+    Колонки совпадают с чтением через scapy; fields - дополнительные поля из
+    EXTENDED_FIELDS. UnsupportedCapture поднимается до первой пачки, если
+    формат файла не распознан.
+    """
+    data = _open(path)
+    magic, = struct.unpack_from('<I', data, 0)
+    if magic == PCAPNG_SHB:
+        return _with_row_index(_walk_pcapng(data, batch_rows, fields), fields)
+    for order in ('<', '>'):
+        magic, = struct.unpack_from(order + 'I', data, 0)
+        if magic in (MAGIC_MICRO, MAGIC_NANO):
+            linktype, = struct.unpack_from(order + 'I', data, 20)
+            # Старшие биты поля содержат FCS-флаги, тип канала - младшие 16
+            ts_scale = 1e-9 if magic == MAGIC_NANO else 1e-6
+            return _with_row_index(_walk_pcap(data, order, ts_scale, linktype & 0xffff, batch_rows, fields), fields)
+    raise UnsupportedCapture("not a pcap or pcapng file")
+
+
+def _with_row_index(batches, fields):
+    rows = 0
+    for columns in batches:
+        count = len(columns['length'])
+        if count:
+            yield pd.DataFrame(columns, index=pd.RangeIndex(rows, rows + count))
+            rows += count
+    if rows == 0:
+        yield empty_frame(fields)
+
+
+def _walk_pcap(data, order, ts_scale, linktype, batch_rows, fields):
+    unpack_from = struct.Struct(order + 'I').unpack_from
+    size = len(data)
+    fallbacks = {}
+    pos = 24
+    while True:
+        # Обход заголовков последователен (смещение зависит от предыдущей длины),
+        # поэтому в цикле только запоминаем смещения записей
+        offsets = array('q')
+        append = offsets.append
+        while len(offsets) < batch_rows and pos + 16 <= size:
+            incl_len, = unpack_from(data, pos + 8)
+            if pos + 16 + incl_len > size:
+                break  # обрезанная последняя запись, как у scapy
+            append(pos)
+            pos += 16 + incl_len
+        if offsets:
+            offset = np.frombuffer(offsets, dtype=np.int64)
+            caplen = _field32(data, offset + 8, order)
+            ipv4, values = _parse_packets(data, offset + 16, caplen, linktype, fallbacks, fields)
+            keep = np.flatnonzero(ipv4)
+            # Та же арифметика, что у float(pkt.time) в scapy: секунды + доля как float
+            timestamp = (_field32(data, offset[keep], order).astype(np.float64)
+                         + _field32(data, offset[keep] + 4, order) * ts_scale)
+            yield _columns(timestamp, caplen[keep], {name: column[keep] for name, column in values.items()}, fields)
+        if len(offsets) < batch_rows:
+            break
+
+
+def _idb_options(data, pos, end, order):
+    """tsresol из опций Interface Description Block (по умолчанию микросекунды)"""
+    tsresol = 10 ** 6
+    while pos + 4 <= end:
+        code, length = struct.unpack_from(order + 'HH', data, pos)
+        if code == 0:
+            break
+        if code == 9 and length == 1:
+            value = int(data[pos + 4])
+            tsresol = (2 if value & 128 else 10) ** (value & 127)
+        pos += 4 + length + (-length % 4)
+    return tsresol
+
+
+def _walk_pcapng(data, batch_rows, fields):
+    size = len(data)
+    fallbacks = {}
+    order = '<'
+    interfaces = []
+    pos = 0
+    blocks = array('q')
+    while pos + 12 <= size:
+        # Тип SHB - палиндром, поэтому читается до того, как известен порядок байт
+        block_type, = struct.unpack_from(order + 'I', data, pos)
+        if block_type == PCAPNG_SHB:
+            # Новая секция может сменить порядок байт и список интерфейсов
+            if blocks:
+                yield _pcapng_batch(data, blocks, order, interfaces, fallbacks, fields)
+                blocks = array('q')
+            byte_order, = struct.unpack_from('<I', data, pos + 8)
+            order = '<' if byte_order == PCAPNG_BYTE_ORDER else '>'
+            interfaces = []
+        block_len, = struct.unpack_from(order + 'I', data, pos + 4)
+        if block_len < 12 or pos + block_len > size:
+            break  # обрезанный хвост файла
+        if block_type == PCAPNG_IDB:
+            linktype, snaplen = struct.unpack_from(order + 'HxxI', data, pos + 8)
+            interfaces.append((linktype, snaplen, _idb_options(data, pos + 16, pos + block_len - 4, order)))
+        elif block_type in (PCAPNG_EPB, PCAPNG_SPB):
+            blocks.append(pos)
+            if len(blocks) >= batch_rows:
+                yield _pcapng_batch(data, blocks, order, interfaces, fallbacks, fields)
+                blocks = array('q')
+        pos += block_len
+    if blocks:
+        yield _pcapng_batch(data, blocks, order, interfaces, fallbacks, fields)
+
+
+def _pcapng_batch(data, blocks, order, interfaces, fallbacks, fields):
+    offset = np.frombuffer(blocks, dtype=np.int64)
+    enhanced = _field32(data, offset, order) == PCAPNG_EPB
+    # Simple Packet Block: интерфейс 0, без времени, длина = min(wirelen, snaplen)
+    interface = np.where(enhanced, _field32(data, offset + 8, order), 0)
+    valid = interface < len(interfaces)
+    interface = np.where(valid, interface, 0)
+    snaplen = np.array([iface[1] or 0xffffffff for iface in interfaces] or [0], dtype=np.int64)
+    caplen = np.where(enhanced, _field32(data, offset + 20, order),
+                      np.minimum(_field32(data, offset + 8, order), snaplen[interface]))
+    start = np.where(enhanced, offset + 28, offset + 12)
+
+    count = len(offset)
+    ipv4 = np.zeros(count, dtype=bool)
+    values = {name: np.zeros(count, dtype=np.int64) for name in ('src', 'dst', 'proto') + tuple(fields)}
+    linktypes = np.array([iface[0] for iface in interfaces] or [0], dtype=np.int64)[interface]
+    for linktype in np.unique(linktypes[valid]):
+        rows = np.flatnonzero(valid & (linktypes == linktype))
+        ipv4[rows], parsed = _parse_packets(data, start[rows], caplen[rows], int(linktype), fallbacks, fields)
+        for name, column in parsed.items():
+            values[name][rows] = column
+
+    keep = np.flatnonzero(ipv4)
+    # Время EPB - 64-битный счётчик в единицах tsresol интерфейса
+    ticks = (_field32(data, offset[keep] + 12, order) << 32) | _field32(data, offset[keep] + 16, order)
+    tsresol = np.array([iface[2] for iface in interfaces] or [1], dtype=np.int64)[interface[keep]]
+    # До 2**53 деление точное и совпадает с Decimal в scapy; дальше - секунды + доля
+    timestamp = np.where(ticks < 2 ** 53, ticks / tsresol,
+                         (ticks // tsresol).astype(np.float64) + (ticks % tsresol) / tsresol)
+    timestamp[~enhanced[keep]] = np.nan
+    return _columns(timestamp, caplen[keep], {name: column[keep] for name, column in values.items()}, fields)
+
+
+class _PacketColumns:
+    """Типизированные буферы колонок: пакеты scapy не хранятся, только извлечённые поля"""
+
+    def __init__(self, fields=()):
+        self.fields = fields
+        self._reset()
+
+    def _reset(self):
+        self.timestamp = array('d')
+        self.src_ip = array('I')
+        self.dst_ip = array('I')
+        self.protocol = array('B')
+        self.length = array('I')
+        # Байты слоя IP нужны только для дополнительных полей
+        self.headers = []
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def append(self, timestamp, src_ip, dst_ip, protocol, length, header=None):
+        if self.fields:
+            self.headers.append(header)
+        self.timestamp.append(timestamp)
+        self.src_ip.append(parse_ipv4(src_ip))
+        self.dst_ip.append(parse_ipv4(dst_ip))
+        self.protocol.append(protocol)
+        self.length.append(length)
+
+    def flush(self, start_row):
+        df = pd.DataFrame({
+            # Преобразуем в datetime с обработкой ошибок
+            'timestamp': pd.to_datetime(np.frombuffer(self.timestamp, dtype=np.float64), unit='s', errors='coerce'),
+            'src_ip': np.frombuffer(self.src_ip, dtype=np.uint32).copy(),
+            'dst_ip': np.frombuffer(self.dst_ip, dtype=np.uint32).copy(),
+            'protocol': np.frombuffer(self.protocol, dtype=np.uint8).copy(),
+            'length': np.frombuffer(self.length, dtype=np.uint32).copy()
+        }, index=pd.RangeIndex(start_row, start_row + len(self)))
+        if self.fields:
+            extra = _headers_fields(self.headers, self.fields)
+            for name in self.fields:
+                df[name] = extra[name].astype(FIELD_DTYPES[name])
+        self._reset()
+        return df
+
+
+def read_scapy_batches(path, batch_rows, fields=()):
+    """Запасной путь через scapy для форматов, которые не разбирает быстрый путь"""
+    # scapy импортируется долго - только по необходимости
+    from scapy.utils import PcapReader
+    from scapy.layers.inet import IP
+
+    columns = _PacketColumns(fields)
+    rows = 0
+    # PcapReader читает файл по одному пакету (pcap и pcapng), в отличие от rdpcap
+    with PcapReader(path) as reader:
+        for pkt in reader:
+            ip = pkt.getlayer(IP)
+            if ip is None:
+                continue
+            # Преобразуем timestamp в числовой формат
+            try:
+                ts = float(pkt.time)
+            except ValueError:
+                ts = 0.0  # Значение по умолчанию для некорректных данных
+            columns.append(ts, ip.src, ip.dst, ip.proto, len(pkt), bytes(ip) if fields else None)
+            if len(columns) >= batch_rows:
+                batch = columns.flush(rows)
+                rows += len(batch)
+                yield batch
+    if len(columns) or not rows:
+        yield columns.flush(rows)
+
+
+def _parse_batches(path, batch_rows, fields):
+    try:
+        batches = read_capture_batches(path, batch_rows, fields)
+    except UnsupportedCapture:
+        batches = read_scapy_batches(path, batch_rows, fields)
+    yield from batches
+
+
+def _sidecar_key(path, sidecars, fields):
+    return sidecars.key('pcap', path, [PARSER_VERSION, list(fields)]) if sidecars is not None else None
+
+
+def iter_capture(path, batch_rows=PCAP_BATCH_ROWS, sidecars=None, fields=()):
+    if sidecars is None:
+        return _parse_batches(path, batch_rows, fields)
+    return sidecars.cached_batches(
+        _sidecar_key(path, sidecars, fields), lambda: _parse_batches(path, batch_rows, fields), batch_rows
+    )
+
+
+class _FileSummary:
+    """Сводка по всем строкам файла до фильтра: по ней файлы сливаются так же, как без него"""
+
+    def __init__(self):
+        self.rows = 0
+        self.first = None
+        self.last = None
+        self.ordered = True
+
+    def add(self, timestamp):
+        if not len(timestamp):
+            return
+        # NaT и шаг назад во времени означают, что при слиянии нужна полная сортировка
+        if not timestamp.is_monotonic_increasing or (self.last is not None and timestamp.iloc[0] < self.last):
+            self.ordered = False
+        self.last = timestamp.iloc[-1]
+        low = timestamp.min()
+        if pd.notna(low) and (self.first is None or low < self.first):
+            self.first = low
+        self.rows += len(timestamp)
+
+    def sort_key(self):
+        return self.first if self.first is not None else pd.Timestamp.max
+
+
+def _read_file(path, batch_rows, sidecars, fields, condition):
+    summary = _FileSummary()
+    frames = []
+    for batch in iter_capture(path, batch_rows, sidecars, fields):
+        summary.add(batch['timestamp'])
+        # Номера строк пачки - позиции в файле, поэтому отфильтрованные строки
+        # сохраняют тот же индекс, что и после Filter по всей таблице
+        frames.append(pushdown_rows(batch, condition))
+    return (frames[0] if len(frames) == 1 else pd.concat(frames)), summary
+
+
+def read_capture(path, batch_rows=PCAP_BATCH_ROWS, sidecars=None, fields=(), condition=None):
+    return _read_file(path, batch_rows, sidecars, fields, condition)[0]
+
+
+def _summarize(path, batch_rows, sidecars, fields):
+    summary = _FileSummary()
+    for batch in iter_capture(path, batch_rows, sidecars, fields):
+        summary.add(batch['timestamp'])
+    return summary
+
+
+def iter_captures(paths, batch_rows=PCAP_BATCH_ROWS, sidecars=None, fields=(), condition=None):
+    """Пачки из нескольких файлов в том же порядке и с той же нумерацией строк,
+    что и у read_captures.
+
+    Сначала файлы проходятся один раз ради сводок (с sidecar это дёшево).
+    Файлы без пересечений по времени идут подряд; пересекающиеся, но
+    упорядоченные внутри сливаются k-way по времени. Если порядок внутри
+    какого-то файла нарушен, без сортировки всей таблицы не обойтись, и
+    пачки нарезаются из результата read_captures.
+    """
+    if len(paths) == 1:
+        parts = [(paths[0], None)]
+    else:
+        parts = sorted(
+            ((path, _summarize(path, batch_rows, sidecars, fields)) for path in paths),
+            key=lambda part: part[1].sort_key()
+        )
+        summaries = [summary for _, summary in parts if summary.rows]
+        if not all(summary.ordered for summary in summaries):
+            df = read_captures(paths, sidecars=sidecars, fields=fields, condition=condition)
+            for start in range(0, max(len(df), 1), batch_rows):
+                yield df.iloc[start:start + batch_rows]
+            return
+        if any(prev.last > summary.first for prev, summary in zip(summaries, summaries[1:])):
+            yield from _merge_batches([path for path, _ in parts], batch_rows, sidecars, fields, condition)
+            return
+    rows = 0
+    for path, _ in parts:
+        for batch in iter_capture(path, batch_rows, sidecars, fields):
+            if len(batch) or (rows == 0 and path == parts[-1][0]):
+                yield pushdown_rows(batch.set_axis(pd.RangeIndex(rows, rows + len(batch))), condition)
+                rows += len(batch)
+
+
+def _merge_batches(paths, batch_rows, sidecars, fields, condition):
+    # Каждый файл упорядочен по времени: выдаются строки раньше наименьшего из
+    # последних прочитанных времён, остальные ждут следующих пачек. При равном
+    # времени раньше идёт файл, стоящий раньше в paths, как при устойчивой сортировке
+    sources = [iter(iter_capture(path, batch_rows, sidecars, fields)) for path in paths]
+    pending = [None] * len(paths)
+
+    def times(frame):
+        # Пачки разных файлов могут хранить время в разных единицах
+        return frame['timestamp'].to_numpy(dtype='datetime64[ns]')
+    active = [True] * len(paths)
+    rows = 0
+
+    def pull(index):
+        batch = next(sources[index], None)
+        if batch is None:
+            active[index] = False
+        elif len(batch):
+            pending[index] = batch if pending[index] is None else pd.concat([pending[index], batch])
+
+    while True:
+        for index in range(len(paths)):
+            while active[index] and (pending[index] is None or not len(pending[index])):
+                pull(index)
+        limits = [times(pending[index])[-1] for index in range(len(paths)) if active[index]]
+        bound = min(limits) if limits else None
+        frames = []
+        for index, frame in enumerate(pending):
+            if frame is None or not len(frame):
+                continue
+            count = len(frame) if bound is None else int(times(frame).searchsorted(bound, side='left'))
+            if count:
+                frames.append(frame.iloc[:count])
+                pending[index] = frame.iloc[count:]
+        if frames:
+            merged = pd.concat(frames, ignore_index=True).sort_values('timestamp', kind='stable', ignore_index=True)
+            yield pushdown_rows(merged.set_axis(pd.RangeIndex(rows, rows + len(merged))), condition)
+            rows += len(merged)
+        elif bound is None:
+            return
+        else:
+            # Все готовые строки имеют время bound: дочитываем файлы, упёршиеся в него
+            for index in range(len(paths)):
+                if active[index] and times(pending[index])[-1] == bound:
+                    pull(index)
+
+
+def _parse_file(path, sidecars, fields, condition):
+    # Точка входа рабочего процесса: таблица возвращается через отображаемый в память файл
+    try:
+        frame, summary = _read_file(path, PCAP_BATCH_ROWS, sidecars, fields, condition)
+        return dump_packet(DataPacket(frame)), summary
+    except Exception as e:
+        raise ValueError(f"{os.path.basename(path)}: {e}")
+
+
+def _read_files(paths, max_workers, sidecars, fields, condition):
+    # Файлы с готовым sidecar читаются сразу, процессы нужны только для разбора
+    parts = {}
+    missing = []
+    for path in paths:
+        if sidecars is not None and sidecars.exists(_sidecar_key(path, sidecars, fields)):
+            parts[path] = _read_file(path, PCAP_BATCH_ROWS, sidecars, fields, condition)
+        else:
+            missing.append(path)
+    workers = min(len(missing), max_workers or os.cpu_count() or 1)
+    # В рабочем процессе (Run in Process) дочерние процессы создавать нельзя
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        for path in missing:
+            parts[path] = _read_file(path, PCAP_BATCH_ROWS, sidecars, fields, condition)
+        return [parts[path] for path in paths]
+
+    # Общий пул: одновременные раннеры не умножают число процессов
+    pool = shared_pool()
+    futures = {path: pool.submit(_parse_file, path, sidecars, fields, condition) for path in missing}
+    try:
+        for path, future in futures.items():
+            dump, summary = future.result()
+            try:
+                parts[path] = (load_packet(dump).data, summary)
+            finally:
+                discard(dump)
+    finally:
+        for future in futures.values():
+            if not future.cancel() and future.done() and future.exception() is None:
+                discard(future.result()[0])
+    return [parts[path] for path in paths]
+
+
+def read_captures(paths, max_workers=None, sidecars=None, fields=(), condition=None):
+    """Несколько файлов разбираются параллельно по процессам и сливаются по времени"""
+    if len(paths) == 1:
+        return read_capture(paths[0], sidecars=sidecars, fields=fields, condition=condition)
+    df = merge_by_time(_read_files(paths, max_workers, sidecars, fields, condition), bool(condition))
+    if df is None:
+        # Файлы пересекаются по времени: номера строк известны только после сортировки всей таблицы
+        df = pushdown_rows(merge_by_time(_read_files(paths, max_workers, sidecars, fields, None), False), condition)
+    return df
+
+
+def merge_by_time(parts, filtered=False):
+    """Склеивает таблицы файлов в порядке времени.
+
+    parts - пары (таблица, _FileSummary). Если файлы идут подряд без
+    пересечений, хватает concat. Иначе нужна устойчивая сортировка всей
+    таблицы; для уже отфильтрованных таблиц (filtered) номера строк тогда
+    не восстановить, и возвращается None.
+    """
+    parts = sorted(parts, key=lambda part: part[1].sort_key())
+    summaries = [summary for _, summary in parts if summary.rows]
+    ordered = all(summary.ordered for summary in summaries) and all(
+        prev.last <= summary.first for prev, summary in zip(summaries, summaries[1:])
+    )
+    if ordered:
+        frames = []
+        offset = 0
+        for frame, summary in parts:
+            if len(frame):
+                frames.append(frame.set_axis(frame.index + offset))
+            offset += summary.rows
+        return pd.concat(frames) if frames else parts[0][0]
+    if filtered:
+        return None
+    frames = [frame for frame, _ in parts if len(frame)] or [parts[0][0]]
+    return pd.concat(frames, ignore_index=True).sort_values('timestamp', kind='stable', ignore_index=True)
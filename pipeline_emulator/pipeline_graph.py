@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+Edge = namedtuple('Edge', ['src', 'dst', 'line', 'src_port', 'dst_port'])
+
+
+class PipelineGraph:
+    """Индекс рёбер схемы: входы и выходы каждой ноды по номерам портов"""
+
+    def __init__(self):
+        self._edges = {}
+        self._inputs = {}
+        self._outputs = {}
+
+    def __iter__(self):
+        return iter(list(self._edges.values()))
+
+    def __len__(self):
+        return len(self._edges)
+
+    def add_edge(self, src, dst, line, src_port=0, dst_port=0):
+        if dst_port in self._inputs.get(dst, {}):
+            raise ValueError(f"Input port {dst_port + 1} is already connected")
+        edge = Edge(src, dst, line, src_port, dst_port)
+        self._edges[line] = edge
+        self._inputs.setdefault(dst, {})[dst_port] = edge
+        self._outputs.setdefault(src, {})[line] = edge
+        return edge
+
+    def remove_edge(self, line):
+        edge = self._edges.pop(line, None)
+        if edge is None:
+            return None
+        self._inputs[edge.dst].pop(edge.dst_port, None)
+        self._outputs[edge.src].pop(line, None)
+        return edge
+
+    def remove_node(self, node_id):
+        removed = self.edges_of(node_id)
+        for edge in removed:
+            self.remove_edge(edge.line)
+        self._inputs.pop(node_id, None)
+        self._outputs.pop(node_id, None)
+        return removed
+
+    def clear(self):
+        self._edges.clear()
+        self._inputs.clear()
+        self._outputs.clear()
+
+    def edge(self, line):
+        return self._edges.get(line)
+
+    def predecessors(self, node_id):
+        inputs = self._inputs.get(node_id, {})
+        return [inputs[port] for port in sorted(inputs)]
+
+    def successors(self, node_id):
+        return list(self._outputs.get(node_id, {}).values())
+
+    def edges_of(self, node_id):
+        return self.predecessors(node_id) + self.successors(node_id)
+
+    def in_degree(self, node_id):
+        return len(self._inputs.get(node_id, {}))
+
+    def connected(self, a, b):
+        return any(edge.dst == b for edge in self.successors(a)) or \
+            any(edge.dst == a for edge in self.successors(b))
+
+    def free_port(self, node_id, port_count):
+        used = self._inputs.get(node_id, {})
+        return next((port for port in range(port_count) if port not in used), None)
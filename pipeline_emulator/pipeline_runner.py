@@ -1,26 +1,94 @@
-﻿import threading
+﻿import os
+import time
+import threading
 import queue
 from collections import deque
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, simpledialog
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from node import create_detached_node, NODE_LIBRARY
+from data_packet import DataPacket
+from frame_transfer import dump_packet, load_packet, discard
+from node_cache import NodeCache, node_fingerprint, file_signature
+from process_pool import shared_pool
+from profiler import RunProfiler, peak_rss_bytes
+from streaming import plan_streams, StreamExecutor, StreamError
+from optimizer import plan_projections, plan_pushdown
+
+
+def check_inputs(node, edges):
+    # Ребро остаётся на схеме после уменьшения числа входов; выполнять ноду с ним нельзя
+    count = len(node.ports['in'])
+    for edge in edges:
+        if edge.dst_port >= count:
+            raise ValueError(f"Input port {edge.dst_port + 1} is not available: {node.type} node has {count} input(s)")
+
+
+def _execute_detached(node_type, properties, input_dump):
+    # Точка входа рабочего процесса: нода пересоздаётся без холста
+    cpu_start = time.process_time()
+    rss_start = peak_rss_bytes()
+    node = create_detached_node(node_type, properties)
+    node.input_data = load_packet(input_dump)
+    result_dump = dump_packet(node.execute())
+    stats = {
+        'cpu': time.process_time() - cpu_start,
+        'peak_rss_delta': peak_rss_bytes() - rss_start
+    }
+    return result_dump, stats
+
+
+def port_output(packet, port):
+    # Вход берётся с того выхода источника, к которому подключено ребро
+    return packet.port(port) if isinstance(packet, DataPacket) else packet
+
+
+def port_key(key, port):
+    # Выходы одной ноды различаются для кэша только номером порта
+    return f"{key}:{port}" if key and port else key
+
+
+def input_schema(input_data):
+    """Пустые срезы входных таблиц: по ним интерфейс заполняет списки колонок"""
+    if isinstance(input_data, list):
+        return [input_schema(packet) for packet in input_data]
+    if isinstance(input_data, DataPacket) and isinstance(input_data.data, pd.DataFrame):
+        return DataPacket(input_data.data.iloc[:0])
+    return None
+
 
 class PipelineRunner:
-    def __init__(self, app):
+    def __init__(self, app, max_workers=None, cache=None):
         self.app = app
         self.running = False
         self.execution_queue = queue.Queue()
         self.last_node = None
         self.node_execution_order = []
+        self.successors = {}
         self.current_progress = 0
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self._process_futures = set()
+        self.cache = cache if cache is not None else NodeCache()
+        self.cache_enabled = True
+        self.profiler = RunProfiler()
+        # Число строк в куске для потокового режима; None - ноды получают вход целиком
+        self.chunk_size = None
+        self.stream_components = []
+        # Промежуточные результаты освобождаются, как только их прочли все потребители;
+        # остаются листья схемы, закреплённые ноды и результаты, лежащие в кэше
+        self.release_intermediates = True
+        self._consumers_left = {}
+        self.dirty = set()
+        self.nodes_to_run = set()
+        self._source_signatures = {}
         self._stop_requested = False
+        self._lock = threading.Lock()
 
     def build_execution_order(self):
-        in_degree = {node_id: 0 for node_id in self.app.nodes}
-        graph = {node_id: [] for node_id in self.app.nodes}
-        
-        for src, dst, _ in self.app.edges:
-            graph[src].append(dst)
-            in_degree[dst] += 1
+        graph = {
+            node_id: [edge.dst for edge in self.app.graph.successors(node_id)]
+            for node_id in self.app.nodes
+        }
+        in_degree = {node_id: self.app.graph.in_degree(node_id) for node_id in self.app.nodes}
 
         queue = deque([node_id for node_id, degree in in_degree.items() if degree == 0])
         execution_order = []
@@ -35,55 +103,384 @@ class PipelineRunner:
                     queue.append(neighbor)
         
         self.node_execution_order = [self.app.nodes[node_id] for node_id in execution_order]
-        self.app.progress["maximum"] = len(execution_order)
+        self.successors = graph
+
+    def mark_dirty(self, node):
+        node_id = getattr(node, 'id', node)
+        with self._lock:
+            self.dirty.add(node_id)
+
+    def forget_node(self, node):
+        node_id = getattr(node, 'id', node)
+        with self._lock:
+            self.dirty.discard(node_id)
+            self._source_signatures.pop(node_id, None)
+
+    def plan_execution(self, full=False):
+        # Пересчитываем грязные ноды, ноды без результата и ноды с изменившимися
+        # исходными файлами, а также всех их потомков; остальные отдают output_data
+        with self._lock:
+            seeds = {
+                node.id for node in self.node_execution_order
+                if full
+                or node.id in self.dirty
+                or (node.output_data is None and not node.output_released)
+                or self._source_signatures.get(node.id) != self._source_signature(node)
+            }
+        stack = list(seeds)
+        while stack:
+            for neighbor in self.successors[stack.pop()]:
+                if neighbor not in seeds:
+                    seeds.add(neighbor)
+                    stack.append(neighbor)
+        # Промежуточный результат потока не хранится: если он снова нужен
+        # пересчитываемой ноде, восстанавливаем его вместе с такими же предками
+        stack = list(seeds)
+        while stack:
+            for edge in self.app.graph.predecessors(stack.pop()):
+                source = self.app.nodes[edge.src]
+                if edge.src not in seeds and source.output_released:
+                    seeds.add(edge.src)
+                    stack.append(edge.src)
+        with self._lock:
+            self.dirty |= seeds
+        self.nodes_to_run = seeds
+        return seeds
+
+    def _file_properties(self, node):
+        return [
+            prop['name'] for prop in NODE_LIBRARY[node.type]['properties']
+            if prop['type'] == 'file'
+        ]
+
+    def _source_signature(self, node):
+        # Другой набор полей или перенесённое условие - другой результат, как и изменённый файл
+        files = [file_signature(node.properties.get(name, '')) for name in self._file_properties(node)]
+        return files, node.projection, node.pushdown
 
     def execute_node(self, node):
         if self._stop_requested:
-            return
+            return False
 
+        record = self.profiler.begin(node)
+        stats = {}
         try:
-            self.app.after(0, self._update_node_visual, node, "executing")
+            self._notify(self._update_node_visual, node, "executing")
         
+            # Входы упорядочены по номеру порта: для Merge это input1, input2
             input_data = []
-            for src, dst, _ in self.app.edges:
-                if dst == node.id:
-                    input_data.append(self.app.nodes[src].output_data)
+            input_keys = []
+            predecessors = self.app.graph.predecessors(node.id)
+            check_inputs(node, predecessors)
+            for edge in predecessors:
+                source = self.app.nodes[edge.src]
+                input_data.append(port_output(source.output_data, edge.src_port))
+                input_keys.append(port_key(getattr(source, 'cache_key', None), edge.src_port))
         
             node.input_data = input_data[0] if len(input_data) == 1 else input_data
-            result = node.execute()
+            node.input_keys = {edge.dst_port: key for edge, key in zip(predecessors, input_keys)}
+            key = self._cache_key(node, input_keys)
+
+            def compute():
+                if node.properties.get('run_in_process'):
+                    result, stats['worker'] = self._execute_in_process(node)
+                    return result
+                return node.execute()
+
+            if key:
+                result, node.from_cache = self.cache.get_or_compute(key, compute)
+            else:
+                result, node.from_cache = compute(), False
         
             node.output_data = result
-            self.last_node = node
-            self.current_progress += 1
-        
-            self.app.after(0, self._update_progress)
-            self.app.after(0, self._update_node_visual, node, "completed")
+            node.output_released = False
+            node.cache_key = key
+            self.profiler.end(record, node.input_data, result, node.from_cache, stats.get('worker'))
+            if self.release_intermediates:
+                # Ссылка на вход держала бы освобождённый результат предка
+                node.input_data = input_schema(node.input_data)
+            self._complete_node(node)
+            return True
 
         except Exception as e:
-            self.app.after(0, self._handle_error, node, e)
-            return 
+            self.profiler.end(record, node.input_data, None, worker_stats=stats.get('worker'), error=e)
+            # Останавливаем планировщик сразу, не дожидаясь обработчика в UI-потоке
+            self._stop_requested = True
+            self._notify(self._handle_error, node, e)
+            return False
+
+    def _complete_node(self, node):
+        with self._lock:
+            self.current_progress += 1
+            self.dirty.discard(node.id)
+            self._source_signatures[node.id] = self._source_signature(node)
+    
+        self._notify(self._update_progress)
+        self._notify(self._update_node_visual, node, "completed")
+
+    def execute_stream(self, component):
+        if self._stop_requested:
+            return False
+
+        keys = {}
+        for node in component.nodes:
+            predecessors = self.app.graph.predecessors(node.id)
+            try:
+                check_inputs(node, predecessors)
+            except ValueError as e:
+                self._stop_requested = True
+                self._notify(self._handle_error, node, e)
+                return False
+            input_keys = [port_key(keys[edge.src], edge.src_port) for edge in predecessors]
+            keys[node.id] = self._cache_key(node, input_keys)
+            # Ключи входов по портам: по ним нода узнаёт неизменившийся вход (Merge хранит индекс соединения)
+            node.input_keys = {edge.dst_port: key for edge, key in zip(predecessors, input_keys)}
+
+        # Поток не запускаем, если все его результаты уже есть в кэше
+        cached = {}
+        for node in component.terminals:
+            packet = self.cache.get(keys[node.id]) if keys[node.id] else None
+            if packet is None:
+                break
+            cached[node.id] = packet
+
+        executor = None
+        if len(cached) == len(component.terminals):
+            results = cached
+        else:
+            executor = StreamExecutor(self, component, self.chunk_size)
+            try:
+                results = executor.run()
+            except StreamError as e:
+                for node in component.nodes:
+                    if node.id in executor.stats:
+                        record, stats = executor.node_stats(node)
+                        error = e.error if node is e.node else None
+                        self.profiler.end(record, None, None, error=error, stream_stats=stats)
+                self._stop_requested = True
+                self._notify(self._handle_error, e.node, e.error)
+                return False
+            if self._stop_requested:
+                return False
+            for node_id, packet in results.items():
+                if keys[node_id]:
+                    self.cache.put(keys[node_id], packet)
+
+        for node in component.nodes:
+            record = stats = None
+            if executor is not None:
+                record, stats = executor.node_stats(node)
+                node.input_data = executor.input_schema(node)
+            else:
+                record = self.profiler.begin(node)
+            result = results.get(node.id)
+            node.output_data = result
+            node.output_released = result is None
+            node.from_cache = executor is None
+            node.cache_key = keys[node.id]
+            self.profiler.end(record, None, result, node.from_cache, stream_stats=stats)
+            self._complete_node(node)
+        return True
+
+    def _consumed(self, node):
+        # Вызывается из потока планировщика после успешного выполнения ноды
+        for edge in self.app.graph.predecessors(node.id):
+            left = self._consumers_left.get(edge.src)
+            if left is None:
+                continue
+            self._consumers_left[edge.src] = left - 1
+            if left == 1:
+                self._release(self.app.nodes[edge.src])
+
+    def _can_release(self, node):
+        if not self.app.graph.successors(node.id) or node.pinned:
+            return False
+        # Результат из кэша не занимает лишней памяти и восстанавливается мгновенно
+        return not (node.cache_key and self.cache.holds(node.cache_key))
+
+    def _release(self, node):
+        if node.output_data is None or not self._can_release(node):
+            return
+        node.output_data = None
+        node.output_released = True
+
+    def restore_output(self, node):
+        """Возвращает освобождённый результат ноды: из кэша или пересчётом от сохранённых предков"""
+        if node.output_data is not None or not node.output_released:
+            return node.output_data
+        if self.running:
+            raise RuntimeError("Pipeline is running")
+
+        order = []
+        def visit(current):
+            if current in order:
+                return
+            for edge in self.app.graph.predecessors(current.id):
+                source = self.app.nodes[edge.src]
+                if source.output_data is None:
+                    if not source.output_released:
+                        raise ValueError(f"{source.name} has no data, run the pipeline first")
+                    visit(source)
+            order.append(current)
+        visit(node)
+
+        for current in order:
+            packet = self.cache.get(current.cache_key) if current.cache_key else None
+            if packet is None:
+                inputs = [
+                    port_output(self.app.nodes[edge.src].output_data, edge.src_port)
+                    for edge in self.app.graph.predecessors(current.id)
+                ]
+                current.input_data = inputs[0] if len(inputs) == 1 else inputs
+                packet = current.execute()
+                current.input_data = input_schema(current.input_data)
+            current.output_data = packet
+            current.output_released = False
+        # Предков снова отпускаем: пользователь просил только эту ноду
+        for current in order[:-1]:
+            self._release(current)
+        return node.output_data
+
+    def unfiltered_output(self, node):
+        """Результат источника без перенесённого в него условия Filter.
 
-    def run(self):
+        Показ и выгрузка данных источника должны видеть все прочитанные строки,
+        поэтому такой источник перечитывается (или берётся из кэша) без условия.
+        """
+        if node.pushdown is None or (node.output_data is None and not node.output_released):
+            return self.restore_output(node)
+        if self.running:
+            raise RuntimeError("Pipeline is running")
+        node.pushdown = None
+        # У источника нет входов, ключ зависит только от свойств и файлов
+        key = self._cache_key(node, [])
+        if key:
+            packet, _ = self.cache.get_or_compute(key, node.execute)
+        else:
+            packet = node.execute()
+        node.output_data = packet
+        node.output_released = False
+        node.cache_key = key
+        return packet
+
+    def _cache_key(self, node, input_keys):
+        if not self.cache_enabled or None in input_keys:
+            return None
+        return node_fingerprint(node, input_keys, self._file_properties(node))
+
+    def _execute_in_process(self, node):
+        # Входные DataFrame уходят в процесс через отображаемые в память буферы,
+        # а не через pickle; результат возвращается тем же способом
+        input_dump = dump_packet(node.input_data)
+        try:
+            future = shared_pool().submit(
+                _execute_detached, node.type, dict(node.properties), input_dump
+            )
+            with self._lock:
+                self._process_futures.add(future)
+            try:
+                result_dump, stats = future.result()
+            finally:
+                with self._lock:
+                    self._process_futures.discard(future)
+        finally:
+            discard(input_dump)
+        try:
+            return load_packet(result_dump), stats
+        finally:
+            discard(result_dump)
+
+    def shutdown(self):
+        self.stop()
+        # Пул общий с другими раннерами: снимаем только свои задачи из очереди
+        with self._lock:
+            futures = list(self._process_futures)
+        for future in futures:
+            future.cancel()
+
+    def run(self, full=False):
         if self.running:
             return
 
+        self._prepare_run(full)
+        threading.Thread(target=self._run_pipeline, daemon=True).start()
+
+    def _prepare_run(self, full):
         self.running = True
         self._stop_requested = False
         self.last_node = None
         self.current_progress = 0
         self.build_execution_order()
-        
-        threading.Thread(target=self._run_pipeline, daemon=True).start()
+        plan_projections(self)
+        plan_pushdown(self)
+        self.plan_execution(full)
+        self.stream_components = plan_streams(self) if self.chunk_size else []
+        self._set_progress_maximum(len(self.nodes_to_run))
+        self.profiler.start_run()
+        for node in self.node_execution_order:
+            if node.id not in self.nodes_to_run:
+                self._update_node_visual(node, "completed")
+
+    def _notify(self, callback, *args):
+        # Все обращения к интерфейсу выполняются в UI-потоке через app.after
+        self.app.after(0, callback, *args)
 
     def _run_pipeline(self):
         try:
-            for node in self.node_execution_order:
-                if self._stop_requested:
-                    break
-                
-                self.execute_node(node)
-                
-            self.app.after(0, self._finalize_execution)
+            # Потоковые компоненты выполняются одной задачей; входов извне у них нет
+            streamed = set()
+            for component in self.stream_components:
+                streamed.update(component.node_ids)
+
+            # Сколько пересчитываемых потребителей ещё должны прочитать результат ноды
+            self._consumers_left = {
+                node_id: sum(edge.dst in self.nodes_to_run for edge in self.app.graph.successors(node_id))
+                for node_id in self.app.nodes
+            } if self.release_intermediates else {}
+
+            # Ждём только входы, которые пересчитываются в этом запуске
+            remaining = {
+                node_id: sum(edge.src in self.nodes_to_run for edge in self.app.graph.predecessors(node_id))
+                for node_id in self.nodes_to_run if node_id not in streamed
+            }
+            completed = set()
+
+            # Ready-queue: нода отправляется в пул, как только завершены все её входы
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                pending = {
+                    pool.submit(self.execute_stream, component): component.nodes
+                    for component in self.stream_components
+                }
+                pending.update({
+                    pool.submit(self.execute_node, node): [node]
+                    for node in self.node_execution_order
+                    if node.id in remaining and remaining[node.id] == 0
+                })
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        nodes = pending.pop(future)
+                        if not future.result() or self._stop_requested:
+                            continue
+                        for node in nodes:
+                            completed.add(node.id)
+                            self._consumed(node)
+                            for neighbor in self.successors[node.id]:
+                                # Потоковые ноды и потомки восстановленных предков тут не ждут
+                                if neighbor not in remaining:
+                                    continue
+                                remaining[neighbor] -= 1
+                                if remaining[neighbor] == 0:
+                                    successor = self.app.nodes[neighbor]
+                                    pending[pool.submit(self.execute_node, successor)] = [successor]
+
+            self.last_node = next(
+                (node for node in reversed(self.node_execution_order)
+                 if node.output_data and (node.id in completed or node.id not in self.nodes_to_run)),
+                None
+            )
+            self.profiler.finish_run()
+            self._notify(self._finalize_execution)
             
         finally:
             self.running = False
@@ -98,20 +495,71 @@ class PipelineRunner:
         node.canvas.itemconfig(node.rect, fill=color)
         self.app.canvas.update_idletasks()
 
+    def _set_progress_maximum(self, maximum):
+        self.app.progress["maximum"] = maximum
+
     def _update_progress(self):
         self.app.progress["value"] = self.current_progress
 
     def _handle_error(self, node, error):
         self._update_node_visual(node, "error")
-        self.app.log.insert(tk.END, f"Error in {node.name}: {str(error)}\n")
+        self.app.log.insert("end", f"Error in {node.name}: {str(error)}\n")
         self.stop()
 
     def _finalize_execution(self):
         if self.last_node and self.last_node.output_data:
             self.app.show_data_preview(self.last_node.output_data.data)
         self.running = False
-        self.app.log.insert(tk.END, "Pipeline execution completed\n")
+        for line in self.profiler.summary_lines():
+            self.app.log.insert("end", f"  {line}\n")
+        self.app.log.insert("end", "Pipeline execution completed\n")
 
     def stop(self):
         self._stop_requested = True
-        self.running = False
\ No newline at end of file
+        self.running = False
+
+class HeadlessRunner(PipelineRunner):
+    """Выполняет схему без Tk: тот же планировщик и кэш, сообщения уходят в log"""
+
+    def __init__(self, scheme, max_workers=None, log=print, cache=None):
+        super().__init__(scheme, max_workers, cache)
+        self.log = log
+        self.errors = []
+
+    def run(self, full=False):
+        if self.running:
+            return False
+
+        self._prepare_run(full)
+        self._run_pipeline()
+        return not self.errors
+
+    def _prepare_run(self, full):
+        self.errors = []
+        super()._prepare_run(full)
+
+    def _notify(self, callback, *args):
+        callback(*args)
+
+    def _set_progress_maximum(self, maximum):
+        pass
+
+    def _update_node_visual(self, node, status):
+        pass
+
+    def _update_progress(self):
+        pass
+
+    def _handle_error(self, node, error):
+        self.errors.append((node, error))
+        self.log(f"Error in {node.name}: {str(error)}")
+        self.stop()
+
+    def _finalize_execution(self):
+        self.running = False
+        for line in self.profiler.summary_lines():
+            self.log(f"  {line}")
+        if self.errors:
+            self.log("Pipeline execution failed")
+        else:
+            self.log("Pipeline execution completed")
@@ -0,0 +1,31 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Один пул процессов на процесс приложения. Раннеры (в том числе экземпляры
+# прогона по сетке) и параллельное чтение pcap отправляют задачи в него, так
+# что рабочих процессов не больше числа ядер, сколько бы раннеров ни шло.
+
+_lock = threading.Lock()
+_pool = None
+
+
+def shared_pool():
+    global _pool
+    with _lock:
+        # Пул, у которого упал рабочий процесс, больше задач не принимает
+        if _pool is None or getattr(_pool, '_broken', False):
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_pool)
@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+import threading
+
+import pandas as pd
+
+from data_packet import DataPacket
+from node_cache import packet_size
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдаёт килобайты, macOS - байты
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if os.name == 'nt':
+        return _peak_working_set_windows()
+    return 0
+
+
+def _peak_working_set_windows():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return 0
+    return counters.PeakWorkingSetSize
+
+
+def count_rows(packet):
+    if isinstance(packet, list):
+        return sum(count_rows(item) for item in packet)
+    if isinstance(packet, DataPacket) and isinstance(packet.data, pd.DataFrame):
+        return len(packet.data)
+    return 0
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class RunProfiler:
+    """Замеры выполнения нод за один запуск схемы"""
+
+    def __init__(self):
+        self.records = []
+        self.run_started = time.perf_counter()
+        self.run_wall = 0.0
+        self._lock = threading.Lock()
+
+    def start_run(self):
+        with self._lock:
+            self.records = []
+            self.run_started = time.perf_counter()
+            self.run_wall = 0.0
+
+    def finish_run(self):
+        self.run_wall = time.perf_counter() - self.run_started
+
+    def begin(self, node):
+        # Пиковый RSS общий для процесса: при параллельных ветках прирост
+        # приписывается той ноде, во время которой пик был достигнут
+        return {
+            'node_id': node.id,
+            'name': node.name,
+            'type': node.type,
+            'thread': threading.current_thread().name,
+            'tid': threading.get_ident(),
+            '_start': time.perf_counter(),
+            '_cpu': time.thread_time(),
+            '_rss': peak_rss_bytes()
+        }
+
+    def end(self, record, input_data, result, cached=False, worker_stats=None, error=None,
+            stream_stats=None):
+        end = time.perf_counter()
+        cpu = time.thread_time() - record.pop('_cpu')
+        rss_delta = peak_rss_bytes() - record.pop('_rss')
+        start = record.pop('_start')
+        wall = end - start
+        rows_in = count_rows(input_data)
+        rows_out = count_rows(result)
+        if worker_stats:
+            cpu += worker_stats.get('cpu', 0.0)
+            rss_delta = max(rss_delta, worker_stats.get('peak_rss_delta', 0))
+        if stream_stats:
+            # Ноды потока работают вперемешку в одном потоке: учитываем только
+            # время их собственных вызовов и строки, прошедшие через них
+            wall = stream_stats['wall']
+            cpu = stream_stats['cpu']
+            rows_in = stream_stats['rows_in']
+            rows_out = stream_stats['rows_out']
+        record.update({
+            'start': start - self.run_started,
+            'wall': wall,
+            'cpu': cpu,
+            'peak_rss_delta': rss_delta,
+            'rows_in': rows_in,
+            'rows_out': rows_out,
+            'output_bytes': packet_size(result),
+            'cached': cached,
+            'in_process': bool(worker_stats),
+            'chunks': stream_stats['chunks'] if stream_stats else 0,
+            'error': str(error) if error else None
+        })
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def summary_lines(self):
+        records = sorted(self.records, key=lambda r: r['start'])
+        lines = []
+        for r in records:
+            flags = []
+            if r['cached']:
+                flags.append('cache')
+            if r['in_process']:
+                flags.append('process')
+            if r['chunks']:
+                flags.append(f"{r['chunks']} chunks")
+            if r['error']:
+                flags.append('error')
+            lines.append(
+                f"{r['name']}: {r['wall'] * 1000:.1f} ms wall, {r['cpu'] * 1000:.1f} ms CPU, "
+                f"rows {r['rows_in']} -> {r['rows_out']}, {format_bytes(r['output_bytes'])}, "
+                f"RSS +{format_bytes(r['peak_rss_delta'])}"
+                + (f" [{', '.join(flags)}]" if flags else "")
+            )
+        node_time = sum(r['wall'] for r in records)
+        if records and self.run_wall > 0:
+            lines.append(
+                f"Total: {self.run_wall * 1000:.1f} ms wall, {node_time * 1000:.1f} ms in nodes "
+                f"(parallelism x{node_time / self.run_wall:.2f})"
+            )
+        return lines
+
+    def to_dict(self):
+        return {
+            'run_wall': self.run_wall,
+            'nodes': sorted(self.records, key=lambda r: r['start'])
+        }
+
+    def export_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for r in self.records:
+            threads.setdefault(r['tid'], r['thread'])
+            events.append({
+                'name': r['name'],
+                'cat': r['type'],
+                'ph': 'X',
+                'ts': r['start'] * 1e6,
+                'dur': r['wall'] * 1e6,
+                'pid': pid,
+                'tid': r['tid'],
+                'args': {
+                    key: r[key] for key in (
+                        'node_id', 'cpu', 'peak_rss_delta', 'rows_in', 'rows_out',
+                        'output_bytes', 'cached', 'in_process', 'chunks', 'error'
+                    )
+                }
+            })
+        for tid, name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
@@ -1,3 +1,5 @@
+import numpy as np
+
 PROTOCOL_MAP = {
     1: 'ICMP',
     2: 'IGMP',
@@ -14,4 +16,16 @@ PROTOCOL_MAP = {
     132: 'SCTP',
     137: 'MPLS',
     245: 'CRUDP'
-}
\ No newline at end of file
+}
+
+# Имена для всех 256 номеров: колонка протоколов переводится одной выборкой по индексу
+PROTOCOL_NAMES = np.array([PROTOCOL_MAP.get(n, f"Unknown ({n})") for n in range(256)], dtype=object)
+
+
+def protocol_names(values):
+    """Номера протоколов -> имена"""
+    values = np.asarray(values)
+    if values.dtype.kind in 'ui' and len(values) and values.min() >= 0 and values.max() < 256:
+        return PROTOCOL_NAMES[values]
+    # NaN и номера из CSV с плавающей точкой
+    return np.array([PROTOCOL_MAP.get(v, f"Unknown ({v})") for v in values], dtype=object)
\ No newline at end of file
@@ -0,0 +1,88 @@
+import os
+import json
+import ntpath
+
+from node import NODE_LIBRARY, create_detached_node, upgrade_properties
+from pipeline_graph import PipelineGraph
+
+
+class Scheme:
+    """Схема без холста: ноды и рёбра из JSON, сохранённого save_scheme"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.nodes = {}
+        self.graph = PipelineGraph()
+
+    def find_node(self, ref):
+        if ref in self.nodes:
+            return self.nodes[ref]
+        matches = [node for node in self.nodes.values() if node.name == ref]
+        if not matches:
+            raise KeyError(f"Node not found: {ref}")
+        if len(matches) > 1:
+            raise KeyError(f"Node name is ambiguous, use the node id: {ref}")
+        return matches[0]
+
+    def set_property(self, ref, name, value):
+        node = self.find_node(ref)
+        if name not in node.properties:
+            raise KeyError(f"{node.type} node has no property '{name}'")
+        node.properties[name] = coerce_property(node.type, name, value)
+        if name == node.ports.get('in_count'):
+            node.update_ports()
+        return node
+
+    def sinks(self):
+        return [node for node in self.nodes.values() if not self.graph.successors(node.id)]
+
+
+def coerce_property(node_type, name, value):
+    if not isinstance(value, str):
+        return value
+    prop_def = next((p for p in NODE_LIBRARY[node_type]['properties'] if p['name'] == name), {})
+    prop_type = prop_def.get('type')
+    if prop_type == 'int':
+        return int(value)
+    if prop_type == 'bool':
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    if prop_type == 'multiselect':
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return value
+
+
+def load_scheme(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        data = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    scheme = Scheme(path)
+    port_maps = {}
+    for nd in data.get('nodes', []):
+        node = create_detached_node(
+            nd['type'], nd.get('properties', {}), node_id=nd['id'], name=nd.get('name')
+        )
+        # Относительные пути к файлам считаются от папки схемы
+        for prop in NODE_LIBRARY[node.type]['properties']:
+            value = node.properties.get(prop['name'])
+            if prop['type'] == 'file' and value and not (os.path.isabs(value) or ntpath.isabs(value)):
+                node.properties[prop['name']] = os.path.join(base_dir, value)
+        node.pinned = nd.get('pinned', False)
+        port_maps[node.id] = upgrade_properties(node)
+        scheme.nodes[node.id] = node
+
+    for line, ed in enumerate(data.get('edges', [])):
+        src, dst = scheme.nodes.get(ed['src']), scheme.nodes.get(ed['dst'])
+        if not src or not dst:
+            continue
+        in_count = len(dst.ports['in'])
+        dst_port = ed.get('dst_port')
+        if dst_port is None or any(e.dst_port == dst_port for e in scheme.graph.predecessors(dst.id)):
+            dst_port = scheme.graph.free_port(dst.id, in_count)
+        # Ребро к входу сверх текущего числа входов остаётся (как в редакторе):
+        # число входов может поменять --set, иначе об ошибке сообщит запуск
+        if dst_port is None or (dst_port >= in_count and 'in_count' not in dst.ports):
+            raise ValueError(f"{dst.name}: {dst.type} node can only have {in_count} input(s)")
+        src_port = ed.get('src_port', 0)
+        scheme.graph.add_edge(src.id, dst.id, line, port_maps[src.id].get(src_port, src_port), dst_port)
+    return scheme
@@ -0,0 +1,213 @@
+import os
+import json
+import uuid
+import hashlib
+
+import pandas as pd
+
+# Разобранные таблицы источников (PCAP, CSV) сохраняются рядом в формате
+# Arrow IPC. Следующий запуск отображает файл в память вместо повторного
+# разбора. Ключ - путь, размер и mtime исходного файла плюс версия парсера,
+# поэтому правка файла или парсера сама делает старый sidecar ненужным.
+
+
+def default_directory():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pipeline_emulator', 'sidecars')
+
+
+def _arrow():
+    # pyarrow не обязателен: без него sidecar просто выключен
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+class SidecarCache:
+    """Каталог Arrow-файлов с разобранными источниками, вытеснение по LRU"""
+
+    def __init__(self, directory=None, max_bytes=10 * 1024 ** 3, min_source_bytes=1024 ** 2, enabled=True):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        # Маленькие файлы разбираются быстрее, чем открывается sidecar
+        self.min_source_bytes = min_source_bytes
+        self.enabled = enabled
+
+    def key(self, kind, path, version):
+        """Ключ sidecar для файла или None, если sidecar не используется"""
+        if not self.enabled or _arrow() is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_size < self.min_source_bytes:
+            return None
+        payload = [kind, version, os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+        return hashlib.sha256(json.dumps(payload).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def _open(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        pa = _arrow()
+        try:
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            os.utime(path)
+        except (OSError, pa.ArrowException):
+            return None
+        return table
+
+    def exists(self, key):
+        return key is not None and os.path.exists(self._path(key))
+
+    def load(self, key):
+        """DataFrame из sidecar или None"""
+        if key is None:
+            return None
+        table = self._open(key)
+        if table is None:
+            return None
+        return table.to_pandas()
+
+    def iter_batches(self, key, batch_rows):
+        """Куски по batch_rows строк из sidecar (None, если его нет)"""
+        if key is None:
+            return None
+        table = self._open(key)
+        if table is None:
+            return None
+        return _slices(table, batch_rows)
+
+    def store(self, key, df):
+        if key is None:
+            return
+        writer = self.writer(key)
+        writer.write(df)
+        writer.commit()
+
+    def writer(self, key):
+        return _SidecarWriter(self, key)
+
+    def cached(self, key, parse):
+        """Таблица из sidecar, иначе parse() с сохранением результата"""
+        df = self.load(key)
+        if df is None:
+            df = parse()
+            self.store(key, df)
+        return df
+
+    def cached_batches(self, key, batches, batch_rows):
+        """Поток кусков из sidecar; при промахе sidecar пишется по ходу чтения batches()"""
+        chunks = self.iter_batches(key, batch_rows)
+        if chunks is not None:
+            yield from chunks
+            return
+        if key is None:
+            yield from batches()
+            return
+        writer = self.writer(key)
+        try:
+            for batch in batches():
+                writer.write(batch)
+                yield batch
+        except BaseException:
+            # Ошибка или остановленный поток: недописанный файл не сохраняем
+            writer.abort()
+            raise
+        writer.commit()
+
+    def _evict(self):
+        files = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith('.arrow'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass  # на Windows отображённый в память файл удалить нельзя
+
+
+def _slices(table, batch_rows):
+    for start in range(0, max(table.num_rows, 1), batch_rows):
+        # slice не копирует данные, to_pandas делает кусок независимым от файла
+        df = table.slice(start, batch_rows).to_pandas()
+        df.index = pd.RangeIndex(start, start + len(df))
+        yield df
+
+
+class _SidecarWriter:
+    """Запись sidecar по кускам во временный файл; появляется только после commit"""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.path = cache._path(key)
+        self.tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        self.writer = None
+        self.schema = None
+        self.failed = False
+
+    def write(self, df):
+        if self.failed:
+            return
+        pa = _arrow()
+        try:
+            if self.schema is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                os.makedirs(self.cache.directory, exist_ok=True)
+                self.schema = table.schema
+                self.writer = pa.ipc.new_file(self.tmp_path, self.schema)
+            else:
+                # Типы колонок разных кусков CSV могут разойтись - тогда без sidecar
+                table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+            self.writer.write_table(table)
+        except (OSError, ValueError, TypeError, pa.ArrowException):
+            self.abort()
+
+    def commit(self):
+        if self.failed or self.writer is None:
+            return
+        try:
+            self.writer.close()
+            os.replace(self.tmp_path, self.path)
+        except OSError:
+            self.abort()
+            return
+        self.cache._evict()
+
+    def abort(self):
+        self.failed = True
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+        if os.path.exists(self.tmp_path):
+            try:
+                os.remove(self.tmp_path)
+            except OSError:
+                pass
+
+
+# Общий для всех нод экземпляр; настраивается из интерфейса и командной строки
+SIDECARS = SidecarCache()
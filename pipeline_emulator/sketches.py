@@ -0,0 +1,152 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Приближённые счётчики частых значений с ограниченной памятью. Space-Saving
+# держит не больше capacity ключей и завышает их счёт не больше чем на
+# N / capacity; Count-Min оценивает счёт любого ключа с той же ошибкой
+# (с вероятностью 1 - 2**-depth). Оба сливаются: сводки кусков и процессов
+# складываются в сводку всего потока с теми же гарантиями.
+
+# Сколько значений разбирается за раз: factorize всей колонки занял бы память
+# по числу её различных значений, а не по размеру сводки
+SLICE_ROWS = 65536
+# Строк Count-Min: вероятность превысить ошибку - не больше exp(-depth)
+COUNT_MIN_DEPTH = 5
+# Общие для всех процессов множители хешей: иначе таблицы не сложить
+_HASH_SEEDS = np.random.default_rng(0x5EED).integers(1, 2 ** 63, size=(COUNT_MIN_DEPTH, 2), dtype=np.uint64) | np.uint64(1)
+
+
+def value_counts(values):
+    """Уникальные значения и их число без NaN"""
+    codes, uniques = pd.factorize(np.asarray(values))
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques)).astype(np.int64)
+    return np.asarray(uniques), counts
+
+
+class SpaceSaving:
+    """Сводка Space-Saving в сливаемой форме.
+
+    Для каждого ключа хранится завышенный счёт и его возможная ошибка; floor -
+    верхняя граница счёта любого ключа вне сводки. Слияние складывает счета,
+    подставляя floor там, где ключа нет, и оставляет capacity самых частых.
+    """
+
+    def __init__(self, capacity, keys=None, counts=None, errors=None, floor=0):
+        self.capacity = capacity
+        self.keys = np.zeros(0) if keys is None else keys
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else counts
+        self.errors = np.zeros(0, dtype=np.int64) if errors is None else errors
+        self.floor = floor
+        self._truncate()
+
+    @classmethod
+    def from_values(cls, values, capacity):
+        keys, counts = value_counts(values)
+        return cls(capacity, keys, counts, np.zeros(len(keys), dtype=np.int64))
+
+    def _truncate(self):
+        if len(self.keys) <= self.capacity:
+            return
+        order = np.argsort(-self.counts, kind='stable')
+        keep, drop = order[:self.capacity], order[self.capacity:]
+        # Отброшенный ключ мог набрать не больше своего счёта
+        self.floor = max(self.floor, int(self.counts[drop].max()))
+        self.keys, self.counts, self.errors = self.keys[keep], self.counts[keep], self.errors[keep]
+
+    def merge(self, other):
+        # Пустая сводка не должна менять тип ключей другой (uint32 -> float64)
+        keys = [part for part in (self.keys, other.keys) if len(part)]
+        inverse, union = pd.factorize(np.concatenate(keys) if keys else self.keys)
+        own, theirs = inverse[:len(self.keys)], inverse[len(self.keys):]
+        counts = np.full(len(union), self.floor + other.floor, dtype=np.int64)
+        errors = counts.copy()
+        counts[own] += self.counts - self.floor
+        errors[own] += self.errors - self.floor
+        counts[theirs] += other.counts - other.floor
+        errors[theirs] += other.errors - other.floor
+        return SpaceSaving(max(self.capacity, other.capacity), np.asarray(union), counts, errors,
+                           self.floor + other.floor)
+
+    def estimate(self, keys):
+        """Завышенный счёт ключей; для ключей вне сводки - floor"""
+        position = pd.Index(self.keys).get_indexer(np.asarray(keys))
+        return np.where(position >= 0, self.counts[position], self.floor)
+
+    def top(self, n):
+        order = np.argsort(-self.counts, kind='stable')[:n]
+        return self.keys[order], self.counts[order], self.errors[order]
+
+
+class CountMin:
+    """Таблица Count-Min: depth строк по width счётчиков (width - степень двойки)"""
+
+    def __init__(self, width, depth=COUNT_MIN_DEPTH):
+        self.bits = max(1, math.ceil(math.log2(width)))
+        self.table = np.zeros((depth, 1 << self.bits), dtype=np.int64)
+
+    def _columns(self, keys):
+        # Multiply-shift по 64-битному хешу pandas: он одинаков во всех процессах
+        hashed = pd.util.hash_array(np.asarray(keys))
+        shift = np.uint64(64 - self.bits)
+        return [((hashed * a + b) >> shift).astype(np.intp) for a, b in _HASH_SEEDS[:len(self.table)]]
+
+    def add(self, keys, counts):
+        width = self.table.shape[1]
+        for row, columns in zip(self.table, self._columns(keys)):
+            row += np.bincount(columns, weights=counts, minlength=width).astype(np.int64)
+
+    def merge(self, other):
+        merged = CountMin(1 << self.bits, len(self.table))
+        merged.table = self.table + other.table
+        return merged
+
+    def estimate(self, keys):
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        return np.min([row[columns] for row, columns in zip(self.table, self._columns(keys))], axis=0)
+
+
+class HeavyHitters:
+    """Частые значения колонки с ошибкой счёта не больше error * N.
+
+    Space-Saving находит кандидатов, Count-Min уточняет счёт ключей, которых
+    в сводке нет (например, адреса из топа источников среди получателей).
+    """
+
+    def __init__(self, error):
+        if not 0 < error < 1:
+            raise ValueError("Error bound must be between 0 and 1")
+        self.error = error
+        self.summary = SpaceSaving(math.ceil(1 / error))
+        self.sketch = CountMin(math.ceil(math.e / error))
+        self.total = 0
+
+    @classmethod
+    def from_values(cls, values, error, slice_rows=SLICE_ROWS):
+        hitters = cls(error)
+        values = np.asarray(values)
+        for start in range(0, len(values), slice_rows):
+            keys, counts = value_counts(values[start:start + slice_rows])
+            part = SpaceSaving(hitters.summary.capacity, keys, counts, np.zeros(len(keys), dtype=np.int64))
+            hitters.summary = hitters.summary.merge(part)
+            hitters.sketch.add(keys, counts)
+            hitters.total += int(counts.sum())
+        return hitters
+
+    def merge(self, other):
+        if self.error != other.error:
+            raise ValueError("Cannot merge sketches with different error bounds")
+        merged = HeavyHitters(self.error)
+        merged.summary = self.summary.merge(other.summary)
+        merged.sketch = self.sketch.merge(other.sketch)
+        merged.total = self.total + other.total
+        return merged
+
+    def top(self, n):
+        keys, counts, _ = self.summary.top(n)
+        return keys, counts
+
+    def estimate(self, keys):
+        return np.minimum(self.summary.estimate(keys), self.sketch.estimate(keys))
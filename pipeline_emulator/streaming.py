@@ -0,0 +1,210 @@
+import time
+
+import pandas as pd
+
+from data_packet import DataPacket
+
+
+class StreamError(Exception):
+    """Ошибка внутри потока с указанием ноды, на которой она произошла"""
+
+    def __init__(self, node, error):
+        super().__init__(str(error))
+        self.node = node
+        self.error = error
+
+
+class _NodeStats:
+    def __init__(self, node, profiler):
+        self.record = profiler.begin(node)
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.chunks = 0
+
+    def as_dict(self):
+        return {
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'chunks': self.chunks
+        }
+
+
+class StreamComponent:
+    """Связная группа потоковых нод, которая выполняется одной задачей планировщика"""
+
+    def __init__(self):
+        self.nodes = []
+        self.sources = []
+        self.materialize = set()
+        self.terminals = []
+
+    @property
+    def node_ids(self):
+        return [node.id for node in self.nodes]
+
+
+def plan_streams(runner):
+    """Находит ноды, которые в этом запуске получают вход кусками.
+
+    Поток начинается в source и идёт через transform, пока все входы ноды
+    потоковые; aggregate поглощает поток и отдаёт обычный DataPacket.
+    Результат потоковой ноды собирается целиком, только если его читает
+    нода без потоковой обработки или если это лист схемы.
+    """
+    graph = runner.app.graph
+    producers = set()
+    streamed = {}
+    for node in runner.node_execution_order:
+        if node.id not in runner.nodes_to_run:
+            continue
+        role = node.stream_role()
+        inputs = graph.predecessors(node.id)
+        if role == "source" and not inputs:
+            producers.add(node.id)
+        elif role in ("transform", "aggregate") and inputs \
+                and all(edge.src in producers for edge in inputs):
+            if role == "transform" and len(inputs) > 1:
+                continue
+            if role == "transform":
+                producers.add(node.id)
+        else:
+            continue
+        streamed[node.id] = node
+
+    # Компоненты связности по потоковым рёбрам
+    parent = {node_id: node_id for node_id in streamed}
+
+    def find(node_id):
+        while parent[node_id] != node_id:
+            parent[node_id] = parent[parent[node_id]]
+            node_id = parent[node_id]
+        return node_id
+
+    for node_id in streamed:
+        for edge in graph.predecessors(node_id):
+            if edge.src in streamed:
+                parent[find(edge.src)] = find(node_id)
+
+    components = {}
+    for node in runner.node_execution_order:
+        if node.id not in streamed:
+            continue
+        component = components.setdefault(find(node.id), StreamComponent())
+        component.nodes.append(node)
+        consumers = [edge.dst for edge in graph.successors(node.id)]
+        if node.id in producers:
+            if not consumers or any(dst not in streamed for dst in consumers):
+                component.materialize.add(node.id)
+        if node.stream_role() == "source":
+            component.sources.append(node)
+        if node.id not in producers or node.id in component.materialize:
+            component.terminals.append(node)
+
+    # Компонент из одного источника без потоковых потребителей выгоднее читать целиком
+    return [c for c in components.values() if len(c.nodes) > 1]
+
+
+class StreamExecutor:
+    """Проталкивает куски от источников через компонент.
+
+    Источник читает следующий кусок только после того, как предыдущий прошёл
+    все потоковые ноды, поэтому в памяти одновременно живёт не больше одного
+    куска на ребро плюс состояние агрегатов и собираемые результаты.
+    """
+
+    def __init__(self, runner, component, chunk_size):
+        self.runner = runner
+        self.component = component
+        self.chunk_size = chunk_size
+        self.graph = runner.app.graph
+        self.members = set(component.node_ids)
+        self.stats = {}
+        self.partials = {}
+        self.collected = {}
+        self.schemas = {}
+
+    def _call(self, node, func, *args, rows_in=0):
+        stats = self.stats[node.id]
+        start = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            result = func(*args)
+        except Exception as e:
+            raise StreamError(node, e)
+        finally:
+            stats.wall += time.perf_counter() - start
+            stats.cpu += time.thread_time() - cpu
+        stats.rows_in += rows_in
+        return result
+
+    def run(self):
+        for node in self.component.nodes:
+            self.runner._notify(self.runner._update_node_visual, node, "executing")
+            self.stats[node.id] = _NodeStats(node, self.runner.profiler)
+            role = node.stream_role()
+            if role == "transform":
+                self._call(node, node.open_stream)
+            elif role == "aggregate":
+                self.partials[node.id] = self._call(node, node.start_partial)
+            if node.id in self.component.materialize:
+                self.collected[node.id] = []
+
+        for source in self.component.sources:
+            chunks = iter(self._call(source, source.iter_chunks, self.chunk_size))
+            while not self.runner._stop_requested:
+                chunk = self._call(source, next, chunks, None)
+                if chunk is None:
+                    break
+                self._emit(source, chunk)
+
+        results = {}
+        for node in self.component.nodes:
+            role = node.stream_role()
+            if role == "transform":
+                tail = self._call(node, node.close_stream)
+                if tail is not None:
+                    self._emit(node, tail)
+        for node in self.component.nodes:
+            if node.stream_role() == "aggregate":
+                results[node.id] = self._call(node, node.finish_partial, self.partials.pop(node.id))
+            elif node.id in self.collected:
+                chunks = self.collected.pop(node.id)
+                # Пустой поток: отдаём пустую таблицу, а не ошибку concat
+                data = self._call(node, pd.concat, chunks) if chunks else pd.DataFrame()
+                results[node.id] = DataPacket(data)
+        return results
+
+    def _emit(self, node, chunk):
+        stats = self.stats[node.id]
+        stats.rows_out += len(chunk)
+        stats.chunks += 1
+        if node.id in self.collected:
+            self.collected[node.id].append(chunk)
+        for edge in self.graph.successors(node.id):
+            if edge.dst not in self.members:
+                continue
+            consumer = self.runner.app.nodes[edge.dst]
+            # Пустой срез первого куска: по нему интерфейс заполняет списки колонок
+            self.schemas.setdefault(consumer.id, {}).setdefault(edge.dst_port, chunk.iloc[:0])
+            if consumer.stream_role() == "aggregate":
+                self._call(consumer, consumer.update_partial, self.partials[consumer.id], chunk,
+                           edge.dst_port, rows_in=len(chunk))
+            else:
+                result = self._call(consumer, consumer.process_chunk, chunk, rows_in=len(chunk))
+                if result is not None:
+                    self._emit(consumer, result)
+
+    def input_schema(self, node):
+        ports = self.schemas.get(node.id)
+        if not ports:
+            return None
+        packets = [DataPacket(ports[port]) for port in sorted(ports)]
+        return packets[0] if len(packets) == 1 else packets
+
+    def node_stats(self, node):
+        stats = self.stats[node.id]
+        return stats.record, stats.as_dict()
@@ -0,0 +1,168 @@
+import os
+import glob
+import json
+import time
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from scheme import load_scheme
+from node_cache import NodeCache
+from pipeline_runner import HeadlessRunner
+
+
+class SweepAxis:
+    """Одно измерение перебора: свойство ноды и список его значений"""
+
+    def __init__(self, node_ref, name, values):
+        self.node_ref = node_ref
+        self.name = name
+        self.values = list(values)
+
+    @property
+    def label(self):
+        return f"{self.node_ref}.{self.name}"
+
+
+def parse_values(text):
+    """'5,10,20' -> ['5', '10', '20']; JSON-список - для значений с запятыми"""
+    if text.lstrip().startswith('['):
+        return [v if isinstance(v, str) else json.dumps(v) for v in json.loads(text)]
+    return [value.strip() for value in text.split(',')]
+
+
+def expand_files(pattern):
+    paths = sorted(glob.glob(os.path.expanduser(pattern)))
+    if not paths:
+        raise ValueError(f"No files match '{pattern}'")
+    return [os.path.abspath(path) for path in paths]
+
+
+class SweepInstance:
+    def __init__(self, index, params):
+        self.index = index
+        self.params = params
+        self.ok = False
+        self.error = None
+        self.wall = 0.0
+        self.outputs = {}
+
+
+class SweepResult:
+    """Результаты всех экземпляров; таблицы листьев собираются с колонками параметров"""
+
+    def __init__(self, axes, instances):
+        self.axes = axes
+        self.instances = instances
+
+    def sink_names(self):
+        names = []
+        for instance in self.instances:
+            for name in instance.outputs:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def summary(self):
+        rows = []
+        for instance in self.instances:
+            row = {'instance': instance.index}
+            row.update(instance.params)
+            row.update({'ok': instance.ok, 'error': instance.error, 'wall_ms': instance.wall * 1000})
+            rows.append(row)
+        return pd.DataFrame(rows).set_index('instance')
+
+    def table(self, sink_name):
+        """Табличный результат листа по всем экземплярам, индекс - (instance, строка)"""
+        frames = {}
+        for instance in self.instances:
+            packet = instance.outputs.get(sink_name)
+            if packet is None or not isinstance(packet.data, pd.DataFrame):
+                continue
+            frames[instance.index] = packet.data.reset_index(drop=True).assign(**instance.params)
+        if not frames:
+            return None
+        return pd.concat(frames, names=['instance', 'row'])
+
+
+class Sweep:
+    """Запускает одну схему на декартовом произведении значений свойств.
+
+    Экземпляры выполняются параллельно и делят один NodeCache: если значения
+    меняют только нижние ноды, верхние считаются один раз на весь перебор.
+    """
+
+    def __init__(self, scheme_path, axes, overrides=(), max_parallel=None, instance_workers=1,
+                 cache=None, configure=None):
+        self.scheme_path = scheme_path
+        self.axes = axes
+        self.overrides = list(overrides)
+        self.max_parallel = max_parallel or min(8, os.cpu_count() or 1)
+        self.instance_workers = instance_workers
+        self.cache = cache if cache is not None else NodeCache()
+        self.configure = configure
+        self._validate()
+
+    def _validate(self):
+        # Ошибку в имени ноды или значении лучше показать до запуска сотни экземпляров
+        scheme = load_scheme(self.scheme_path)
+        for node_ref, name, value in self.overrides:
+            scheme.set_property(node_ref, name, value)
+        for axis in self.axes:
+            for value in axis.values:
+                scheme.set_property(axis.node_ref, axis.name, value)
+
+    def grid(self):
+        values = [axis.values for axis in self.axes]
+        return [
+            {axis.label: value for axis, value in zip(self.axes, combination)}
+            for combination in itertools.product(*values)
+        ]
+
+    def _run_instance(self, instance):
+        start = time.perf_counter()
+        scheme = load_scheme(self.scheme_path)
+        for node_ref, name, value in self.overrides:
+            scheme.set_property(node_ref, name, value)
+        for axis in self.axes:
+            scheme.set_property(axis.node_ref, axis.name, instance.params[axis.label])
+
+        runner = HeadlessRunner(scheme, self.instance_workers, log=lambda message: None, cache=self.cache)
+        if self.configure:
+            self.configure(runner)
+        try:
+            instance.ok = runner.run()
+        finally:
+            runner.shutdown()
+        if runner.errors:
+            node, error = runner.errors[0]
+            instance.error = f"{node.name}: {error}"
+        for node in scheme.sinks():
+            if node.output_data is None:
+                continue
+            name = node.name
+            if name in instance.outputs:
+                name = f"{name} ({node.id[:8]})"
+            instance.outputs[name] = node.output_data
+        instance.wall = time.perf_counter() - start
+        return instance
+
+    def run(self, callback=None):
+        """callback(instance) вызывается по мере завершения экземпляров, по одному за раз"""
+        instances = [SweepInstance(i, params) for i, params in enumerate(self.grid())]
+        lock = threading.Lock()
+
+        def task(instance):
+            try:
+                self._run_instance(instance)
+            except Exception as e:
+                instance.error = str(e)
+            if callback:
+                with lock:
+                    callback(instance)
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            list(pool.map(task, instances))
+        return SweepResult(self.axes, instances)
@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+from packet_format import is_ipv4_column, parse_ipv4_values
+
+# Соединения по времени: as-of (ближайшая запись справа не дальше допуска) и
+# интервальное (все записи справа, до которых не больше допуска). Оба идут по
+# отсортированным ключам: сортировка и бинарный поиск, O(n log n) вместо
+# сравнения каждой строки с каждой. Дополнительно можно требовать равенства
+# колонок, например адресов пакета и инцидента.
+
+NS = 1_000_000_000
+ASOF_DIRECTIONS = ["backward", "forward", "nearest"]
+RIGHT_SUFFIX = '_right'
+
+
+def parse_match_columns(text):
+    """'src_ip=source_ip, dst_ip' -> [('src_ip', 'source_ip'), ('dst_ip', 'dst_ip')]"""
+    pairs = []
+    for item in (text or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        left, _, right = item.partition('=')
+        pairs.append((left.strip(), (right or left).strip()))
+    return pairs
+
+
+def time_values(series):
+    """Время в нс (UTC без пояса, как у пакетов) и маска строк без NaT"""
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series, errors='coerce', utc=True, format='ISO8601')
+    if getattr(series.dt, 'tz', None) is not None:
+        series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+    valid = series.notna().to_numpy().copy()
+    return series.to_numpy(dtype='datetime64[ns]').view('int64'), valid
+
+
+def _key_columns(left, right, pairs):
+    """Колонки ключей обеих сторон в сравнимом виде и маски пригодных строк.
+
+    Адреса uint32 с одной стороны и строки 'a.b.c.d' с другой приводятся к
+    uint32; неразобранные строки ('N/A') ни с чем не совпадают.
+    """
+    left_keys, right_keys = [], []
+    left_valid = np.ones(len(left), dtype=bool)
+    right_valid = np.ones(len(right), dtype=bool)
+    for left_name, right_name in pairs:
+        missing = [name for name, df in ((left_name, left), (right_name, right)) if name not in df.columns]
+        if missing:
+            raise ValueError(f"Match column '{missing[0]}' not found")
+        a, b = left[left_name].to_numpy(), right[right_name].to_numpy()
+        if is_ipv4_column(left_name, left[left_name]) and b.dtype.kind in 'OUT':
+            b, valid = parse_ipv4_values(b)
+            right_valid &= valid
+        elif is_ipv4_column(right_name, right[right_name]) and a.dtype.kind in 'OUT':
+            a, valid = parse_ipv4_values(a)
+            left_valid &= valid
+        left_valid &= pd.notna(a)
+        right_valid &= pd.notna(b)
+        left_keys.append(a)
+        right_keys.append(b)
+    return left_keys, right_keys, left_valid, right_valid
+
+
+def _key_codes(left_keys, right_keys):
+    """Общий номер сочетания ключей для строк обеих сторон"""
+    n = len(left_keys[0]) if left_keys else 0
+    codes = None
+    for a, b in zip(left_keys, right_keys):
+        code, uniques = pd.factorize(np.concatenate([a, b]))
+        code = code.astype(np.int64)
+        codes = code if codes is None else pd.factorize(codes * len(uniques) + code)[0].astype(np.int64)
+    return codes[:n], codes[n:]
+
+
+def _combine(left, right, left_rows, right_rows, time_column):
+    # Время записи справа сохраняется под своим именем; совпадающие колонки - с суффиксом
+    right = right.rename(columns={time_column: f"{time_column}{RIGHT_SUFFIX}"})
+    right = right.rename(columns={name: f"{name}{RIGHT_SUFFIX}" for name in right.columns if name in left.columns})
+    result = left.iloc[left_rows].reset_index(drop=True)
+    missing = right_rows < 0
+    if missing.any():
+        # Строки слева без пары: колонки справа пустые (справа может не быть ни одной строки)
+        right = right.reset_index(drop=True)
+        right = right.astype({name: _nullable(right[name]) for name in right.columns})
+        matched = right.reindex(np.where(missing, -1, right_rows)).reset_index(drop=True)
+    else:
+        matched = right.iloc[right_rows].reset_index(drop=True)
+    return pd.concat([result, matched], axis=1)
+
+
+def _nullable(series):
+    if series.dtype.kind in 'iub':
+        return 'float64' if series.dtype.kind in 'iu' else 'object'
+    return series.dtype
+
+
+def asof_join(left, right, time_column='timestamp', tolerance=60, direction='backward', pairs=()):
+    """Каждой строке слева - ближайшая по времени строка справа (left join).
+
+    backward - последняя не позже, forward - первая не раньше, nearest -
+    ближайшая; дальше tolerance секунд (0 - без ограничения) пары нет.
+    """
+    if direction not in ASOF_DIRECTIONS:
+        raise ValueError(f"Unknown as-of direction: {direction}")
+    for name, df in ((time_column, left), (time_column, right)):
+        if name not in df.columns:
+            raise ValueError(f"Time column '{name}' not found")
+    left_time, left_valid = time_values(left[time_column])
+    right_time, right_valid = time_values(right[time_column])
+    left_keys, right_keys, left_match, right_match = _key_columns(left, right, pairs)
+    right_valid &= right_match
+    frame = pd.DataFrame({'_time': left_time, '_row': np.arange(len(left))})
+    candidates = pd.DataFrame({'_time': right_time, '_match': np.arange(len(right))})[right_valid]
+    by = None
+    if pairs:
+        left_code, right_code = _key_codes(left_keys, right_keys)
+        # Строкам слева без пригодного ключа не найдётся пары
+        frame['_key'] = np.where(left_match, left_code, -1)
+        candidates['_key'] = right_code[right_valid]
+        by = '_key'
+    order = np.argsort(np.where(left_valid, left_time, np.iinfo(np.int64).max), kind='stable')
+    frame = frame.iloc[order]
+    searchable = frame[left_valid[order]]
+    joined = pd.merge_asof(
+        searchable, candidates.sort_values('_time', kind='stable'), on='_time', by=by,
+        tolerance=pd.Timedelta(tolerance, 's').value if tolerance else None,
+        direction=direction, allow_exact_matches=True
+    )
+    right_rows = np.full(len(left), -1, dtype=np.int64)
+    matches = joined['_match'].to_numpy()
+    found = ~np.isnan(matches)
+    right_rows[joined['_row'].to_numpy()[found]] = matches[found].astype(np.int64)
+    return _combine(left, right, np.arange(len(left)), right_rows, time_column)
+
+
+def interval_join(left, right, time_column='timestamp', tolerance=60, pairs=()):
+    """Все пары строк, у которых время расходится не больше чем на tolerance
+    секунд (0 - без ограничения, как у as-of; inner join); пары идут в
+    порядке строк слева.
+
+    Левая сторона сортируется по (ключ, время) один раз; для каждой строки
+    справа её отрезок находится двумя бинарными поисками.
+    """
+    for name, df in ((time_column, left), (time_column, right)):
+        if name not in df.columns:
+            raise ValueError(f"Time column '{name}' not found")
+    left_time, left_valid = time_values(left[time_column])
+    right_time, right_valid = time_values(right[time_column])
+    left_keys, right_keys, left_match, right_match = _key_columns(left, right, pairs)
+    left_valid &= left_match
+    right_valid &= right_match
+    if pairs:
+        left_code, right_code = _key_codes(left_keys, right_keys)
+    else:
+        left_code, right_code = np.zeros(len(left), dtype=np.int64), np.zeros(len(right), dtype=np.int64)
+    left_rows = np.flatnonzero(left_valid)
+    right_rows = np.flatnonzero(right_valid)
+    if tolerance:
+        width = int(tolerance * NS)
+        low, high = right_time[right_rows] - width, right_time[right_rows] + width
+    else:
+        # Без ограничения пару дают все строки с тем же ключом
+        low = np.full(len(right_rows), np.iinfo(np.int64).min)
+        high = np.full(len(right_rows), np.iinfo(np.int64).max)
+    # Время заменяется рангом среди всех границ, чтобы (ключ, ранг) уложились в одно int64
+    times = np.unique(np.concatenate([left_time[left_rows], low, high]))
+    span = len(times) + 1
+    packed = left_code[left_rows] * span + np.searchsorted(times, left_time[left_rows])
+    order = np.argsort(packed, kind='stable')
+    packed = packed[order]
+    first = np.searchsorted(packed, right_code[right_rows] * span + np.searchsorted(times, low), side='left')
+    last = np.searchsorted(packed, right_code[right_rows] * span + np.searchsorted(times, high), side='right')
+    counts = last - first
+    right_pairs = np.repeat(right_rows, counts)
+    starts = np.repeat(first - np.cumsum(counts) + counts, counts)
+    left_pairs = left_rows[order[starts + np.arange(counts.sum())]]
+    pair_order = np.lexsort((right_pairs, left_pairs))
+    return _combine(left, right, left_pairs[pair_order], right_pairs[pair_order], time_column)
@@ -0,0 +1,375 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Оконные агрегаты по времени. Строки раскладываются по панелям шириной
+# gcd(ширина, шаг); скользящее окно собирается из k соседних панелей без
+# повторного прохода по строкам: count/sum - разностью префиксных сумм,
+# min/max - блочным алгоритмом van Herk/Gil-Werman, distinct - вкладом каждой
+# пары (значение, панель) в отрезок стартов окон, квантили - префиксными
+# суммами гистограмм по панелям. Tumbling - частный случай с шагом, равным
+# ширине; session - группы строк, разделённые паузой больше gap.
+
+NS = 1_000_000_000
+WINDOW_TYPES = ["Tumbling", "Sliding", "Session"]
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p95': 0.95, 'p99': 0.99}
+AGGREGATIONS = ['count', 'sum', 'mean', 'min', 'max'] + list(QUANTILES) + ['distinct']
+NUMERIC_AGGREGATIONS = {'sum', 'mean', 'min', 'max'} | set(QUANTILES)
+# Квантили скользящих окон точны для целых по модулю до EXACT_INTEGERS (длины
+# пакетов, порты); остальные значения округляются до логарифмических корзин
+# с такой относительной ошибкой
+EXACT_INTEGERS = 65535
+QUANTILE_ACCURACY = 0.01
+# Ячеек в блоке гистограмм: 32-64 МБ
+HISTOGRAM_CELLS = 1 << 23
+
+
+class WindowSpec:
+    """Параметры окон; ширина, шаг и пауза - в секундах"""
+
+    def __init__(self, kind, width, step=None, gap=None, column='length', aggregations=('count', 'sum')):
+        if kind not in WINDOW_TYPES:
+            raise ValueError(f"Unknown window type: {kind}")
+        unknown = [name for name in aggregations if name not in AGGREGATIONS]
+        if unknown:
+            raise ValueError(f"Unknown aggregation: {unknown[0]}")
+        if not aggregations:
+            raise ValueError("No aggregations selected")
+        self.kind = kind
+        self.width = int(width * NS)
+        self.step = self.width if kind == "Tumbling" else int((step or 0) * NS)
+        self.gap = int((gap or 0) * NS)
+        if kind == "Session" and self.gap <= 0:
+            raise ValueError("Session gap must be positive")
+        if kind != "Session" and (self.width <= 0 or self.step <= 0):
+            raise ValueError("Window width and step must be positive")
+        self.column = column
+        self.aggregations = [name for name in AGGREGATIONS if name in aggregations]
+
+    def output_name(self, aggregation):
+        return 'count' if aggregation == 'count' else f"{self.column}_{aggregation}"
+
+    def first_start(self, t):
+        # Окна выровнены по эпохе: первое - с наименьшим кратным шагу началом, где конец > t
+        return ((t - self.width) // self.step + 1) * self.step
+
+    def last_start(self, t):
+        return t // self.step * self.step
+
+
+def window_rows(df, spec):
+    """Время (нс, по возрастанию) и значения колонки без строк с NaT"""
+    if 'timestamp' not in df.columns:
+        raise ValueError("Timestamp column not found")
+    needs_values = any(name != 'count' for name in spec.aggregations)
+    if needs_values and spec.column not in df.columns:
+        raise ValueError(f"Column '{spec.column}' not found in data")
+    timestamp = df['timestamp']
+    if not pd.api.types.is_datetime64_any_dtype(timestamp):
+        timestamp = pd.to_datetime(timestamp, errors='coerce')
+    valid = timestamp.notna().to_numpy()
+    t = timestamp.to_numpy(dtype='datetime64[ns]')[valid].view('int64')
+    values = df[spec.column].to_numpy()[valid] if needs_values else np.zeros(len(t))
+    if not (t[1:] >= t[:-1]).all():
+        order = np.argsort(t, kind='stable')
+        t, values = t[order], values[order]
+    return t, values
+
+
+def _numeric(values, spec):
+    if not any(name in NUMERIC_AGGREGATIONS for name in spec.aggregations):
+        return None
+    if values.dtype.kind not in 'iufb':
+        raise ValueError(f"Column '{spec.column}' is not numeric: only count and distinct apply")
+    return values.astype(np.float64)
+
+
+def _grouped(group, n, values, spec, exact=True):
+    """Точные агрегаты по группам; group не убывает, n - число групп с пустыми.
+
+    exact=False - только разложимые агрегаты, из которых собираются скользящие окна.
+    """
+    out = {'count': np.bincount(group, minlength=n)}
+    x = _numeric(values, spec)
+    if x is not None:
+        valid = ~np.isnan(x)
+        g, xv = group[valid], x[valid]
+        out['valid'] = np.bincount(g, minlength=n)
+        out['sum'] = np.bincount(g, weights=xv, minlength=n)
+        out['min'] = np.full(n, np.nan)
+        out['max'] = np.full(n, np.nan)
+        if len(g):
+            first = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+            out['min'][g[first]] = np.minimum.reduceat(xv, first)
+            out['max'][g[first]] = np.maximum.reduceat(xv, first)
+        for name, q in QUANTILES.items():
+            if exact and name in spec.aggregations:
+                out[name] = pd.Series(xv).groupby(g).quantile(q).reindex(range(n)).to_numpy()
+    if exact and 'distinct' in spec.aggregations:
+        codes, uniques = pd.factorize(values)
+        keep = codes >= 0
+        pairs = _unique(group[keep].astype(np.int64) * max(len(uniques), 1) + codes[keep])
+        out['distinct'] = np.bincount(pairs // max(len(uniques), 1), minlength=n)
+    return out
+
+
+def _sliding_extreme(x, k, ufunc, identity):
+    """ufunc (min/max) по всем окнам из k подряд: префиксы и суффиксы блоков по k"""
+    n = len(x)
+    blocks = np.concatenate([x, np.full(-n % k, identity)]).reshape(-1, k)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return ufunc(suffix[:n - k + 1], prefix[k - 1:n])
+
+
+def _window_sums(values, offsets, k):
+    prefix = np.concatenate([[0], np.cumsum(values)])
+    return prefix[offsets + k] - prefix[offsets]
+
+
+def _value_buckets(x, integer):
+    """Номер корзины для каждого значения и значения корзин по возрастанию.
+
+    Корзина зависит только от самого значения, поэтому потоковый режим и
+    разбор всей таблицы дают одни и те же квантили.
+    """
+    inexact = np.abs(x) > EXACT_INTEGERS if integer else np.ones(len(x), dtype=bool)
+    if not inexact.any():
+        # Небольшие целые: словарь корзин подсчётом, без сортировки
+        low = int(x.min())
+        offset = (x - low).astype(np.int64)
+        present = np.bincount(offset) > 0
+        return (np.cumsum(present) - 1)[offset], np.flatnonzero(present).astype(np.float64) + low
+    # Логарифмические корзины, как в DDSketch
+    gamma = (1 + QUANTILE_ACCURACY) / (1 - QUANTILE_ACCURACY)
+    magnitude = np.abs(x[inexact])
+    positive = magnitude > 0
+    index = np.ceil(np.log(magnitude, where=positive, out=np.zeros_like(magnitude)) / math.log(gamma))
+    rounded = x.copy()
+    rounded[inexact] = np.where(positive, np.sign(x[inexact]) * gamma ** index * 2 / (gamma + 1), 0.0)
+    uniques, inverse = np.unique(rounded, return_inverse=True)
+    return inverse, uniques
+
+
+def _unique(keys):
+    # Сортировка быстрее np.unique на десятках миллионов int64
+    keys = np.sort(keys)
+    return keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+
+
+def _histogram_quantiles(cumulative, bucket_values, quantiles):
+    """Квантили окон по накопленным гистограммам; линейная интерполяция, как у pandas"""
+    total = cumulative[:, -1].astype(np.int64)
+    # Строки накопленных сумм со сдвигом на номер строки образуют один
+    # возрастающий массив: корзина ранга ищется бинарным поиском
+    shift = np.arange(len(cumulative), dtype=np.int64) * (int(total.max(initial=0)) + 1)
+    flat = (cumulative + shift[:, None]).ravel()
+    row_start = np.arange(len(cumulative), dtype=np.int64) * cumulative.shape[1]
+    last = len(bucket_values) - 1
+    results = []
+    for q in quantiles:
+        rank = (total - 1) * q
+        low, high = np.floor(rank), np.ceil(rank)
+        # Первая корзина, где накопленное число больше ранга
+        index = [
+            np.minimum(np.searchsorted(flat, bound.astype(np.int64) + shift, side='right') - row_start, last)
+            for bound in (low, high)
+        ]
+        result = bucket_values[index[0]] + (rank - low) * (bucket_values[index[1]] - bucket_values[index[0]])
+        result[total == 0] = np.nan
+        results.append(result)
+    return results
+
+
+def _sliding_quantiles(pane, x, integer, offsets, k, names):
+    valid = ~np.isnan(x)
+    pane, x = pane[valid], x[valid]
+    results = {name: np.full(len(offsets), np.nan) for name in names}
+    if not len(x):
+        return results
+    bucket, bucket_values = _value_buckets(x, integer)
+    buckets = len(bucket_values)
+    step = offsets[1] - offsets[0] if len(offsets) > 1 else 1
+    # Окна обрабатываются блоками, чтобы гистограммы панелей блока помещались в память
+    block = max(1, (HISTOGRAM_CELLS // buckets - k) // step + 1)
+    for first in range(0, len(offsets), block):
+        local = offsets[first:first + block] - offsets[first]
+        base = offsets[first]
+        width = local[-1] + k
+        lo, hi = np.searchsorted(pane, [base, base + width])
+        counts = np.bincount(
+            (pane[lo:hi] - base) * buckets + bucket[lo:hi], minlength=width * buckets
+        ).reshape(width, buckets)
+        # Префиксные суммы по панелям и по корзинам: разность двух строк сразу
+        # даёт накопленную гистограмму окна
+        prefix = np.zeros((width + 1, buckets), dtype=np.int32 if len(x) < 2 ** 31 else np.int64)
+        np.cumsum(counts, axis=1, out=prefix[1:])
+        np.cumsum(prefix, axis=0, out=prefix)
+        cumulative = prefix[local + k] - prefix[local]
+        quantiles = _histogram_quantiles(cumulative, bucket_values, [QUANTILES[name] for name in names])
+        for name, values in zip(names, quantiles):
+            results[name][first:first + len(local)] = values
+    return results
+
+
+def _sliding_distinct(pane, values, offsets, k, span):
+    # Пара (значение, панель) добавляет 1 окнам, которые начинаются после
+    # предыдущей панели с этим значением и ещё покрывают эту панель
+    codes, uniques = pd.factorize(values)
+    keep = codes >= 0
+    pairs = _unique(codes[keep].astype(np.int64) * span + pane[keep])
+    code, pane = pairs // span, pairs % span
+    previous = np.where(np.r_[False, code[1:] == code[:-1]], np.r_[0, pane[:-1]], -k - 1)
+    low = np.maximum(np.maximum(previous + 1, pane - k + 1), 0)
+    change = np.bincount(low, minlength=span + 1) - np.bincount(pane + 1, minlength=span + 1)
+    return np.cumsum(change)[offsets]
+
+
+def window_table(t, values, spec, first, last):
+    """Окна с началами first..last (нс, кратны шагу) по отсортированным строкам"""
+    pane_ns = math.gcd(spec.width, spec.step)
+    k, r = spec.width // pane_ns, spec.step // pane_ns
+    count = (last - first) // spec.step + 1
+    span = (count - 1) * r + k
+    origin = first // pane_ns
+    lo, hi = np.searchsorted(t, [first, last + spec.width])
+    t, values = t[lo:hi], values[lo:hi]
+    pane = t // pane_ns - origin
+    offsets = np.arange(count) * r
+
+    stats = _grouped(pane, span, values, spec, exact=k == 1)
+    starts = first + np.arange(count, dtype=np.int64) * spec.step
+    table = {
+        'window_start': starts.view('datetime64[ns]'),
+        'window_end': (starts + spec.width).view('datetime64[ns]')
+    }
+    results = {'count': _window_sums(stats['count'], offsets, k)}
+    if 'valid' in stats:
+        valid = _window_sums(stats['valid'], offsets, k)
+        results['sum'] = _window_sums(stats['sum'], offsets, k)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            results['mean'] = np.where(valid > 0, results['sum'] / np.maximum(valid, 1), np.nan)
+        for name, ufunc, identity in (('min', np.minimum, np.inf), ('max', np.maximum, -np.inf)):
+            extreme = _sliding_extreme(np.nan_to_num(stats[name], nan=identity), k, ufunc, identity)[offsets]
+            results[name] = np.where(np.isinf(extreme), np.nan, extreme)
+        quantiles = [name for name in QUANTILES if name in spec.aggregations]
+        integer = values.dtype.kind in 'iub'
+        if k == 1:
+            results.update({name: stats[name][offsets] for name in quantiles})
+        elif quantiles:
+            results.update(_sliding_quantiles(pane, _numeric(values, spec), integer, offsets, k, quantiles))
+        if integer:
+            # Сумма целых в float64 точна до 2**53
+            results['sum'] = results['sum'].astype(np.int64)
+    if 'distinct' in spec.aggregations:
+        results['distinct'] = stats['distinct'][offsets] if k == 1 else _sliding_distinct(pane, values, offsets, k, span)
+    for name in spec.aggregations:
+        table[spec.output_name(name)] = results[name]
+    return pd.DataFrame(table)
+
+
+def session_table(t, values, spec):
+    """Сессии: строки подряд, пока пауза не больше gap; конец - время последней строки"""
+    breaks = np.r_[True, t[1:] - t[:-1] > spec.gap] if len(t) else np.zeros(0, dtype=bool)
+    group = np.cumsum(breaks) - 1
+    count = int(breaks.sum())
+    stats = _grouped(group, count, values, spec)
+    first = np.flatnonzero(breaks)
+    table = {
+        'window_start': t[first].view('datetime64[ns]'),
+        'window_end': t[np.r_[first[1:] - 1, len(t) - 1] if count else first].view('datetime64[ns]')
+    }
+    if 'valid' in stats:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats['mean'] = np.where(stats['valid'] > 0, stats['sum'] / np.maximum(stats['valid'], 1), np.nan)
+        if values.dtype.kind in 'iub':
+            stats['sum'] = stats['sum'].astype(np.int64)
+    for name in spec.aggregations:
+        table[spec.output_name(name)] = stats[name]
+    return pd.DataFrame(table)
+
+
+def aggregate_windows(df, spec):
+    t, values = window_rows(df, spec)
+    if spec.kind == "Session":
+        return session_table(t, values, spec)
+    if not len(t):
+        return session_table(t, values, spec)
+    return window_table(t, values, spec, spec.first_start(int(t[0])), spec.last_start(int(t[-1])))
+
+
+class WindowTracker:
+    """Потоковые окна: куски строк на вход, закрытые окна на выход.
+
+    Окно закрыто, когда самая поздняя увиденная строка не раньше его конца
+    (сессия - когда пауза после неё уже больше gap). Держатся только строки
+    ещё не закрытых окон. Рассчитано на строки, идущие по времени.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.t = np.zeros(0, dtype=np.int64)
+        self.values = None
+        self.next_start = None
+        self.emitted = 0
+
+    def _append(self, df):
+        t, values = window_rows(df, self.spec)
+        if self.values is None:
+            self.t, self.values = t, values
+        else:
+            self.t = np.concatenate([self.t, t])
+            self.values = np.concatenate([self.values, values])
+            if not (self.t[1:] >= self.t[:-1]).all():
+                order = np.argsort(self.t, kind='stable')
+                self.t, self.values = self.t[order], self.values[order]
+        return len(t)
+
+    def _keep_from(self, start):
+        keep = np.searchsorted(self.t, start)
+        self.t, self.values = self.t[keep:], self.values[keep:]
+
+    def update(self, df):
+        if not self._append(df) or not len(self.t):
+            return None
+        spec = self.spec
+        if spec.kind == "Session":
+            # Последняя сессия ещё может продолжиться следующим куском
+            breaks = np.flatnonzero(self.t[1:] - self.t[:-1] > spec.gap) + 1
+            end = breaks[-1] if len(breaks) else 0
+            if not end:
+                return None
+            result = session_table(self.t[:end], self.values[:end], spec)
+            self.t, self.values = self.t[end:], self.values[end:]
+            return self._numbered(result)
+        if self.next_start is None:
+            self.next_start = spec.first_start(int(self.t[0]))
+        # Строки раньше начала следующего окна уже ни в одно окно не попадут
+        latest = int(self.t[-1])
+        self._keep_from(self.next_start)
+        last = (latest - spec.width) // spec.step * spec.step
+        if last < self.next_start:
+            return None
+        result = window_table(self.t, self.values, spec, self.next_start, last)
+        self.next_start = last + spec.step
+        self._keep_from(self.next_start)
+        return self._numbered(result)
+
+    def flush(self):
+        spec = self.spec
+        if self.values is None or not len(self.t):
+            return None
+        if spec.kind == "Session":
+            result = session_table(self.t, self.values, spec)
+        else:
+            last = spec.last_start(int(self.t[-1]))
+            result = window_table(self.t, self.values, spec, self.next_start, last) if last >= self.next_start else None
+        self.t, self.values = self.t[:0], self.values[:0]
+        return None if result is None else self._numbered(result)
+
+    def _numbered(self, result):
+        # Сквозная нумерация окон, как у таблицы целиком
+        result.index = pd.RangeIndex(self.emitted, self.emitted + len(result))
+        self.emitted += len(result)
+        return result
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Модули эмулятора импортируются плоско, как в самом приложении
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pipeline_emulator'))
+
+from sidecar import SIDECARS  # noqa: E402
+
+SIDECARS.enabled = False
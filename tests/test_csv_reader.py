@@ -0,0 +1,29 @@
+import pandas as pd
+
+from node import create_detached_node
+from pipeline_runner import HeadlessRunner
+from scheme import Scheme
+
+
+def _read(path, chunk_size):
+    scheme = Scheme()
+    reader = create_detached_node('CSVReader', {'filepath': str(path)})
+    sink = create_detached_node('PythonScript', {'script': 'output = input.data', 'row_wise': True})
+    for node in (reader, sink):
+        scheme.nodes[node.id] = node
+    scheme.graph.add_edge(reader.id, sink.id, 'l0')
+    runner = HeadlessRunner(scheme, log=lambda message: None)
+    runner.chunk_size = chunk_size
+    assert runner.run(), runner.errors
+    return sink.output_data.data
+
+
+def test_streaming_parses_time_like_batch(tmp_path):
+    path = tmp_path / 'events.csv'
+    # Первые строки - ISO 8601 с поясом, дальше - другой формат
+    times = ['2024-01-01T10:00:00+02:00', '2024-01-01T11:00:00+02:00', '01/02/2024 10:00', '01/03/2024 10:00']
+    pd.DataFrame({'timestamp': times, 'value': range(4)}).to_csv(path, index=False)
+
+    batch = _read(path, None)
+    assert batch['timestamp'].iloc[0] == pd.Timestamp('2024-01-01 08:00:00')
+    pd.testing.assert_frame_equal(_read(path, 2), batch)
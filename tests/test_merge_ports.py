@@ -0,0 +1,37 @@
+import pandas as pd
+
+from node import create_detached_node
+from pipeline_runner import HeadlessRunner
+from scheme import Scheme
+
+
+def _scheme(tmp_path, inputs):
+    scheme = Scheme()
+    merge = create_detached_node('Merge', {'inputs': inputs, 'merge_type': 'Concatenate'})
+    scheme.nodes[merge.id] = merge
+    for port in range(inputs):
+        path = tmp_path / f'in{port}.csv'
+        pd.DataFrame({'value': [port]}).to_csv(path, index=False)
+        reader = create_detached_node('CSVReader', {'filepath': str(path)})
+        scheme.nodes[reader.id] = reader
+        scheme.graph.add_edge(reader.id, merge.id, f'l{port}', dst_port=port)
+    return scheme, merge
+
+
+def test_fewer_inputs_keep_edges_and_report_them(tmp_path):
+    scheme, merge = _scheme(tmp_path, 3)
+    runner = HeadlessRunner(scheme, log=lambda message: None)
+
+    scheme.set_property(merge.id, 'inputs', '2')
+    assert len(merge.ports['in']) == 2
+    assert len(scheme.graph.predecessors(merge.id)) == 3
+    assert not runner.run()
+    node, error = runner.errors[0]
+    assert node is merge
+    assert str(error) == "Input port 3 is not available: Merge node has 2 input(s)"
+
+    # Вернули число входов - ребро снова действует
+    scheme.set_property(merge.id, 'inputs', '3')
+    runner.mark_dirty(merge)
+    assert runner.run(), runner.errors
+    assert merge.output_data.data['value'].tolist() == [0, 1, 2]
@@ -0,0 +1,14 @@
+import pandas as pd
+
+from data_packet import DataPacket
+from node_cache import packet_size
+
+
+def test_object_columns_count_their_strings():
+    addresses = pd.Series([f'192.168.{i % 256}.{i % 200}' for i in range(50_000)], dtype=object)
+    df = pd.DataFrame({'source_ip': addresses, 'length': range(50_000)})
+
+    exact = int(df.memory_usage(index=True, deep=True).sum())
+    size = packet_size(DataPacket(df))
+    assert size > 2 * int(df.memory_usage(index=True, deep=False).sum())
+    assert abs(size - exact) < 0.1 * exact
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from packet_format import parse_ipv4, pushdown_rows, query_packets
+
+# Пакеты после as-of соединения с таблицей известных атак: адреса пакета - uint32,
+# адреса из CSV - строки
+FRAME = pd.DataFrame({
+    'src_ip': np.array([parse_ipv4('192.168.1.100'), parse_ipv4('10.0.0.1')], dtype=np.uint32),
+    'source_ip': ['192.168.1.100', '10.0.0.7'],
+    'length': [60, 80],
+})
+
+
+def test_literals_follow_the_compared_column():
+    assert len(query_packets(FRAME, "source_ip == '192.168.1.100'")) == 1
+    assert query_packets(FRAME, "src_ip == '192.168.1.100'")['length'].tolist() == [60]
+    both = "'10.0.0.1' == src_ip and source_ip in ['10.0.0.7', '10.0.0.8']"
+    assert query_packets(FRAME, both)['length'].tolist() == [80]
+    assert pushdown_rows(FRAME, "source_ip != '10.0.0.7'")['length'].tolist() == [60]
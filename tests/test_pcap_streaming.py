@@ -0,0 +1,55 @@
+import struct
+
+import pandas as pd
+
+from pcap_parser import iter_captures, read_captures
+
+
+def _write_pcap(path, packets):
+    """packets - пары (время в мкс, длина кадра)"""
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for micros, length in packets:
+            ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, length - 14, 0, 0, 64, 6, 0,
+                             bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2]))
+            frame = (b'\0' * 12 + b'\x08\x00' + ip).ljust(length, b'\0')
+            f.write(struct.pack('<IIII', micros // 1_000_000, micros % 1_000_000, len(frame), len(frame)))
+            f.write(frame)
+
+
+def _stream(paths, condition=None):
+    return pd.concat(list(iter_captures(paths, batch_rows=3, condition=condition)))
+
+
+def test_streaming_matches_batch_for_interleaved_files(tmp_path):
+    first, second = str(tmp_path / 'a.pcap'), str(tmp_path / 'b.pcap')
+    # b.pcap начинается раньше, файлы перекрываются и совпадают по времени пакетов
+    _write_pcap(first, [(2_000_000 + i * 1_000_000, 100 + i) for i in range(7)])
+    _write_pcap(second, [(1_000_000 + i * 500_000, 200 + i) for i in range(11)])
+    paths = [first, second]
+
+    for condition in (None, 'length % 2 == 0'):
+        batch = read_captures(paths, condition=condition)
+        pd.testing.assert_frame_equal(_stream(paths, condition), batch)
+    assert read_captures(paths)['timestamp'].is_monotonic_increasing
+
+
+def test_streaming_orders_disjoint_files_by_time(tmp_path):
+    first, second = str(tmp_path / 'a.pcap'), str(tmp_path / 'b.pcap')
+    _write_pcap(first, [(10_000_000 + i, 100) for i in range(4)])
+    _write_pcap(second, [(1_000_000 + i, 200) for i in range(5)])
+    paths = [first, second]
+
+    stream = _stream(paths)
+    pd.testing.assert_frame_equal(stream, read_captures(paths))
+    assert stream['length'].tolist() == [200] * 5 + [100] * 4
+
+
+def test_streaming_matches_batch_for_unordered_file(tmp_path):
+    first, second = str(tmp_path / 'a.pcap'), str(tmp_path / 'b.pcap')
+    _write_pcap(first, [(3_000_000, 100), (1_000_000, 102), (2_000_000, 104)])
+    _write_pcap(second, [(1_500_000 + i * 1_000_000, 200 + i) for i in range(4)])
+    paths = [first, second]
+
+    for condition in (None, 'length % 2 == 0'):
+        pd.testing.assert_frame_equal(_stream(paths, condition), read_captures(paths, condition=condition))
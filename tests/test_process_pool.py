@@ -0,0 +1,32 @@
+import pandas as pd
+
+from node import create_detached_node
+from pipeline_runner import HeadlessRunner
+from process_pool import shared_pool
+from scheme import Scheme
+
+
+def _scheme(path):
+    scheme = Scheme()
+    reader = create_detached_node('CSVReader', {'filepath': str(path)})
+    script = create_detached_node('PythonScript', {'script': 'output = input.data', 'run_in_process': True})
+    for node in (reader, script):
+        scheme.nodes[node.id] = node
+    scheme.graph.add_edge(reader.id, script.id, 'l0')
+    return scheme, script
+
+
+def test_runners_share_one_process_pool(tmp_path):
+    path = tmp_path / 'data.csv'
+    pd.DataFrame({'value': [1, 2, 3]}).to_csv(path, index=False)
+    pool = shared_pool()
+    for _ in range(2):
+        scheme, script = _scheme(path)
+        runner = HeadlessRunner(scheme, log=lambda message: None)
+        try:
+            assert runner.run(), runner.errors
+        finally:
+            runner.shutdown()
+        assert script.output_data.data['value'].tolist() == [1, 2, 3]
+        # Остановка раннера не закрывает пул, которым пользуются другие
+        assert shared_pool() is pool
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from node import create_detached_node
+from pipeline_runner import HeadlessRunner
+from scheme import Scheme
+
+
+def _scheme(path):
+    scheme = Scheme()
+    reader = create_detached_node('CSVReader', {'filepath': str(path)})
+    condition = create_detached_node('Filter', {'condition': 'value > 2'})
+    for node in (reader, condition):
+        scheme.nodes[node.id] = node
+    scheme.graph.add_edge(reader.id, condition.id, 'l0')
+    return scheme, reader, condition
+
+
+def test_reader_output_stays_unfiltered(tmp_path):
+    path = tmp_path / 'data.csv'
+    pd.DataFrame({'value': [1, 2, 3, 4]}).to_csv(path, index=False)
+
+    for chunk_size in (None, 2):
+        scheme, reader, condition = _scheme(path)
+        runner = HeadlessRunner(scheme, log=lambda message: None)
+        runner.chunk_size = chunk_size
+        assert runner.run(), runner.errors
+        assert reader.pushdown == 'value > 2'
+        assert condition.output_data.data['value'].tolist() == [3, 4]
+        # Данные самого читателя показываются целиком
+        assert runner.unfiltered_output(reader).data['value'].tolist() == [1, 2, 3, 4]
+        assert reader.output_data.data['value'].tolist() == [1, 2, 3, 4]
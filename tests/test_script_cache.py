@@ -0,0 +1,34 @@
+import pandas as pd
+
+from node import create_detached_node
+from node_cache import NodeCache
+from pipeline_runner import HeadlessRunner
+from scheme import Scheme
+
+MUTATING_SCRIPT = "df = input.data\ndf['value'] = df['value'] * 10\noutput = df\n"
+
+
+def _scheme(path):
+    scheme = Scheme()
+    reader = create_detached_node('CSVReader', {'filepath': str(path)})
+    script = create_detached_node('PythonScript', {'script': MUTATING_SCRIPT})
+    for node in (reader, script):
+        scheme.nodes[node.id] = node
+    scheme.graph.add_edge(reader.id, script.id, 'l0')
+    return scheme, reader, script
+
+
+def test_mutating_script_keeps_cached_input(tmp_path):
+    path = tmp_path / 'data.csv'
+    pd.DataFrame({'value': [1, 2, 3]}).to_csv(path, index=False)
+    scheme, reader, script = _scheme(path)
+    runner = HeadlessRunner(scheme, log=lambda message: None, cache=NodeCache())
+    runner.release_intermediates = False
+
+    for _ in range(2):
+        # Повторный запуск берёт кадр читателя из кэша
+        runner.mark_dirty(reader)
+        assert runner.run(), runner.errors
+        assert script.output_data.data['value'].tolist() == [10, 20, 30]
+    assert reader.from_cache
+    assert reader.output_data.data['value'].tolist() == [1, 2, 3]
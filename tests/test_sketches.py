@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from sketches import HeavyHitters
+
+
+def test_sliced_sketch_keeps_error_bound():
+    rng = np.random.default_rng(1)
+    values = rng.zipf(1.3, 200_000).astype(np.uint32)
+    exact = pd.Series(values).value_counts()
+    error = 0.001
+
+    hitters = HeavyHitters.from_values(values, error, slice_rows=10_000)
+    assert hitters.total == len(values)
+    assert len(hitters.summary.keys) <= hitters.summary.capacity
+    keys, _ = hitters.top(5)
+    assert list(keys) == list(exact.index[:5])
+    estimates = hitters.estimate(exact.index[:50].to_numpy())
+    assert (estimates >= exact.to_numpy()[:50]).all()
+    assert (estimates - exact.to_numpy()[:50] <= error * len(values)).all()
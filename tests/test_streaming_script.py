@@ -0,0 +1,34 @@
+import pandas as pd
+
+from node import create_detached_node
+from pipeline_runner import HeadlessRunner
+from scheme import Scheme
+
+DEDUPLICATE = "output = input.data.drop_duplicates('value')\n"
+
+
+def _run(path, chunk_size, **properties):
+    scheme = Scheme()
+    reader = create_detached_node('CSVReader', {'filepath': str(path)})
+    script = create_detached_node('PythonScript', {'script': DEDUPLICATE, **properties})
+    for node in (reader, script):
+        scheme.nodes[node.id] = node
+    scheme.graph.add_edge(reader.id, script.id, 'l0')
+    runner = HeadlessRunner(scheme, log=lambda message: None)
+    runner.chunk_size = chunk_size
+    assert runner.run(), runner.errors
+    return script
+
+
+def test_script_gets_whole_input_unless_row_wise(tmp_path):
+    path = tmp_path / 'data.csv'
+    pd.DataFrame({'value': [1, 2, 1, 2, 3]}).to_csv(path, index=False)
+
+    whole = _run(path, None).output_data.data
+    script = _run(path, 2)
+    assert script.stream_role() is None
+    pd.testing.assert_frame_equal(script.output_data.data, whole)
+    # Построчный скрипт вызывается по кускам
+    script = _run(path, 2, row_wise=True)
+    assert script.stream_role() == "transform"
+    assert script.output_data.data['value'].tolist() == [1, 2, 1, 2, 3]
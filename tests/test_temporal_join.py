@@ -0,0 +1,30 @@
+import pandas as pd
+
+from temporal_join import asof_join, interval_join
+
+LEFT = pd.DataFrame({
+    'timestamp': pd.to_datetime(['2024-01-01 00:00:00', '2024-01-01 01:00:00']),
+    'host': ['a', 'b'],
+})
+RIGHT = pd.DataFrame({
+    'timestamp': pd.to_datetime(['2024-01-01 00:00:10', '2024-01-01 00:30:00', '2024-01-01 00:59:55']),
+    'host': ['a', 'a', 'b'],
+    'event': [1, 2, 3],
+})
+
+
+def test_zero_tolerance_is_unlimited_for_both_joins():
+    pairs = [('host', 'host')]
+    asof = asof_join(LEFT, RIGHT, tolerance=0, direction='nearest', pairs=pairs)
+    assert asof['event'].tolist() == [1, 3]
+    interval = interval_join(LEFT, RIGHT, tolerance=0, pairs=pairs)
+    assert interval['event'].tolist() == [1, 2, 3]
+    assert interval['host'].tolist() == ['a', 'a', 'b']
+
+
+def test_tolerance_limits_both_joins():
+    pairs = [('host', 'host')]
+    asof = asof_join(LEFT, RIGHT, tolerance=5, direction='nearest', pairs=pairs)
+    assert asof['event'].isna().tolist() == [True, False]
+    interval = interval_join(LEFT, RIGHT, tolerance=10, pairs=pairs)
+    assert interval['event'].tolist() == [1, 3]
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+from data_packet import DataPacket
+from node import create_detached_node
+from node_cache import packet_size
+
+PACKETS = pd.DataFrame({
+    'timestamp': pd.to_datetime(['2024-01-01 00:00:00', '2024-01-01 00:00:01', '2024-01-01 00:00:07']),
+    'src_ip': ['10.0.0.1', '10.0.0.2', '10.0.0.1'],
+    'dst_ip': ['10.0.0.9', '10.0.0.9', '10.0.0.8'],
+    'protocol': [6, 17, 6],
+    'length': [60, 80, 100],
+})
+
+
+def _analyze(metrics):
+    node = create_detached_node('TrafficAnalyzer', {'metrics': metrics})
+    node.input_data = DataPacket(PACKETS)
+    return node.execute()
+
+
+def test_error_prefix_is_not_repeated():
+    with pytest.raises(ValueError) as info:
+        _analyze(['Bogus'])
+    assert str(info.value) == "Analysis error: Unknown metric: Bogus"
+
+
+def test_packet_size_counts_each_port_once():
+    packet = _analyze(['Protocol Distribution', 'Time Series'])
+    ports = [port for port in packet.metadata['ports'] if port is not None]
+    assert packet.data is ports[0].data
+    assert packet_size(packet) == sum(packet_size(port) for port in ports)